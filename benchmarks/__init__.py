@@ -0,0 +1,7 @@
+"""
+框架自身开销的基准测试, 全部请求发往本地替身服务(core.stub_server)
+
+    python -m benchmarks run --save-baseline          # 运行并保存为基线
+    python -m benchmarks check --tolerance 0.2        # 运行并与基线比较, 退化超过 20% 时返回非 0
+    python -m benchmarks compare result.json          # 比较已有的结果文件
+"""
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks import bench_cases, bench_collection, bench_logger, bench_sender, bench_suite
+
+BENCH_PATH = os.path.dirname(os.path.realpath(__file__))
+BASELINE_PATH = os.path.join(BENCH_PATH, "baseline.json")
+RESULT_PATH = os.path.join(BENCH_PATH, "results")
+
+# 名称 -> (基准函数, 完整运行的参数, --quick 时的参数)
+BENCHMARKS = {
+    "sender": (bench_sender.run, {}, {"requests": 500}),
+    "logger": (bench_logger.run, {}, {"records": 10000}),
+    "cases": (bench_cases.run, {}, {"sizes": (1000, 10000)}),
+    "collection": (bench_collection.run, {}, {"sizes": (1000, 10000)}),
+    "suite": (bench_suite.run, {}, {"rows": 500}),
+}
+
+
+def run_benchmarks(names, quick=False):
+    metrics = {}
+    for name in names:
+        func, full, short = BENCHMARKS[name]
+        for metric in func(**(short if quick else full)):
+            print(metric, flush=True)
+            metrics[metric.name] = metric.to_dict()
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "quick": quick,
+        "metrics": metrics,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """
+    比较本次结果与基线
+
+    Args:
+        result: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的相对退化, 0.2 表示 20%
+
+    Returns:
+        list: 退化的指标 [(名称, 基线值, 本次值, 变化比例)]
+    """
+    regressions = []
+    print(f"{'metric':<40}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, current in result["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if base is None:
+            print(f"{name:<40}{'-':>14}{current['value']:>14.3f}{'new':>10}")
+            continue
+        if base["value"] == 0:
+            change = 0.0
+        else:
+            change = (current["value"] - base["value"]) / abs(base["value"])
+        worse = change > tolerance if current["better"] == "lower" else -change > tolerance
+        print(f"{name:<40}{base['value']:>14.3f}{current['value']:>14.3f}{change * 100:>9.1f}%"
+              f"{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append((name, base["value"], current["value"], change))
+    return regressions
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(result, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"saved to {path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="框架开销基准测试")
+    parser.add_argument("command", choices=["run", "check", "compare"],
+                        help="run: 运行; check: 运行并与基线比较; compare: 比较已有结果")
+    parser.add_argument("result", nargs="?", help="compare 时的结果文件")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="只运行指定的基准, 可重复指定")
+    parser.add_argument("--quick", action="store_true", help="缩小数据量, 用于快速检查")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对退化, 默认 0.2")
+    parser.add_argument("--output", help="结果文件, 默认写入 benchmarks/results/")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "compare":
+        if not args.result:
+            print("compare requires a result file", file=sys.stderr)
+            return 2
+        result = _load(args.result)
+    else:
+        result = run_benchmarks(args.only or list(BENCHMARKS), quick=args.quick)
+        _save(result, args.output or os.path.join(RESULT_PATH, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+        if args.save_baseline:
+            _save(result, args.baseline)
+        if args.command == "run":
+            return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, generate one on this machine first: "
+              f"python -m benchmarks run --save-baseline (with the same --quick/--only options)", file=sys.stderr)
+        return 2
+    baseline = _load(args.baseline)
+    if baseline.get("quick") != result.get("quick"):
+        print("warning: baseline and result use different --quick settings", file=sys.stderr)
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} metrics regressed beyond {args.tolerance * 100:.0f}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+from benchmarks.common import Metric, measure, write_cases
+from data.generate_case import CaseRegistry
+
+
+def run(sizes=(1000, 10000, 100000)):
+    """generate_case 解析耗时与文件大小的关系, 分别测量首次解析与读取快照"""
+    metrics = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f"cases_{rows}.yml")
+            write_cases(path, rows)
+            snapshot_path = os.path.join(tmp, f"snapshot_{rows}")
+            repeat = 3 if rows <= 10000 else 1
+            parse = measure(lambda: CaseRegistry(snapshot_path="").load(path), repeat)
+            CaseRegistry(snapshot_path=snapshot_path).load(path)
+            snapshot = measure(lambda: CaseRegistry(snapshot_path=snapshot_path).load(path), repeat)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            metrics.append(Metric(f"cases.parse_{rows}_ms", parse * 1000, f"ms ({size_mb:.1f}MB)"))
+            metrics.append(Metric(f"cases.snapshot_{rows}_ms", snapshot * 1000, f"ms ({size_mb:.1f}MB)"))
+    return metrics
@@ -0,0 +1,55 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import Metric, write_cases
+from config import setting
+
+TEST_FILE = '''import pytest
+
+from data.generate_case import generate_case
+
+api_case = generate_case({cases!r})
+
+
+@pytest.mark.parametrize("host, name, user, password", api_case["add_device"])
+def test_add(host, name, user, password, sender):
+    pass
+'''
+
+
+def run_pytest(args, env=None):
+    """在子进程中运行 pytest, 返回 (耗时秒, 输出)"""
+    command = [sys.executable, "-m", "pytest", "-p", "no:reportportal", "-p", "no:cacheprovider",
+               "--no-latency-report", *args]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=setting.BASE_PATH, capture_output=True, text=True,
+                               env={**os.environ, **(env or {})})
+    elapsed = time.perf_counter() - start
+    if completed.returncode not in (0, 5):
+        raise RuntimeError(f"pytest failed:\n{completed.stdout[-2000:]}\n{completed.stderr[-2000:]}")
+    return elapsed, completed.stdout
+
+
+def run(sizes=(1000, 10000, 100000)):
+    """收集 1k/10k/100k 个参数化用例的耗时(含 pytest 启动与用例数据解析)"""
+    metrics = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            cases = os.path.join(tmp, f"cases_{rows}.yml")
+            write_cases(cases, rows, case_names=("add_device",))
+            test_dir = os.path.join(tmp, f"collect_{rows}")
+            os.makedirs(test_dir)
+            with open(os.path.join(test_dir, "test_collect.py"), "w", encoding="utf-8") as f:
+                f.write(TEST_FILE.format(cases=cases))
+            # 以插件方式加载 testcases/conftest.py, 计入框架插件与 fixture 的开销
+            elapsed, output = run_pytest(["-p", "testcases.conftest", "--collect-only", "-q", "--rootdir", test_dir,
+                                          test_dir])
+            collected = re.search(r"(\d+) tests? collected", output)
+            if collected is None or int(collected.group(1)) != rows:
+                raise RuntimeError(f"expected {rows} tests collected:\n{output[-2000:]}")
+            metrics.append(Metric(f"collection.{rows}_rows_s", elapsed, "s"))
+    return metrics
@@ -0,0 +1,31 @@
+import os
+import tempfile
+import time
+
+from benchmarks.common import Metric
+from core.logger import BoundedQueueHandler, logger
+
+
+def run(records=50000):
+    """core.logger 每条日志在调用方的耗时, 以及后台线程写完全部日志的吞吐量"""
+    handler = next(handler for handler in logger.handlers if isinstance(handler, BoundedQueueHandler))
+    listener = handler.listener
+    # 写入临时文件, 不输出到终端, 也不写入 log 目录
+    streams = [(target, target.stream) for target in listener.handlers]
+    with tempfile.TemporaryDirectory() as tmp, open(os.path.join(tmp, "bench.log"), "w", encoding="utf-8") as f:
+        for target, _ in streams:
+            target.setStream(f)
+        try:
+            start = time.perf_counter()
+            for index in range(records):
+                logger.info(f"successful send post request to : http://127.0.0.1:8888/api/v1/device/add {index}")
+            emitted = time.perf_counter() - start
+            handler.queue.join()
+            drained = time.perf_counter() - start
+        finally:
+            for target, stream in streams:
+                target.setStream(stream)
+    return [
+        Metric("logger.emit_us", emitted / records * 1e6, "us/record"),
+        Metric("logger.records_per_s", records / drained, "records/s", better="higher"),
+    ]
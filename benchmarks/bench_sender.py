@@ -0,0 +1,40 @@
+import http.client
+import json
+
+from benchmarks.common import Metric, measure
+from core.sender import Sender, pooled_session
+from core.stub_server import StubServer
+
+BODY = {"host": "10.0.0.1", "name": "host-1", "user": "user", "password": "password"}
+
+
+def run(requests=2000):
+    """Sender.post 与 http.client 单连接 keep-alive 请求的单次耗时, 两边都包含 JSON 解析"""
+    with StubServer() as server:
+        url = server.url + "/api/v1/device/add"
+        connection = http.client.HTTPConnection(server.host, server.port)
+        headers = {"Content-Type": "application/json"}
+
+        def raw():
+            for _ in range(requests):
+                connection.request("POST", "/api/v1/device/add", json.dumps(BODY), headers)
+                json.loads(connection.getresponse().read())
+
+        sender = Sender(session=pooled_session())
+
+        def framework():
+            for _ in range(requests):
+                sender.post(url, json=BODY)
+                # result 惰性解析, 读取后与 raw 一样包含解析耗时
+                sender.result
+
+        raw(), framework()
+        raw_us = measure(raw) / requests * 1e6
+        sender_us = measure(framework) / requests * 1e6
+        connection.close()
+        sender.session.close()
+    return [
+        Metric("sender.raw_http_client_us", raw_us, "us/request"),
+        Metric("sender.post_us", sender_us, "us/request"),
+        Metric("sender.overhead_us", sender_us - raw_us, "us/request"),
+    ]
@@ -0,0 +1,24 @@
+import os
+import re
+import tempfile
+
+from benchmarks.bench_collection import run_pytest
+from benchmarks.common import Metric, write_cases
+
+SUITES = ["testcases/test_go_server_demo", "testcases/test_api_device"]
+
+
+def run(rows=2000):
+    """设备相关用例在替身服务上的端到端吞吐量, 用例数据替换为 rows 行, expect 声明与 api_data.yml 相同, 包含响应校验的开销"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = os.path.join(tmp, "cases.yml")
+        write_cases(cases, rows)
+        elapsed, output = run_pytest(["-q", "--stub-server", *SUITES], env={"API_DATA_FILE": cases})
+    summary = re.search(r"(\d+) passed.* in ([\d.]+)s", output)
+    if summary is None or "failed" in output.splitlines()[-1]:
+        raise RuntimeError(f"suite failed:\n{output[-2000:]}")
+    passed, duration = int(summary.group(1)), float(summary.group(2))
+    return [
+        Metric("suite.tests_per_s", passed / duration, "tests/s", better="higher"),
+        Metric("suite.wall_s", elapsed, f"s ({passed} tests)"),
+    ]
@@ -0,0 +1,67 @@
+import os
+import statistics
+import textwrap
+import time
+
+import yaml
+
+from config import setting
+from core.expect import case_expectations
+from data.generate_case import generate_case
+
+
+class Metric:
+    def __init__(self, name, value, unit, better="lower"):
+        """
+        一项基准测试结果
+
+        Args:
+            name: 指标名称, 例如 sender.post_us
+            value: 数值
+            unit: 单位
+            better: lower 越小越好 / higher 越大越好
+        """
+        self.name = name
+        self.value = value
+        self.unit = unit
+        self.better = better
+
+    def to_dict(self):
+        return {"value": round(self.value, 3), "unit": self.unit, "better": self.better}
+
+    def __repr__(self):
+        return f"{self.name:<40}{self.value:>14.3f} {self.unit}"
+
+
+def measure(func, repeat=5):
+    """执行 repeat 次, 返回耗时(秒)的中位数"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def _expect_declarations(case_names):
+    """data/api_data.yml 中各用例集的 expect 声明, 先经 core.expect 编译, 声明有误时在生成数据前报错"""
+    case_sets = generate_case(os.path.join(setting.BASE_PATH, "data", "api_data.yml"))
+    return {name: case_sets[name].expect for name in case_names
+            if name in case_sets and case_expectations(case_sets[name]) is not None}
+
+
+def write_cases(path, rows, case_names=("add_device", "del_device")):
+    """生成包含 rows 行的用例数据文件, 格式与 data/api_data.yml 相同(包括 expect 声明)"""
+    expect = _expect_declarations(case_names)
+    with open(path, "w", encoding="utf-8") as f:
+        for name in case_names:
+            f.write(f"{name}:\n")
+            if name in expect:
+                f.write(textwrap.indent(yaml.safe_dump({"expect": expect[name]}, allow_unicode=True), "  "))
+            f.write("  cases:\n")
+            for index in range(rows):
+                host = f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+                if name == "del_device":
+                    f.write(f'    - [ "{host}" ]\n')
+                else:
+                    f.write(f'    - [ "{host}", "host-{index}", "user", "password" ]\n')
@@ -3,7 +3,11 @@ import os
 BASE_PATH = os.path.dirname(os.path.dirname(__file__))
 
 
-YAML_FILE_PATH = os.path.join(BASE_PATH, "data", "api_data.yml")
+# 用例数据文件, 可通过环境变量 API_DATA_FILE 替换为其他数据(基准测试与 tests/ 中的测试使用)
+YAML_FILE_PATH = os.environ.get("API_DATA_FILE") or os.path.join(BASE_PATH, "data", "api_data.yml")
+
+# 用例数据解析快照目录, 设置为 None 时每次都重新解析 yml
+CASE_SNAPSHOT_PATH = os.path.join(BASE_PATH, ".case_cache")
 
 HSOT = "127.0.0.1"
 
@@ -11,6 +15,144 @@ PORT = 8888
 
 GO_SERVER = "http://127.0.0.1:8888"
 
+DEMO_SERVER = "http://10.86.97.157:8000"
+
 REPORTPORTAL_TOKEN = "test2__kuZNZorQbuKY37dLr0isa5i6pw0jeH3Xhu877cmM8yqqpfzCs0uuaU2aTp9MhEr"
 
-REPORT_PROJECT = "demo"
\ No newline at end of file
+REPORT_PROJECT = "demo"
+
+# 连接池配置
+POOL_CONNECTIONS = 10
+
+POOL_MAXSIZE = 20
+
+# 按主机覆盖连接池大小, key 与 URL 中的 host[:port] 一致, 例如 {"127.0.0.1:8888": 50}
+POOL_HOST_MAXSIZE = {}
+
+# 首个用例执行前为每个地址预先建立的连接数, 0 表示不预热
+POOL_WARMUP_CONNECTIONS = 0
+
+POOL_WARMUP_URLS = [GO_SERVER, f"http://{HSOT}:{PORT}"]
+
+# AsyncSender.send_many 默认同时在途的请求数
+ASYNC_CONCURRENCY = 50
+
+# AsyncSender 单个请求的总超时(秒), 连接与读取超时同 CONNECT_TIMEOUT / READ_TIMEOUT
+ASYNC_REQUEST_TIMEOUT = 60
+
+
+# 接口耗时汇总报告(JSON/CSV)的输出目录, 指定 --latency-report 时写入
+LATENCY_REPORT_PATH = os.path.join(BASE_PATH, "report")
+
+# 批量模式下所有失败子用例的输出目录, 终端中只展示前 20 条
+BULK_FAILURES_PATH = os.path.join(BASE_PATH, "report")
+
+# 日志配置
+LOG_LEVEL = "DEBUG"
+
+# 日志队列容量, 格式化与写文件在后台线程完成; 0 表示不限制, 此时不能使用 sample 策略
+LOG_QUEUE_SIZE = 10000
+
+# 队列满时的策略: block 等待 / drop 丢弃 / sample 采样, WARNING 及以上级别始终保留
+LOG_OVERFLOW = "block"
+
+LOG_SAMPLE_EVERY = 10
+
+# 日志轮转方式: size 按大小 / time 按时间
+LOG_ROTATION = "size"
+
+LOG_MAX_BYTES = 10 * 1024 * 1024
+
+LOG_ROTATE_WHEN = "midnight"
+
+LOG_BACKUP_COUNT = 5
+
+# ReportPortal 日志批量上报(--rp-batch-logs), 由 pytest-reportportal 的客户端在后台线程合并发送
+# 单批最多的日志条数与请求体大小
+RP_LOG_BATCH_SIZE = 50
+
+RP_LOG_BATCH_BYTES = 8 * 1024 * 1024
+
+# ReportPanel 批量创建/清理仪表板时的并发数
+REPORT_PANEL_CONCURRENCY = 8
+
+# ReportPanel 分页读取时每页条数
+RP_PAGE_SIZE = 200
+
+# launch/测试项历史数据的本地缓存(SQLite)
+RP_HISTORY_DB = os.path.join(BASE_PATH, "report", "rp_history.db")
+
+# Sender 的连接与读取超时(秒)
+CONNECT_TIMEOUT = 5
+
+READ_TIMEOUT = 30
+
+# 幂等方法在连接失败、超时或以下状态码时重试, 重试间隔按指数退避并加随机抖动
+RETRY_TIMES = 2
+
+RETRY_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+RETRY_STATUS = {502, 503, 504}
+
+RETRY_BACKOFF = 0.2
+
+RETRY_BACKOFF_MAX = 5
+
+# 同一主机连续连接失败/超时的请求(重试用尽后计一次)达到该次数后熔断, 熔断期间该主机的请求直接失败, 0 表示不熔断
+CIRCUIT_FAILURE_THRESHOLD = 3
+
+# 熔断持续的秒数, 之后放行一个探测请求
+CIRCUIT_RESET_TIMEOUT = 30
+
+# --cassette-mode 录制/回放使用的文件
+CASSETTE_PATH = os.path.join(BASE_PATH, "cassettes", "api.cassette")
+
+# --workers 的默认值: 按 depends 标记划分执行单元后并行执行的子进程数量, 0 表示串行
+SCHEDULER_WORKERS = 0
+
+# --shard-by 的默认值: 该参数值相同的用例在同一个子进程中执行, 按历史耗时或参数值的稳定哈希分配给子进程
+SCHEDULER_SHARD_KEY = "host"
+
+# worker 连接主进程失败时重试的时长(秒), 用于先于 coordinator 启动的远程 worker
+SCHEDULER_CONNECT_TIMEOUT = 30
+
+# worker 暂时没有可领取的单元时重新领取的间隔(秒)
+SCHEDULER_POLL_INTERVAL = 0.5
+
+# --coordinator 没有已连接的 worker 时等待的时长(秒), 超过后剩余的用例记为失败
+COORDINATOR_WAIT_TIMEOUT = 600
+
+# 子进程的预分配单元只在全部子进程都连接后, 或主进程开始分发超过该时长(秒)后才允许被其他子进程窃取
+SCHEDULER_STEAL_GRACE = 10
+
+# --scheduler-token 的默认值: coordinator 与 worker 共享的口令, 为空时 coordinator 每次随机生成并在 worker 命令中给出
+SCHEDULER_TOKEN = os.environ.get("SCHEDULER_TOKEN")
+
+# Sender 的响应体在内存中保存的上限(字节), 超过时写入临时文件, 读取时通过 mmap 访问
+RESPONSE_MEMORY_CAP = 1024 * 1024
+
+# 读取响应体的块大小(字节)
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+# 超过上限的响应体写入的目录, None 表示系统临时目录
+RESPONSE_SPILL_PATH = None
+
+# sender.preview() 写入日志时保留的响应体字节数
+RESPONSE_PREVIEW_BYTES = 1024
+
+# python -m core.fanout 默认对比的服务节点 {名称: 基础地址}, 如 {"node1": "http://10.86.97.1:8888"}
+FANOUT_TARGETS = {}
+
+# 节点的 p50/p90 超过其他节点中位数的倍数, 且差值超过 FANOUT_OUTLIER_MIN_MS 毫秒时标记为异常节点
+FANOUT_OUTLIER_FACTOR = 1.5
+
+FANOUT_OUTLIER_MIN_MS = 5
+
+# 节点的错误率比其他节点的中位数高出该值时标记为异常节点
+FANOUT_OUTLIER_ERROR_RATE = 0.05
+
+# 只指定 --profile-stacks 时输出的最慢用例数量
+PROFILE_TOP = 10
+
+# --profile-stacks 采样调用栈的间隔(秒)
+PROFILE_SAMPLE_INTERVAL = 0.005
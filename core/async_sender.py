@@ -0,0 +1,228 @@
+import asyncio
+import time
+
+import aiohttp
+
+from config import setting
+from core.logger import logger
+from core.response_body import loads
+from core.timing import RequestTiming, emit_timing, mark_response_end
+
+
+def _phase_tracer():
+    """
+    通过 aiohttp 的 TraceConfig 将各阶段耗时写入请求对应的 RequestTiming;
+    aiohttp 不单独上报 TLS 握手, 其耗时计入 connect
+    """
+    trace = aiohttp.TraceConfig()
+
+    def marker(name):
+        async def mark(session, context, params):
+            context.trace_request_ctx[name] = time.perf_counter_ns()
+        return mark
+
+    async def dns_end(session, context, params):
+        marks = context.trace_request_ctx
+        marks["timing"].dns_ns += time.perf_counter_ns() - marks["dns_start"]
+
+    async def connection_create_start(session, context, params):
+        marks = context.trace_request_ctx
+        marks["timing"].reused = False
+        marks["connect_start"] = time.perf_counter_ns()
+
+    async def connection_create_end(session, context, params):
+        marks = context.trace_request_ctx
+        timing = marks["timing"]
+        timing.connect_ns += time.perf_counter_ns() - marks["connect_start"] - timing.dns_ns
+
+    async def request_end(session, context, params):
+        marks = context.trace_request_ctx
+        marks["timing"].ttfb_ns = time.perf_counter_ns() - marks.get("headers_sent", marks["timing"].start_ns)
+
+    trace.on_dns_resolvehost_start.append(marker("dns_start"))
+    trace.on_dns_resolvehost_end.append(dns_end)
+    trace.on_connection_create_start.append(connection_create_start)
+    trace.on_connection_create_end.append(connection_create_end)
+    trace.on_request_headers_sent.append(marker("headers_sent"))
+    trace.on_request_end.append(request_end)
+    return trace
+
+
+class SendResult:
+    """send_many 中单个请求的结果"""
+
+    def __init__(self, index, method, url, status_code=None, result=None, request_time=None, error=None,
+                 timing=None):
+        self.index = index
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.result = result
+        self.request_time = request_time
+        self.error = error
+        self.timing = timing
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def check_status(self):
+        """
+        检查修改是否成功
+        :return: 响应中的 status 字段, 请求失败时为 False
+        """
+        if not isinstance(self.result, dict):
+            return False
+        return self.result.get("status", False)
+
+    def __repr__(self):
+        return (f"SendResult(index={self.index}, method={self.method}, url={self.url}, "
+                f"status_code={self.status_code}, request_time={self.request_time}, error={self.error!r})")
+
+
+class AsyncSender:
+    def __init__(self, limit=None, limit_per_host=None, timeout=None):
+        """
+        基于 aiohttp 的异步 Sender, 接口与 Sender 保持一致
+
+        Args:
+            limit: 连接池的最大连接数, 默认取 setting.POOL_MAXSIZE
+            limit_per_host: 单个主机的最大连接数, 默认不限制
+            timeout: 单个请求的总超时秒数, 默认取 setting.ASYNC_REQUEST_TIMEOUT;
+                连接与读取超时取 setting.CONNECT_TIMEOUT / setting.READ_TIMEOUT, 超时计为请求失败
+        """
+        self.limit = limit or setting.POOL_MAXSIZE
+        self.limit_per_host = limit_per_host or 0
+        self.timeout = aiohttp.ClientTimeout(total=timeout or setting.ASYNC_REQUEST_TIMEOUT,
+                                             sock_connect=setting.CONNECT_TIMEOUT, sock_read=setting.READ_TIMEOUT)
+        self.session = None
+        self.response = None
+        self.result = None
+        self.request_time = None
+
+    async def __aenter__(self):
+        self._ensure_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _ensure_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self.session = aiohttp.ClientSession(connector=connector, trace_configs=[_phase_tracer()])
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def request(self, method, url, params=None, data=None, json=None, headers=None, index=0):
+        """
+        发送单个请求, 不修改实例上的 response/result
+
+        Returns:
+            SendResult: 请求结果, 失败时 error 为异常信息
+        """
+        session = self._ensure_session()
+        send_result = SendResult(index, method, url)
+        timing = RequestTiming(method, url)
+        try:
+            async with session.request(method, url, params=params, data=data, json=json, headers=headers,
+                                       timeout=self.timeout, trace_request_ctx={"timing": timing}) as response:
+                send_result.status_code = timing.status_code = response.status
+                download_start = time.perf_counter_ns()
+                body = await response.read()
+                timing.download_ns = time.perf_counter_ns() - download_start
+            mark_response_end(timing)
+            decode_start = time.perf_counter_ns()
+            send_result.result = loads(body) if body.strip() else None
+            timing.decode_ns = time.perf_counter_ns() - decode_start
+        except asyncio.TimeoutError as e:
+            send_result.error = timing.error = f"{type(e).__name__}: no response within {self.timeout.total}s " \
+                                                f"(connect {self.timeout.sock_connect}s, read {self.timeout.sock_read}s)"
+            mark_response_end(timing)
+        except Exception as e:
+            send_result.error = timing.error = f"{type(e).__name__}: {e}"
+            if timing.end_ns is None:
+                mark_response_end(timing)
+        send_result.timing = timing
+        send_result.request_time = timing.elapsed_ns / 1e9
+        emit_timing(timing)
+        return send_result
+
+    async def _send(self, method, url, **kwargs):
+        send_result = await self.request(method, url, **kwargs)
+        self.response = send_result
+        self.result = send_result.result
+        self.request_time = send_result.request_time
+        if not send_result.ok:
+            logger.error(f"request failed : {send_result.error}")
+            return False
+        logger.info(f"successful send {method.lower()} request to : {url}")
+        return True
+
+    async def get(self, url, params=None, headers=None):
+        return await self._send("GET", url, params=params, headers=headers)
+
+    async def post(self, url, params=None, data=None, json=None, headers=None):
+        return await self._send("POST", url, params=params, data=data, json=json, headers=headers)
+
+    async def delete(self, url, params=None, headers=None):
+        return await self._send("DELETE", url, params=params, headers=headers)
+
+    def check_status(self):
+        """
+        检查修改是否成功
+        :return: 响应中的 status 字段, 请求失败、响应不是 JSON 对象或没有 status 字段时为 False
+        """
+        if self.response is None:
+            return False
+        return self.response.check_status()
+
+    async def send_many(self, requests, concurrency=None):
+        """
+        并发发送一批请求
+
+        Args:
+            requests: 请求描述的可迭代对象, 每项为 dict, 包含 method、url 以及可选的
+                      params/data/json/headers, 按需逐个读取, 不会一次性展开
+            concurrency: 同时在途的请求数, 默认取 setting.ASYNC_CONCURRENCY
+
+        Returns:
+            list[SendResult]: 与输入顺序一致的结果列表, 无效的请求描述同样返回失败的 SendResult, 不影响其他请求
+        """
+        concurrency = concurrency or setting.ASYNC_CONCURRENCY
+        self._ensure_session()
+        pending = enumerate(requests)
+        results = []
+
+        async def worker():
+            for index, request in pending:
+                try:
+                    kwargs = dict(request)
+                    method = kwargs.pop("method", "GET").upper()
+                    url = kwargs.pop("url")
+                    send_result = await self.request(method, url, index=index, **kwargs)
+                except Exception as e:
+                    logger.error(f"invalid request #{index} : {request!r}")
+                    send_result = SendResult(index, None, None, error=f"invalid request {type(e).__name__}: {e}")
+                results.append(send_result)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        results.sort(key=lambda send_result: send_result.index)
+        failed = sum(1 for send_result in results if not send_result.ok)
+        logger.info(f"send {len(results)} requests with concurrency {concurrency}, failed : {failed}")
+        return results
+
+    def run_many(self, requests, concurrency=None):
+        """在同步代码(如 pytest 用例)中调用 send_many, 结束后关闭连接池"""
+
+        async def run():
+            try:
+                return await self.send_many(requests, concurrency)
+            finally:
+                await self.close()
+
+        return asyncio.run(run())
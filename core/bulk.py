@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from reportportal_client import current, step
+
+from config import setting
+from core.sender import Sender
+from core.stats import LatencyHistogram
+
+# 每个批量用例在终端中最多展示的失败子用例数, 全部失败子用例写入 setting.BULK_FAILURES_PATH
+MAX_REPORTED_FAILURES = 20
+
+# 子用例结果对应的 ReportPortal 状态
+RP_STATUS = {"passed": "PASSED", "failed": "FAILED", "skipped": "SKIPPED"}
+
+logger = logging.getLogger(__name__)
+
+
+def _argnames(argnames):
+    if isinstance(argnames, str):
+        return [name.strip() for name in argnames.split(",") if name.strip()]
+    return list(argnames)
+
+
+def _row_id(values):
+    return "-".join(str(value) for value in values)
+
+
+class SubResult:
+    """批量模式下单行用例的结果"""
+
+    def __init__(self, index, row_id, outcome, duration_ms, message=None):
+        self.index = index
+        self.row_id = row_id
+        self.outcome = outcome
+        self.duration_ms = duration_ms
+        self.message = message
+
+    def __repr__(self):
+        return f"[{self.index}] {self.row_id} {self.outcome} {self.duration_ms:.2f}ms {self.message or ''}"
+
+
+class BulkSummary:
+    """单个批量用例的子用例汇总, 只保留计数、耗时直方图与前若干条失败信息"""
+
+    def __init__(self, nodeid):
+        self.nodeid = nodeid
+        self.counts = {"passed": 0, "failed": 0, "skipped": 0}
+        self.histogram = LatencyHistogram()
+        self.failures = []
+        self.lock = threading.Lock()
+
+    def add(self, sub_result):
+        with self.lock:
+            self.counts[sub_result.outcome] += 1
+            self.histogram.record(sub_result.duration_ms)
+            if sub_result.outcome == "failed" and len(self.failures) < MAX_REPORTED_FAILURES:
+                self.failures.append(sub_result)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def describe(self):
+        counts = ", ".join(f"{count} {outcome}" for outcome, count in self.counts.items() if count)
+        return f"{self.total} sub-cases: {counts}, p50 {self.histogram.percentile(50):.2f}ms, " \
+               f"max {self.histogram.percentile(100):.2f}ms"
+
+
+class BulkPlugin:
+    def __init__(self, enabled=False, concurrency=1, output_dir=None):
+        """
+        pytest 插件: 批量模式下参数化用例不再展开为多个 pytest 用例,
+        而是由一个用例在内部逐行(或并发)执行, 每行的结果作为子用例记录到日志、ReportPortal 与终端汇总中
+
+        用 @pytest.mark.bulk(concurrency=N) 标记单个用例, 或通过 --bulk-cases 对所有单层参数化用例启用;
+        启用了 ReportPortal 时每行作为一个嵌套步骤上报, 全部失败子用例写入 output_dir 下的 bulk_failures_*.log
+
+        Args:
+            enabled: 是否对所有单层参数化用例启用批量模式
+            concurrency: 默认的子用例并发数
+            output_dir: 失败子用例文件的输出目录, 默认取 setting.BULK_FAILURES_PATH
+        """
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.output_dir = setting.BULK_FAILURES_PATH if output_dir is None else output_dir
+        self.failures_path = None
+        self._failures_file = None
+        self._failures_lock = threading.Lock()
+        self.summaries = []
+
+    def _write_failure(self, nodeid, sub_result):
+        with self._failures_lock:
+            if self._failures_file is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self.failures_path = os.path.join(
+                    self.output_dir, f"bulk_failures_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.log")
+                self._failures_file = open(self.failures_path, "a", encoding="utf-8", buffering=1)
+            self._failures_file.write(f"{nodeid} {sub_result!r}\n")
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_generate_tests(self, metafunc):
+        definition = metafunc.definition
+        bulk = definition.get_closest_marker("bulk")
+        if bulk is None and not self.enabled:
+            return
+        parametrize = [marker for marker in definition.own_markers if marker.name == "parametrize"]
+        if len(parametrize) != 1:
+            return
+        marker = parametrize[0]
+        argnames = _argnames(marker.args[0] if marker.args else marker.kwargs["argnames"])
+        argvalues = marker.args[1] if len(marker.args) > 1 else marker.kwargs["argvalues"]
+        concurrency = bulk.kwargs.get("concurrency", self.concurrency) if bulk else self.concurrency
+        # 去掉原有的参数化标记, 只生成一个用例, 参数的实际取值在执行时逐行替换;
+        # 替换为新的列表, 不修改可能与其他节点共用的标记列表
+        definition.own_markers = [own for own in definition.own_markers if own is not marker]
+        rows = pytest.mark.bulk_rows(argvalues, argnames=argnames, concurrency=concurrency)
+        metafunc.parametrize(argnames, [pytest.param(*[None] * len(argnames), marks=rows, id="bulk")])
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_pyfunc_call(self, pyfuncitem):
+        marker = pyfuncitem.get_closest_marker("bulk_rows")
+        if marker is None:
+            return None
+        argnames = marker.kwargs["argnames"]
+        concurrency = max(marker.kwargs["concurrency"], 1)
+        testargs = {arg: pyfuncitem.funcargs[arg] for arg in pyfuncitem._fixtureinfo.argnames}
+        summary = BulkSummary(pyfuncitem.nodeid)
+        self.summaries.append(summary)
+        # 用例使用 rp_logger 时子用例结果也通过它上报到 ReportPortal
+        rp_logger = testargs.get("rp_logger", logger)
+        # ReportPortal 客户端保存在线程局部变量中, 在主线程取出后传给执行子用例的线程
+        rp_client = current()
+        # 并发执行时嵌套步骤在子用例结束后依次上报, 客户端按栈记录当前步骤, 同时只能有一个步骤处于打开状态
+        report_lock = threading.Lock() if concurrency > 1 else None
+
+        def execute(kwargs):
+            try:
+                pyfuncitem.obj(**kwargs)
+            except pytest.skip.Exception as e:
+                return "skipped", str(e)
+            except (Exception, pytest.fail.Exception) as e:
+                return "failed", f"{type(e).__name__}: {e}"
+            return "passed", None
+
+        def report(rp_step, sub_result):
+            rp_step.status = RP_STATUS[sub_result.outcome]
+            log = rp_logger.error if sub_result.outcome == "failed" else rp_logger.info
+            log(f"sub-case {sub_result}")
+
+        def run(index, row):
+            values = list(row) if len(argnames) > 1 else [row]
+            kwargs = dict(testargs)
+            for name, value in kwargs.items():
+                # Sender 会保存上一次请求的响应, 每行使用独立的实例并共用连接池
+                if isinstance(value, Sender):
+                    kwargs[name] = Sender(session=value.session, timeout=value.timeout, retries=value.retries,
+                                          breaker=value.breaker, cassette=value.cassette,
+                                          memory_cap=value.memory_cap)
+            kwargs.update(zip(argnames, values))
+            row_id = _row_id(values)
+            rp_step = step(f"[{index}] {row_id}", params=dict(zip(argnames, values)), rp_client=rp_client)
+            start = time.perf_counter()
+            if report_lock is None:
+                # 顺序执行时用例中的日志也记录在该步骤下
+                with rp_step:
+                    outcome, message = execute(kwargs)
+                    sub_result = SubResult(index, row_id, outcome, (time.perf_counter() - start) * 1000, message)
+                    report(rp_step, sub_result)
+            else:
+                outcome, message = execute(kwargs)
+                sub_result = SubResult(index, row_id, outcome, (time.perf_counter() - start) * 1000, message)
+                with report_lock, rp_step:
+                    report(rp_step, sub_result)
+            summary.add(sub_result)
+            if outcome == "failed":
+                self._write_failure(pyfuncitem.nodeid, sub_result)
+
+        rows = enumerate(marker.args[0], start=1)
+        if concurrency == 1:
+            for index, row in rows:
+                run(index, row)
+        else:
+            # 限制在途的子用例数量, 按需读取用例数据
+            slots = threading.Semaphore(concurrency * 2)
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for index, row in rows:
+                    slots.acquire()
+                    executor.submit(run, index, row).add_done_callback(lambda _: slots.release())
+
+        rp_logger.info(f"{pyfuncitem.nodeid}: {summary.describe()}")
+        if summary.counts["failed"]:
+            failures = "\n".join(repr(sub_result) for sub_result in summary.failures)
+            if summary.counts["failed"] > len(summary.failures):
+                failures += f"\n... all failures in {self.failures_path}"
+            raise AssertionError(f"{summary.counts['failed']} of {summary.total} sub-cases failed\n{failures}")
+        return True
+
+    @pytest.hookimpl
+    def pytest_unconfigure(self):
+        if self._failures_file is not None:
+            self._failures_file.close()
+            self._failures_file = None
+
+    @pytest.hookimpl
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.summaries:
+            return
+        terminalreporter.section("bulk sub-cases")
+        for summary in self.summaries:
+            terminalreporter.write_line(f"{summary.nodeid}: {summary.describe()}",
+                                        red=bool(summary.counts["failed"]))
+            for sub_result in summary.failures:
+                terminalreporter.write_line(f"    {sub_result!r}")
+        if self.failures_path is not None:
+            terminalreporter.write_line(f"all failed sub-cases: {self.failures_path}")
@@ -0,0 +1,314 @@
+"""
+Sender 的录制/回放文件(cassette)
+
+文件结构:
+    文件头   MAGIC(8 字节)
+    记录     [元数据长度 u32][响应体长度 u32][元数据 JSON][响应体], 依次追加
+    索引     开放寻址哈希表, 每个槽位 [请求哈希 u64][记录偏移 u64], 偏移为 0 表示空槽
+    文件尾   [索引偏移 u64][槽位数 u64][MAGIC]
+
+回放时通过 mmap 读取, 按请求哈希在索引中查找记录, 不会把整个文件读入内存;
+录制中断导致没有索引时, 打开时扫描全部记录重建索引
+
+    python -m core.cassette info cassettes/api.cassette
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from core.logger import logger
+
+MAGIC = b"APICAS01"
+RECORD_HEAD = struct.Struct("<II")
+SLOT = struct.Struct("<QQ")
+TRAILER = struct.Struct("<QQ8s")
+
+_current = None
+
+
+class CassetteMiss(LookupError):
+    """回放时没有找到对应的录制记录"""
+
+
+def _query(params):
+    if params is None:
+        return []
+    if isinstance(params, (str, bytes)):
+        return parse_qsl(params.decode() if isinstance(params, bytes) else params, keep_blank_values=True)
+    items = params.items() if isinstance(params, dict) else params
+    return [(str(key), str(value)) for key, value in items]
+
+
+def request_key(method, url, params=None, data=None, json_body=None):
+    """
+    规范化的请求描述: 方法 + 按参数名排序后的 URL + 规范化的请求体, 请求头不参与匹配
+
+    Returns:
+        str: 规范化后的请求描述
+    """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True) + _query(params))
+    url = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+    if json_body is not None:
+        body = json.dumps(json_body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    elif isinstance(data, dict):
+        body = urlencode(sorted((str(key), str(value)) for key, value in data.items()))
+    elif isinstance(data, bytes):
+        body = data.decode("utf-8", "replace")
+    else:
+        body = data or ""
+    return f"{method.upper()} {url}\n{body}"
+
+
+def _hash(key, occurrence):
+    digest = hashlib.blake2b(f"{key}\n#{occurrence}".encode("utf-8"), digest_size=8).digest()
+    # 0 保留给空槽
+    return int.from_bytes(digest, "little") or 1
+
+
+class Cassette:
+    def __init__(self, path, mode="replay"):
+        """
+        Args:
+            path: cassette 文件路径
+            mode: record 录制(覆盖已有文件) / replay 回放
+
+        同一请求被多次发送时按出现顺序分别录制, 回放时依次返回; 回放次数超过录制次数时返回第一次的响应
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._entries = []
+        self._slots = {}
+        self._slot_count = 0
+        self._index_offset = 0
+        if mode == "record":
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+        else:
+            self._open()
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    def __len__(self):
+        if self.recording:
+            return len(self._entries)
+        return len(self._slots) if self._slots else self._used_slots()
+
+    # ---------- 录制 ----------
+
+    def record(self, method, url, response, timing=None, params=None, data=None, json=None, body=None, **_):
+        """写入一条记录, response 的响应体需已读取, 或通过 body 传入"""
+        key = request_key(method, url, params, data, json)
+        meta = {
+            "key": key,
+            "url": response.url or url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "timing": timing.as_dict() if timing is not None else None,
+        }
+        body = (response.content if body is None else body) or b""
+        meta_bytes = _dumps(meta)
+        with self._lock:
+            occurrence = self._counts[key]
+            self._counts[key] += 1
+            offset = self._file.tell()
+            self._file.write(RECORD_HEAD.pack(len(meta_bytes), len(body)))
+            self._file.write(meta_bytes)
+            self._file.write(body)
+            self._entries.append((_hash(key, occurrence), offset))
+
+    def _write_index(self):
+        slot_count = 1
+        while slot_count < len(self._entries) * 2:
+            slot_count *= 2
+        slots = [(0, 0)] * slot_count
+        for key_hash, offset in self._entries:
+            index = key_hash & (slot_count - 1)
+            while slots[index][0] not in (0, key_hash):
+                index = (index + 1) & (slot_count - 1)
+            slots[index] = (key_hash, offset)
+        index_offset = self._file.tell()
+        self._file.write(b"".join(SLOT.pack(*slot) for slot in slots))
+        self._file.write(TRAILER.pack(index_offset, slot_count, MAGIC))
+
+    # ---------- 回放 ----------
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"not a cassette file: {self.path}")
+        if len(self._map) >= len(MAGIC) + TRAILER.size:
+            index_offset, slot_count, magic = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+            if magic == MAGIC and index_offset + slot_count * SLOT.size + TRAILER.size == len(self._map):
+                self._index_offset, self._slot_count = index_offset, slot_count
+                return
+        # 录制未正常结束, 扫描记录在内存中重建索引
+        logger.warning(f"cassette {self.path} has no index, rebuilding")
+        offset = len(MAGIC)
+        counts = Counter()
+        while offset + RECORD_HEAD.size <= len(self._map):
+            meta_len, body_len = RECORD_HEAD.unpack_from(self._map, offset)
+            end = offset + RECORD_HEAD.size + meta_len + body_len
+            if end > len(self._map):
+                break
+            key = json.loads(self._map[offset + RECORD_HEAD.size:offset + RECORD_HEAD.size + meta_len])["key"]
+            self._slots[_hash(key, counts[key])] = offset
+            counts[key] += 1
+            offset = end
+
+    def _used_slots(self):
+        return sum(1 for index in range(self._slot_count)
+                   if SLOT.unpack_from(self._map, self._index_offset + index * SLOT.size)[0])
+
+    def _find(self, key_hash):
+        if self._slots or not self._slot_count:
+            return self._slots.get(key_hash)
+        mask = self._slot_count - 1
+        index = key_hash & mask
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self._map, self._index_offset + index * SLOT.size)
+            if slot_hash == key_hash:
+                return offset
+            if slot_hash == 0:
+                return None
+            index = (index + 1) & mask
+
+    def _read(self, offset):
+        meta_len, body_len = RECORD_HEAD.unpack_from(self._map, offset)
+        start = offset + RECORD_HEAD.size
+        meta = json.loads(self._map[start:start + meta_len])
+        body = self._map[start + meta_len:start + meta_len + body_len]
+        return meta, body
+
+    def lookup(self, method, url, params=None, data=None, json=None, **_):
+        """
+        查找请求对应的录制记录
+
+        Returns:
+            tuple: (元数据, 响应体)
+
+        Raises:
+            CassetteMiss: 没有录制该请求
+        """
+        key = request_key(method, url, params, data, json)
+        with self._lock:
+            occurrence = self._counts[key]
+            self._counts[key] += 1
+        offset = self._find(_hash(key, occurrence))
+        if offset is None and occurrence:
+            offset = self._find(_hash(key, 0))
+        if offset is None:
+            raise CassetteMiss(f"no recorded response for {method.upper()} {url} in {self.path}")
+        meta, body = self._read(offset)
+        if meta["key"] != key:
+            raise CassetteMiss(f"hash collision for {method.upper()} {url} in {self.path}")
+        return meta, body
+
+    def replay(self, method, url, timing=None, **kwargs):
+        """
+        返回录制的响应, 并将录制时的分阶段耗时写入 timing
+
+        Returns:
+            requests.Response: 录制的响应
+        """
+        meta, body = self.lookup(method, url, **kwargs)
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.reason = meta["reason"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = meta["url"]
+        response._content = body
+        recorded = meta.get("timing")
+        if timing is not None and recorded:
+            timing.reused = recorded["reused"]
+            for phase in timing.PHASES:
+                setattr(timing, f"{phase}_ns", int(recorded[f"{phase}_ms"] * 1e6))
+            timing.end_ns = timing.start_ns + int(recorded["elapsed_ms"] * 1e6)
+        return response
+
+    def entries(self):
+        """依次返回所有记录的元数据"""
+        offset = len(MAGIC)
+        end = self._index_offset or len(self._map)
+        while offset + RECORD_HEAD.size <= end:
+            meta_len, body_len = RECORD_HEAD.unpack_from(self._map, offset)
+            # 与重建索引时一样忽略录制中断时写了一半的记录
+            if offset + RECORD_HEAD.size + meta_len + body_len > end:
+                break
+            meta, _ = self._read(offset)
+            yield meta
+            offset += RECORD_HEAD.size + meta_len + body_len
+
+    def close(self):
+        """录制模式下写入索引"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self.recording:
+                self._write_index()
+                logger.info(f"recorded {len(self._entries)} responses to : {self.path}")
+            else:
+                self._map.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _dumps(meta):
+    return json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def use_cassette(cassette):
+    """设置之后新建的 Sender 默认使用的 cassette, None 表示不使用"""
+    global _current
+    _current = cassette
+
+
+def current_cassette():
+    return _current
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "info":
+        print("usage: python -m core.cassette info <cassette>", file=sys.stderr)
+        return 2
+    with Cassette(argv[1]) as cassette:
+        statuses = Counter()
+        for meta in cassette.entries():
+            statuses[meta["status"]] += 1
+            print(f"{meta['status']} {meta['key'].splitlines()[0]}")
+        print(f"{sum(statuses.values())} records, {len(cassette)} indexed, status {dict(statuses)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
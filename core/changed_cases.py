@@ -0,0 +1,165 @@
+import functools
+import hashlib
+import inspect
+import json
+from collections import defaultdict
+
+import pytest
+
+from core.endpoints import ENDPOINTS
+
+# pytest 缓存(.pytest_cache)中的 key
+CACHE_KEY = "api/changed_cases"
+
+
+def _digest(*parts):
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:20]
+
+
+@functools.lru_cache(maxsize=None)
+def _code_hash(function):
+    try:
+        return _digest(inspect.getsource(function))
+    except (OSError, TypeError):
+        return _digest(function.__qualname__)
+
+
+@functools.lru_cache(maxsize=None)
+def _conftest_hash(directory, root):
+    """directory 到 root 之间所有 conftest.py 的内容哈希"""
+    parts = []
+    while True:
+        conftest = directory / "conftest.py"
+        if conftest.is_file():
+            parts.append(conftest.read_text(encoding="utf-8"))
+        if directory == root or directory.parent == directory:
+            break
+        directory = directory.parent
+    return _digest(*parts)
+
+
+def _fixture_hashes(item):
+    """用例使用的全部 fixture(包括被覆盖的同名 fixture)的代码哈希"""
+    fixtureinfo = getattr(item, "_fixtureinfo", None)
+    if fixtureinfo is None:
+        return []
+    return [_code_hash(fixturedef.func)
+            for name in sorted(fixtureinfo.name2fixturedefs) for fixturedef in fixtureinfo.name2fixturedefs[name]]
+
+
+def _endpoints(item):
+    """用例使用的接口 fixture 对应的 方法+路径"""
+    return [f"{ENDPOINTS[name].method} {ENDPOINTS[name].path}"
+            for name in sorted(item.fixturenames) if name in ENDPOINTS]
+
+
+def _declarations(item):
+    """用例集(parametrize 或批量模式的 bulk_rows 的取值)中的 expect / slo 声明, 没有用例集时为空"""
+    for name, index in (("parametrize", 1), ("bulk_rows", 0)):
+        for marker in item.iter_markers(name):
+            argvalues = marker.args[index] if len(marker.args) > index else marker.kwargs.get("argvalues")
+            if hasattr(argvalues, "expect") and hasattr(argvalues, "slo"):
+                return json.dumps({"expect": argvalues.expect, "slo": argvalues.slo},
+                                  sort_keys=True, ensure_ascii=False, default=repr)
+    return ""
+
+
+def case_key(item):
+    """
+    用例数据行 + 接口 + 用例集的 expect / slo 声明 + 用例函数、所用 fixture 以及所在目录各级 conftest.py 代码的哈希,
+    任意一项变化时 key 随之变化
+
+    Returns:
+        tuple: (去掉参数部分的 nodeid, 哈希)
+    """
+    callspec = getattr(item, "callspec", None)
+    params = callspec.params if callspec is not None else {}
+    row = json.dumps(params, sort_keys=True, ensure_ascii=False, default=repr)
+    function_id = item.nodeid.split("[", 1)[0]
+    code = (_code_hash(item.function), _conftest_hash(item.path.parent, item.config.rootpath), *_fixture_hashes(item))
+    return function_id, _digest(function_id, row, _declarations(item), *_endpoints(item), *code)
+
+
+class ChangedCasesPlugin:
+    def __init__(self, config, enabled=False):
+        """
+        pytest 插件: 按 用例数据行 + 接口 + 用例函数代码 的哈希记录每条用例的结果;
+        启用 --changed-cases 时只执行新增或修改过的数据行、上次失败的用例以及代码有变化的用例函数
+
+        Args:
+            config: pytest config, 结果保存在 config.cache 中
+            enabled: 是否只执行有变化的用例
+        """
+        self.cache = config.cache
+        self.enabled = enabled
+        self.previous = self.cache.get(CACHE_KEY, {})
+        self.keys = {}
+        # 本次收集到的全部数据行(包括被 -k/-m 等取消选择的), 用于清理已删除数据行的记录
+        self.collected = defaultdict(set)
+        self.outcomes = {}
+        self.stats = None
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        selected, deselected = [], []
+        new = failed = 0
+        for item in items:
+            # 批量模式的用例包含全部数据行, 总是执行
+            if item.get_closest_marker("bulk_rows") is not None:
+                selected.append(item)
+                continue
+            function_id, key = self.keys[item.nodeid] = case_key(item)
+            self.collected[function_id].add(key)
+            outcome = self.previous.get(function_id, {}).get(key)
+            if outcome is None:
+                new += 1
+            elif outcome == "failed":
+                failed += 1
+            if not self.enabled or outcome != "passed":
+                selected.append(item)
+            else:
+                deselected.append(item)
+        self.stats = (len(selected), len(items), new, failed)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    @pytest.hookimpl
+    def pytest_deselected(self, items):
+        for item in items:
+            if item.nodeid not in self.keys and item.get_closest_marker("bulk_rows") is None:
+                function_id, key = case_key(item)
+                self.collected[function_id].add(key)
+
+    @pytest.hookimpl
+    def pytest_runtest_logreport(self, report):
+        key = self.keys.get(report.nodeid)
+        if key is None:
+            return
+        if report.failed:
+            self.outcomes[key] = "failed"
+        elif report.when == "call" and not report.skipped:
+            self.outcomes.setdefault(key, "passed")
+
+    @pytest.hookimpl
+    def pytest_sessionfinish(self, session):
+        if not self.collected:
+            return
+        # 只更新本次执行了的数据行; 收集到但未执行(被取消选择)的数据行保留之前的结果,
+        # 本次收集到的用例函数中已不存在的数据行被清理, 其他用例函数的记录保持不变
+        cache = dict(self.previous)
+        for function_id, keys in self.collected.items():
+            previous = self.previous.get(function_id, {})
+            rows = cache[function_id] = {}
+            for key in keys:
+                outcome = self.outcomes.get((function_id, key), previous.get(key))
+                if outcome is not None:
+                    rows[key] = outcome
+        self.cache.set(CACHE_KEY, cache)
+
+    @pytest.hookimpl
+    def pytest_report_collectionfinish(self, config, items):
+        if self.enabled and self.stats is not None:
+            selected, total, new, failed = self.stats
+            return f"changed cases: {selected} of {total} selected ({new} new or modified, {failed} previously failed)"
+        return None
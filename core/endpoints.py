@@ -0,0 +1,81 @@
+from config import setting
+
+
+def base_url(base):
+    """
+    获取服务的基础地址, 每次调用时读取 setting, 便于运行时切换目标服务
+
+    Args:
+        base: 服务名称, go_server / device_server / demo
+    """
+    if base == "go_server":
+        return setting.GO_SERVER
+    if base == "device_server":
+        return f"http://{setting.HSOT}:{setting.PORT}"
+    if base == "demo":
+        return setting.DEMO_SERVER
+    raise KeyError(f"unknown server: {base}")
+
+
+def device_body(host, name, user, password):
+    return {
+        "json": {
+            "host": host,
+            "name": name,
+            "user": user,
+            "password": password,
+        }
+    }
+
+
+def host_params(host, *_):
+    return {"params": {"host": host}}
+
+
+class Endpoint:
+    def __init__(self, name, method, base, path, case, build):
+        """
+        接口定义, 用例的 fixture 与压测工具共用
+
+        Args:
+            name: 接口名称, 与 conftest 中的 fixture 同名
+            method: HTTP 方法
+            base: 所属服务, 见 base_url
+            path: 接口路径
+            case: 对应 api_data.yml 中的用例集名称
+            build: 将一行用例数据转换为请求参数(json/params)的函数
+        """
+        self.name = name
+        self.method = method
+        self.base = base
+        self.path = path
+        self.case = case
+        self.build = build
+
+    @property
+    def url(self):
+        return base_url(self.base) + self.path
+
+    def request(self, row, base=None):
+        """
+        将一行用例数据转换为 AsyncSender.send_many 使用的请求描述
+
+        Args:
+            row: 一行用例数据
+            base: 服务的基础地址, 默认按 base_url 取当前配置的地址
+        """
+        url = self.url if base is None else base + self.path
+        request = {"method": self.method, "url": url}
+        request.update(self.build(*row))
+        return request
+
+
+ENDPOINTS = {
+    endpoint.name: endpoint for endpoint in [
+        Endpoint("add_api", "POST", "go_server", "/api/v1/device/add", "add_device", device_body),
+        Endpoint("del_api", "DELETE", "go_server", "/api/v1/device/delete", "add_device", host_params),
+        Endpoint("add_device_url", "POST", "device_server", "/device/add_device", "add_device", device_body),
+        Endpoint("del_device_url", "DELETE", "device_server", "/device/del_device", "del_device", host_params),
+        Endpoint("demo_api", "POST", "demo", "/demo", "add_device", device_body),
+    ]
+}
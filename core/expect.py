@@ -0,0 +1,535 @@
+"""
+api_data.yml 中用例集声明的响应校验: 状态码、响应头、JSON 路径上的取值/类型/正则以及响应体 schema;
+每个用例集在第一次使用时编译为校验器(case_expectations), 校验时只遍历一次解析后的 JSON, 不匹配时列出全部差异
+
+    add_device:
+      expect:
+        status_code: 200                         # 也可以是列表, 如 [200, 201]
+        headers:
+          Content-Type: {regex: "^application/json"}
+        json:
+          status: true                           # 等于
+          message: {type: str}                   # 类型
+          data.items[0].host: {regex: "^10\\."}  # 正则
+          data.items[*].name: {type: str}        # 数组的每个元素
+          data.error: {exists: false}            # 不存在
+        schema:                                  # JSON Schema 的子集, 见 SCHEMA_KEYWORDS
+          type: object
+          required: [status, message]
+        add_device_url:                          # 只对该接口生效, 与上面的声明合并
+          json: {status: true}
+      cases:
+        - [ "10.86.97.1", "WEBGLHOST-MacMini-02", "xxx", "xxx" ]
+
+用例中通过 expect fixture 校验:
+
+    sender.post(add_device_url, json=post_data)
+    expect(sender)
+"""
+import json
+import re
+import threading
+
+from core.endpoints import ENDPOINTS
+
+# expect 中支持的声明, 其余的键为接口名称
+SPEC_KEYS = ("status_code", "headers", "json", "schema")
+
+# json 路径上支持的检查
+CHECK_KEYS = ("eq", "type", "regex", "exists")
+
+# 支持的 JSON Schema 关键字
+SCHEMA_KEYWORDS = ("type", "enum", "const", "pattern", "minimum", "maximum", "minLength", "maxLength",
+                   "minItems", "maxItems", "required", "properties", "items", "additionalProperties",
+                   "title", "description")
+
+# 类型名称, 同时支持 Python 与 JSON Schema 的写法
+TYPES = {
+    "str": str, "string": str,
+    "int": int, "integer": int,
+    "float": float,
+    "number": (int, float),
+    "bool": bool, "boolean": bool,
+    "list": list, "array": list,
+    "dict": dict, "object": dict,
+    "null": type(None), "none": type(None),
+}
+
+# 路径中的一段: 键名、[下标] 或 [*]
+_SEGMENT = re.compile(r"([^.\[\]]+)|\[(\d+|\*)\]")
+
+_MISSING = object()
+
+# id(用例集) -> (用例集, 编译后的 Expectations)
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def _show(value, limit=80):
+    if value is _MISSING:
+        return "missing"
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class Mismatch:
+    def __init__(self, path, expected, actual=_MISSING):
+        """
+        单项不匹配
+
+        Args:
+            path: 出错的位置, 如 status_code、headers.Content-Type、$.data.host
+            expected: 期望的描述
+            actual: 实际值, 缺失时为 _MISSING
+        """
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return f"{self.path}: expected {self.expected}, got {_show(self.actual)}"
+
+    def __repr__(self):
+        return f"Mismatch({self})"
+
+
+class ExpectationError(AssertionError):
+    def __init__(self, name, mismatches):
+        self.name = name
+        self.mismatches = mismatches
+        lines = "\n".join(f"  {mismatch}" for mismatch in mismatches)
+        super().__init__(f"response of {name} does not match expect ({len(mismatches)} mismatches):\n{lines}")
+
+
+def _type_check(name, where):
+    if name not in TYPES:
+        raise ValueError(f"unknown type in expect of {where}: {name}")
+    expected = TYPES[name]
+    # bool 是 int 的子类, 整数/数值类型不接受 bool
+    strict = expected in (int, float, (int, float))
+
+    def check(value, path, mismatches):
+        if not isinstance(value, expected) or (strict and isinstance(value, bool)):
+            mismatches.append(Mismatch(path, f"type {name}", value))
+
+    return check
+
+
+def _eq_check(expected):
+    def check(value, path, mismatches):
+        if value != expected or isinstance(value, bool) != isinstance(expected, bool):
+            mismatches.append(Mismatch(path, _show(expected), value))
+
+    return check
+
+
+def _regex_check(pattern, strings_only=False):
+    """strings_only 时只检查字符串(schema 的 pattern), 否则非字符串也算不匹配"""
+    regex = re.compile(pattern)
+
+    def check(value, path, mismatches):
+        if not isinstance(value, str):
+            if not strings_only:
+                mismatches.append(Mismatch(path, f"match /{pattern}/", value))
+        elif regex.search(value) is None:
+            mismatches.append(Mismatch(path, f"match /{pattern}/", value))
+
+    return check
+
+
+def _compare_check(label, limit, compare, measure=None):
+    def check(value, path, mismatches):
+        measured = value if measure is None else measure(value)
+        if measured is not None and not compare(measured, limit):
+            mismatches.append(Mismatch(path, f"{label} {limit}", value))
+
+    return check
+
+
+def _length(kind):
+    return lambda value: len(value) if isinstance(value, kind) else None
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class _Node:
+    """JSON 中一个位置上的检查, 以及需要继续检查的子位置"""
+
+    def __init__(self):
+        self.checks = []
+        self.keys = {}
+        self.indexes = {}
+        self.each = None
+        # json 路径声明的位置必须存在(exists: false 时必须不存在), schema 的 properties 可以不存在
+        self.exists = None
+
+    def key(self, name):
+        return self.keys.setdefault(name, _Node())
+
+    def index(self, position):
+        return self.indexes.setdefault(position, _Node())
+
+    def items(self):
+        if self.each is None:
+            self.each = _Node()
+        return self.each
+
+    def run(self, value, path, mismatches):
+        if self.exists is False:
+            mismatches.append(Mismatch(path, "absent", value))
+            return
+        for check in self.checks:
+            check(value, path, mismatches)
+        if self.keys:
+            if isinstance(value, dict):
+                for name, child in self.keys.items():
+                    child_value = value.get(name, _MISSING)
+                    if child_value is _MISSING:
+                        child.missing(f"{path}.{name}", mismatches)
+                    else:
+                        child.run(child_value, f"{path}.{name}", mismatches)
+            else:
+                for name, child in self.keys.items():
+                    child.missing(f"{path}.{name}", mismatches)
+        if self.indexes:
+            is_list = isinstance(value, list)
+            for position, child in self.indexes.items():
+                if is_list and position < len(value):
+                    child.run(value[position], f"{path}[{position}]", mismatches)
+                else:
+                    child.missing(f"{path}[{position}]", mismatches)
+        if self.each is not None and isinstance(value, list):
+            for position, element in enumerate(value):
+                self.each.run(element, f"{path}[{position}]", mismatches)
+
+    def missing(self, path, mismatches):
+        if self.exists:
+            mismatches.append(Mismatch(path, "present"))
+
+
+def _parse_path(path):
+    """data.items[0].host -> ["data", "items", 0, "host"], [*] 为 None"""
+    segments = []
+    position = 0
+    path = path[2:] if path.startswith("$.") else path
+    while position < len(path):
+        if path[position] == ".":
+            position += 1
+            continue
+        match = _SEGMENT.match(path, position)
+        if match is None:
+            raise ValueError(f"invalid json path: {path}")
+        key, index = match.groups()
+        if key is not None:
+            segments.append(key)
+        else:
+            segments.append(None if index == "*" else int(index))
+        position = match.end()
+    if not segments:
+        raise ValueError(f"invalid json path: {path}")
+    return segments
+
+
+def _path_node(root, path, required=True):
+    """路径上的节点, required 时路径上的每一级都必须存在"""
+    node = root
+    for segment in _parse_path(path):
+        if segment is None:
+            node = node.items()
+        elif isinstance(segment, int):
+            node = node.index(segment)
+        else:
+            node = node.key(segment)
+        if node.exists is None and required:
+            node.exists = True
+    return node
+
+
+def _compile_json(root, spec, where):
+    for path, expected in spec.items():
+        absent = isinstance(expected, dict) and expected.get("exists") is False
+        node = _path_node(root, str(path), required=not absent)
+        if not isinstance(expected, dict):
+            node.checks.append(_eq_check(expected))
+            continue
+        unknown = set(expected) - set(CHECK_KEYS)
+        if unknown:
+            raise ValueError(f"unknown check in expect of {where} at {path}: {', '.join(sorted(unknown))}, "
+                             f"use eq to compare objects")
+        if absent:
+            node.exists = False
+            continue
+        if "eq" in expected:
+            node.checks.append(_eq_check(expected["eq"]))
+        if "type" in expected:
+            node.checks.append(_type_check(expected["type"], where))
+        if "regex" in expected:
+            node.checks.append(_regex_check(expected["regex"]))
+
+
+def _compile_schema(node, schema, where):
+    unknown = set(schema) - set(SCHEMA_KEYWORDS)
+    if unknown:
+        raise ValueError(f"unsupported schema keyword in expect of {where}: {', '.join(sorted(unknown))}")
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        if len(names) == 1:
+            node.checks.append(_type_check(names[0], where))
+        else:
+            checks = [_type_check(name, where) for name in names]
+
+            def any_type(value, path, mismatches):
+                for check in checks:
+                    failed = []
+                    check(value, path, failed)
+                    if not failed:
+                        return
+                mismatches.append(Mismatch(path, f"type {' or '.join(names)}", value))
+
+            node.checks.append(any_type)
+    if "enum" in schema:
+        options = list(schema["enum"])
+
+        def enum(value, path, mismatches):
+            if not any(value == option and isinstance(value, bool) == isinstance(option, bool)
+                       for option in options):
+                mismatches.append(Mismatch(path, f"one of {_show(options)}", value))
+
+        node.checks.append(enum)
+    if "const" in schema:
+        node.checks.append(_eq_check(schema["const"]))
+    if "pattern" in schema:
+        node.checks.append(_regex_check(schema["pattern"], strings_only=True))
+    if "minimum" in schema:
+        node.checks.append(_compare_check(">=", schema["minimum"], lambda a, b: a >= b, _number))
+    if "maximum" in schema:
+        node.checks.append(_compare_check("<=", schema["maximum"], lambda a, b: a <= b, _number))
+    if "minLength" in schema:
+        node.checks.append(_compare_check("length >=", schema["minLength"], lambda a, b: a >= b, _length(str)))
+    if "maxLength" in schema:
+        node.checks.append(_compare_check("length <=", schema["maxLength"], lambda a, b: a <= b, _length(str)))
+    if "minItems" in schema:
+        node.checks.append(_compare_check("items >=", schema["minItems"], lambda a, b: a >= b, _length(list)))
+    if "maxItems" in schema:
+        node.checks.append(_compare_check("items <=", schema["maxItems"], lambda a, b: a <= b, _length(list)))
+    if "required" in schema:
+        required = list(schema["required"])
+
+        def has_required(value, path, mismatches):
+            if isinstance(value, dict):
+                for name in required:
+                    if name not in value:
+                        mismatches.append(Mismatch(f"{path}.{name}", "present"))
+
+        node.checks.append(has_required)
+    if schema.get("additionalProperties") is False:
+        # 允许 properties 以及 json 路径中声明的键, 声明为 exists: false 的键由对应节点报告
+        allowed = node.keys
+
+        def no_additional(value, path, mismatches):
+            if isinstance(value, dict):
+                for name in value:
+                    if name not in allowed:
+                        mismatches.append(Mismatch(f"{path}.{name}", "absent", value[name]))
+
+        node.checks.append(no_additional)
+    for name, child in schema.get("properties", {}).items():
+        _compile_schema(node.key(name), child, where)
+    if "items" in schema:
+        _compile_schema(node.items(), schema["items"], where)
+
+
+def _compile_headers(spec, where):
+    checks = []
+    for name, expected in spec.items():
+        if isinstance(expected, dict):
+            unknown = set(expected) - {"eq", "regex", "exists"}
+            if unknown:
+                raise ValueError(f"unknown header check in expect of {where}: {', '.join(sorted(unknown))}")
+        else:
+            expected = {"eq": str(expected)}
+        regex = re.compile(expected["regex"]) if "regex" in expected else None
+        checks.append((name, expected.get("exists", True), expected.get("eq"), regex))
+    return checks
+
+
+class ResponseValidator:
+    def __init__(self, name, spec):
+        """
+        编译后的响应校验器, 同一个实例可以在多个线程中重复使用
+
+        Args:
+            name: 用于错误信息的名称, 如 add_device/add_device_url
+            spec: expect 声明, 包含 status_code / headers / json / schema
+
+        Raises:
+            ValueError: 声明中有不支持的检查、类型或 schema 关键字
+        """
+        self.name = name
+        unknown = set(spec) - set(SPEC_KEYS)
+        if unknown:
+            raise ValueError(f"unknown expect item of {name}: {', '.join(sorted(unknown))}")
+        status_code = spec.get("status_code")
+        self.status_codes = None if status_code is None else \
+            tuple(status_code) if isinstance(status_code, list) else (status_code,)
+        self.headers = _compile_headers(spec.get("headers") or {}, name)
+        self.root = None
+        if spec.get("json") or spec.get("schema"):
+            self.root = _Node()
+            self.root.exists = True
+            if spec.get("schema"):
+                _compile_schema(self.root, spec["schema"], name)
+            if spec.get("json"):
+                _compile_json(self.root, spec["json"], name)
+
+    def validate(self, status_code, headers=None, load_body=None):
+        """
+        Args:
+            status_code: 响应状态码, 请求失败时为 None
+            headers: 响应头(不区分大小写的映射), 无法获取时为 None
+            load_body: 返回解析后 JSON 的函数, 只在声明了 json/schema 时调用
+
+        Returns:
+            list: Mismatch 列表, 全部匹配时为空
+        """
+        mismatches = []
+        if self.status_codes is not None and status_code not in self.status_codes:
+            expected = self.status_codes[0] if len(self.status_codes) == 1 else f"one of {list(self.status_codes)}"
+            mismatches.append(Mismatch("status_code", expected, status_code))
+        if self.headers:
+            if headers is None:
+                mismatches.append(Mismatch("headers", "response headers"))
+            else:
+                for name, exists, eq, regex in self.headers:
+                    value = headers.get(name)
+                    path = f"headers.{name}"
+                    if value is None:
+                        if exists:
+                            mismatches.append(Mismatch(path, "present"))
+                    elif not exists:
+                        mismatches.append(Mismatch(path, "absent", value))
+                    elif eq is not None and value != eq:
+                        mismatches.append(Mismatch(path, _show(eq), value))
+                    elif regex is not None and regex.search(value) is None:
+                        mismatches.append(Mismatch(path, f"match /{regex.pattern}/", value))
+        if self.root is not None:
+            self.root.run(load_body(), "$", mismatches)
+        return mismatches
+
+    def check(self, sender):
+        """
+        校验 Sender(或 AsyncSender 的 SendResult)的响应
+
+        Raises:
+            ExpectationError: 不匹配, 错误信息中列出全部差异
+        """
+        response = getattr(sender, "response", None)
+        headers = response.headers if response is not None else getattr(sender, "headers", None)
+        mismatches = self.validate(sender.status_code, headers, lambda: sender.result)
+        # 请求失败或响应不是合法的 JSON 时一并给出原因
+        timing = getattr(sender, "timing", None)
+        error = getattr(timing, "error", None) or getattr(sender, "error", None)
+        if mismatches and error:
+            mismatches.insert(0, Mismatch("error", "none", error))
+        if mismatches:
+            raise ExpectationError(self.name, mismatches)
+        return True
+
+    def __repr__(self):
+        return f"ResponseValidator({self.name})"
+
+
+def _merge(base, override):
+    merged = dict(base)
+    for key, value in override.items():
+        if key in ("headers", "json") and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+class Expectations:
+    def __init__(self, name, spec):
+        """
+        用例集的 expect 声明, 为公共声明以及每个单独声明的接口各编译一个校验器
+
+        Args:
+            name: 用例集名称
+            spec: expect 声明, 除 SPEC_KEYS 外的键为接口名称, 其值与公共声明合并
+
+        Raises:
+            ValueError: 声明无效
+        """
+        self.name = name
+        common = {key: value for key, value in spec.items() if key in SPEC_KEYS}
+        self.default = ResponseValidator(name, common) if common else None
+        self.endpoints = {}
+        for key, value in spec.items():
+            if key in SPEC_KEYS:
+                continue
+            if key not in ENDPOINTS:
+                raise ValueError(f"unknown expect item of {name}: {key}")
+            self.endpoints[key] = ResponseValidator(f"{name}/{key}", _merge(common, value or {}))
+
+    def validator(self, endpoint=None):
+        """
+        接口使用的校验器, 没有单独声明时使用公共声明
+
+        Returns:
+            ResponseValidator: 都没有声明时为 None
+        """
+        return self.endpoints.get(endpoint, self.default)
+
+
+def default_check(sender):
+    """
+    用例集没有声明 expect 时的校验, 与之前手写的断言相同: 状态码为 200, 响应中有 status 字段时必须为 true
+
+    Raises:
+        ExpectationError: 不匹配
+    """
+    mismatches = []
+    if sender.status_code != 200:
+        mismatches.append(Mismatch("status_code", 200, sender.status_code))
+    result = sender.result
+    if isinstance(result, dict) and "status" in result and not result["status"]:
+        mismatches.append(Mismatch("$.status", "true", result["status"]))
+    if mismatches:
+        raise ExpectationError("default expect", mismatches)
+    return True
+
+
+def case_expectations(case_set):
+    """
+    编译用例集(data.case_source.CaseSource)的 expect 声明, 每个用例集只编译一次
+
+    Returns:
+        Expectations: 没有声明 expect 时为 None
+
+    Raises:
+        ValueError: 声明无效
+    """
+    spec = getattr(case_set, "expect", None)
+    if not spec:
+        return None
+    with _compiled_lock:
+        compiled = _compiled.get(id(case_set))
+        # 保存用例集本身, 避免 id 被回收后的新对象复用
+        if compiled is None or compiled[0] is not case_set:
+            compiled = _compiled[id(case_set)] = (case_set, Expectations(case_set.name, spec))
+        return compiled[1]
+
+
+def item_expectations(item):
+    """从 parametrize(或批量模式的 bulk_rows)标记中找到带 expect 声明的用例集, 返回编译后的 Expectations"""
+    for name in ("parametrize", "bulk_rows"):
+        for marker in item.iter_markers(name):
+            index = 1 if name == "parametrize" else 0
+            argvalues = marker.args[index] if len(marker.args) > index else marker.kwargs.get("argvalues")
+            expectations = case_expectations(argvalues)
+            if expectations is not None:
+                return expectations
+    return None
@@ -0,0 +1,196 @@
+"""
+同一组用例数据并发发送到多个服务节点, 按接口与节点对比耗时、吞吐量与错误率, 并标出异常节点
+
+    # 节点取自 setting.FANOUT_TARGETS
+    python -m core.fanout --endpoint add_api --endpoint del_api
+    # 命令行指定节点, 每个节点 8 个并发, 用例数据重复 50 轮
+    python -m core.fanout --target node1=http://10.86.97.1:8888 --target node2=http://10.86.97.2:8888 \\
+        --endpoint add_device_url --endpoint del_device_url --concurrency 8 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from config import setting
+from core.async_sender import AsyncSender
+from core.endpoints import ENDPOINTS
+from core.load import EndpointStats
+from data.generate_case import generate_case
+
+
+class NodeStats(EndpointStats):
+    """单个节点上单个接口的统计, 响应中 status 为 false 也计为错误"""
+
+    def record(self, send_result, latency_ms):
+        # HTTP 错误按状态码归类, 与压测统计一致
+        if send_result.error is None and send_result.status_code < 400 and isinstance(send_result.result, dict) \
+                and send_result.result.get("status") is False:
+            send_result.error = f"status false: {send_result.result.get('message')}"
+        super().record(send_result, latency_ms)
+
+
+def parse_target(value):
+    """name=url 格式的节点"""
+    name, sep, url = value.partition("=")
+    if not sep or not name or not url.startswith(("http://", "https://")):
+        raise argparse.ArgumentTypeError(f"expected name=http://host:port, got {value!r}")
+    return name, url.rstrip("/")
+
+
+class FanoutRunner:
+    def __init__(self, targets, endpoints, cases, concurrency=4, repeat=1, timeout=None):
+        """
+        每个节点使用独立的 AsyncSender(连接池), 节点之间并发执行;
+        同一节点内接口按顺序执行(如先添加再删除), 每个接口的用例数据按 concurrency 并发发送
+
+        Args:
+            targets: 节点 {名称: 基础地址}, 接口路径拼接在基础地址之后
+            endpoints: Endpoint 列表
+            cases: generate_case 读取的用例数据
+            concurrency: 每个节点的并发数
+            repeat: 用例数据重复的轮数
+            timeout: 单个请求的总超时秒数, 默认取 setting.ASYNC_REQUEST_TIMEOUT, 超时计为该节点的错误
+        """
+        if not targets:
+            raise ValueError("no fan-out targets, set setting.FANOUT_TARGETS or use --target")
+        self.targets = dict(targets)
+        self.endpoints = endpoints
+        self.cases = cases
+        self.concurrency = concurrency
+        self.repeat = repeat
+        self.timeout = timeout
+        self.stats = {(endpoint.name, node): NodeStats(endpoint.name)
+                      for endpoint in endpoints for node in self.targets}
+        self.elapsed = {}
+
+    def _requests(self, endpoint, base):
+        for _ in range(self.repeat):
+            for row in self.cases[endpoint.case]:
+                yield endpoint.request(row, base)
+
+    async def _run_endpoint(self, sender, endpoint, node, base):
+        requests = self._requests(endpoint, base)
+        stats = self.stats[(endpoint.name, node)]
+
+        async def worker():
+            for request in requests:
+                request = dict(request)
+                start = time.perf_counter()
+                send_result = await sender.request(request.pop("method"), request.pop("url"), **request)
+                stats.record(send_result, (time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        self.elapsed[(endpoint.name, node)] = time.perf_counter() - start
+
+    async def _run_node(self, node, base):
+        start = time.perf_counter()
+        async with AsyncSender(limit=self.concurrency, timeout=self.timeout) as sender:
+            for endpoint in self.endpoints:
+                await self._run_endpoint(sender, endpoint, node, base)
+        self.elapsed[node] = time.perf_counter() - start
+
+    async def run(self):
+        await asyncio.gather(*(self._run_node(node, base) for node, base in self.targets.items()))
+        return self.summary()
+
+    def summary(self, factor=None, min_ms=None, error_rate=None):
+        """
+        按接口与节点汇总, 并标出异常节点: 与其他节点的中位数相比 p50 或 p90 超过 factor 倍且差值超过 min_ms,
+        或错误率高出 error_rate
+
+        Args:
+            factor: 耗时倍数阈值, 默认取 setting.FANOUT_OUTLIER_FACTOR
+            min_ms: 耗时差值阈值, 默认取 setting.FANOUT_OUTLIER_MIN_MS
+            error_rate: 错误率差值阈值, 默认取 setting.FANOUT_OUTLIER_ERROR_RATE
+
+        Returns:
+            list: [{"endpoint", "node", "requests", "throughput_rps", "error_rate", "p50_ms", ..., "outlier"}]
+        """
+        factor = setting.FANOUT_OUTLIER_FACTOR if factor is None else factor
+        min_ms = setting.FANOUT_OUTLIER_MIN_MS if min_ms is None else min_ms
+        error_rate = setting.FANOUT_OUTLIER_ERROR_RATE if error_rate is None else error_rate
+        rows = []
+        for endpoint in self.endpoints:
+            group = []
+            for node in self.targets:
+                row = self.stats[(endpoint.name, node)].summary(self.elapsed.get((endpoint.name, node), 0.0))
+                row["node"] = node
+                group.append(row)
+            for row in group:
+                row["outlier"] = _outlier(row, [other for other in group if other is not row],
+                                          factor, min_ms, error_rate)
+            rows.extend(group)
+        return rows
+
+
+def _outlier(row, others, factor, min_ms, error_rate):
+    """与其他节点的中位数比较, 返回异常原因, 正常时返回 None"""
+    if not others or not row["requests"]:
+        return None
+    reasons = []
+    for key in ("p50_ms", "p90_ms"):
+        median = statistics.median(other[key] for other in others)
+        if row[key] > median * factor and row[key] - median > min_ms:
+            reasons.append(f"{key[:-3]} {row[key]:.1f}ms vs {median:.1f}ms")
+    median_errors = statistics.median(other["error_rate"] for other in others)
+    if row["error_rate"] - median_errors > error_rate:
+        reasons.append(f"errors {row['error_rate'] * 100:.1f}% vs {median_errors * 100:.1f}%")
+    return "; ".join(reasons) or None
+
+
+def format_comparison(rows):
+    header = (f"{'endpoint':<16}{'node':<12}{'requests':>10}{'rps':>10}{'err%':>8}"
+              f"{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    lines = [header, "-" * len(header)]
+    endpoint = None
+    for row in rows:
+        name = row["endpoint"] if row["endpoint"] != endpoint else ""
+        endpoint = row["endpoint"]
+        lines.append(
+            f"{name:<16}{row['node']:<12}{row['requests']:>10}{row['throughput_rps']:>10.1f}"
+            f"{row['error_rate'] * 100:>8.2f}{row['p50_ms']:>10.2f}{row['p90_ms']:>10.2f}"
+            f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}"
+            f"{'  << ' + row['outlier'] if row['outlier'] else ''}")
+    outliers = sorted({row["node"] for row in rows if row["outlier"]})
+    lines.append(f"outlier nodes: {', '.join(outliers)}" if outliers else "no outlier nodes")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.fanout", description="同一组用例数据在多个服务节点上的对比")
+    parser.add_argument("--target", action="append", type=parse_target,
+                        help="节点 name=http://host:port, 可重复指定, 默认取 setting.FANOUT_TARGETS")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS),
+                        help="执行的接口, 可重复指定, 按指定顺序执行, 默认 add_api、del_api")
+    parser.add_argument("--cases", default=setting.YAML_FILE_PATH, help="用例数据文件")
+    parser.add_argument("--concurrency", type=int, default=4, help="每个节点的并发数")
+    parser.add_argument("--repeat", type=int, default=1, help="用例数据重复的轮数")
+    parser.add_argument("--timeout", type=float, help="单个请求的总超时秒数, 默认取 setting.ASYNC_REQUEST_TIMEOUT")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    targets = dict(args.target) if args.target else setting.FANOUT_TARGETS
+    endpoints = [ENDPOINTS[name] for name in args.endpoint or ["add_api", "del_api"]]
+    try:
+        runner = FanoutRunner(targets, endpoints, generate_case(args.cases), concurrency=args.concurrency,
+                              repeat=args.repeat, timeout=args.timeout)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    rows = asyncio.run(runner.run())
+    print(format_comparison(rows))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"targets": runner.targets, "endpoints": rows}, f, ensure_ascii=False, indent=2)
+    return 1 if any(row["outlier"] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import csv
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from core.stats import LatencyHistogram
+from core.timing import RequestTiming, add_decode_hook, add_timing_hook, remove_decode_hook, remove_timing_hook
+
+
+def endpoint_of(url):
+    """去掉查询参数后的接口地址, 作为汇总的维度"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class EndpointLatency:
+    """单个 方法+接口 的耗时汇总, 内存占用与请求数量无关"""
+
+    def __init__(self, method, endpoint):
+        self.method = method
+        self.endpoint = endpoint
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self.reused = 0
+        self.phase_ns = dict.fromkeys(RequestTiming.PHASES, 0)
+
+    def record(self, timing):
+        self.histogram.record(timing.elapsed_ms)
+        if timing.failed:
+            self.errors += 1
+        if timing.reused:
+            self.reused += 1
+        for phase in RequestTiming.PHASES:
+            self.phase_ns[phase] += getattr(timing, f"{phase}_ns")
+
+    def record_decode(self, timing, failed):
+        self.phase_ns["decode"] += timing.decode_ns
+        if failed:
+            self.errors += 1
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.errors += other.errors
+        self.reused += other.reused
+        for phase, value in other.phase_ns.items():
+            self.phase_ns[phase] += value
+        return self
+
+    def summary(self):
+        count = self.histogram.count
+        summary = {"method": self.method, "endpoint": self.endpoint}
+        summary.update(self.histogram.summary())
+        summary["errors"] = self.errors
+        summary["error_rate"] = round(self.errors / count, 4) if count else 0.0
+        summary["reuse_rate"] = round(self.reused / count, 4) if count else 0.0
+        for phase, value in self.phase_ns.items():
+            summary[f"{phase}_mean_ms"] = round(value / count / 1e6, 3) if count else 0.0
+        return summary
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "histogram": self.histogram.to_dict(),
+            "errors": self.errors,
+            "reused": self.reused,
+            "phase_ns": self.phase_ns,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        latency = cls(data["method"], data["endpoint"])
+        latency.histogram = LatencyHistogram.from_dict(data["histogram"])
+        latency.errors = data["errors"]
+        latency.reused = data["reused"]
+        latency.phase_ns.update(data["phase_ns"])
+        return latency
+
+
+class LatencyReport:
+    def __init__(self, output_dir=None):
+        """
+        pytest 插件: 收集会话内 Sender/AsyncSender 的全部耗时记录,
+        结束时输出汇总表; 指定了 output_dir 时写入 JSON/CSV 便于对比历次运行,
+        文件名包含时间与进程号, 同时运行的多个会话不会互相覆盖
+
+        Args:
+            output_dir: 报告目录, 为空时只输出汇总表
+        """
+        self.output_dir = output_dir
+        self.endpoints = {}
+        self.lock = threading.Lock()
+        self.paths = []
+
+    def record(self, timing):
+        key = (timing.method, endpoint_of(timing.url))
+        with self.lock:
+            latency = self.endpoints.get(key)
+            if latency is None:
+                latency = self.endpoints[key] = EndpointLatency(*key)
+            latency.record(timing)
+
+    def record_decode(self, timing, failed):
+        """请求结束后才解析的响应体, 补充解析耗时与解析失败"""
+        with self.lock:
+            latency = self.endpoints.get((timing.method, endpoint_of(timing.url)))
+            if latency is not None:
+                latency.record_decode(timing, failed)
+
+    def summary(self):
+        with self.lock:
+            return [self.endpoints[key].summary() for key in sorted(self.endpoints)]
+
+    def write(self, output_dir):
+        summary = self.summary()
+        os.makedirs(output_dir, exist_ok=True)
+        name = f"latency_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        json_path = os.path.join(output_dir, f"{name}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "endpoints": summary,
+                "histograms": [latency.to_dict() for latency in self.endpoints.values()],
+            }, f, ensure_ascii=False, indent=2)
+        csv_path = os.path.join(output_dir, f"{name}.csv")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary[0]))
+            writer.writeheader()
+            writer.writerows(summary)
+        return [json_path, csv_path]
+
+    @pytest.hookimpl
+    def pytest_sessionstart(self, session):
+        add_timing_hook(self.record)
+        add_decode_hook(self.record_decode)
+
+    @pytest.hookimpl
+    def pytest_sessionfinish(self, session):
+        remove_timing_hook(self.record)
+        remove_decode_hook(self.record_decode)
+        if self.output_dir and self.endpoints:
+            self.paths = self.write(self.output_dir)
+
+    @pytest.hookimpl
+    def pytest_terminal_summary(self, terminalreporter):
+        summary = self.summary()
+        if not summary:
+            return
+        terminalreporter.section("request latency")
+        header = f"{'method':<8}{'count':>8}{'err%':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  endpoint"
+        terminalreporter.write_line(header)
+        for row in summary:
+            terminalreporter.write_line(
+                f"{row['method']:<8}{row['count']:>8}{row['error_rate'] * 100:>8.2f}{row['mean_ms']:>10.2f}"
+                f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}"
+                f"  {row['endpoint']}")
+        for path in self.paths:
+            terminalreporter.write_line(f"latency report: {path}")
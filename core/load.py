@@ -0,0 +1,193 @@
+"""
+基于 api_data.yml 用例数据的压测工具
+
+    # 闭环: 每个接口 16 个并发持续 30 秒
+    python -m core.load --endpoint add_api --endpoint del_api --mode closed --concurrency 16 --duration 30
+    # 开环: 每个接口按 200 RPS 发送 30 秒
+    python -m core.load --endpoint add_device_url --mode open --rps 200 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from config import setting
+from core.async_sender import AsyncSender
+from core.endpoints import ENDPOINTS
+from core.stats import LatencyHistogram
+from data.generate_case import generate_case
+
+
+class EndpointStats:
+    """单个接口的压测统计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.error_samples = {}
+
+    def record(self, send_result, latency_ms):
+        self.requests += 1
+        self.histogram.record(latency_ms)
+        error = send_result.error
+        if error is None and send_result.status_code >= 400:
+            error = f"HTTP {send_result.status_code}"
+        if error is not None:
+            self.errors += 1
+            self.error_samples[error] = self.error_samples.get(error, 0) + 1
+
+    def summary(self, elapsed):
+        summary = {
+            "endpoint": self.name,
+            "requests": self.requests,
+            "throughput_rps": round(self.requests / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+        }
+        summary.update(self.histogram.summary(percents=(50, 90, 99)))
+        summary["errors"] = dict(sorted(self.error_samples.items(), key=lambda item: -item[1])[:5])
+        return summary
+
+
+class LoadRunner:
+    def __init__(self, endpoints, cases, mode="closed", concurrency=10, rps=100.0, duration=10.0,
+                 max_inflight=None):
+        """
+        压测执行器, 多个接口同时施压, 并发数与 RPS 按接口分别计算
+
+        Args:
+            endpoints: Endpoint 列表
+            cases: generate_case 读取的用例数据
+            mode: closed 固定并发闭环 / open 固定速率开环
+            concurrency: 闭环模式下每个接口的并发数
+            rps: 开环模式下每个接口的目标速率
+            duration: 持续时间(秒)
+            max_inflight: 开环模式下每个接口最多在途的请求数, 默认取 setting.ASYNC_CONCURRENCY
+        """
+        self.endpoints = endpoints
+        self.cases = cases
+        self.mode = mode
+        self.concurrency = concurrency
+        self.rps = rps
+        self.duration = duration
+        self.max_inflight = max_inflight or setting.ASYNC_CONCURRENCY
+        self.stats = {endpoint.name: EndpointStats(endpoint.name) for endpoint in endpoints}
+        self.elapsed = 0.0
+
+    def _requests(self, endpoint):
+        # 循环读取用例数据, 不缓存已读取的行, 按需生成的用例集也不会被展开
+        rows = self.cases[endpoint.case]
+        while True:
+            empty = True
+            for row in rows:
+                empty = False
+                yield endpoint.request(row)
+            if empty:
+                raise ValueError(f"no cases for endpoint {endpoint.name}: {endpoint.case}")
+
+    async def _send(self, sender, request, stats, start):
+        request = dict(request)
+        send_result = await sender.request(request.pop("method"), request.pop("url"), **request)
+        stats.record(send_result, (time.perf_counter() - start) * 1000)
+
+    async def _closed_loop(self, sender, endpoint, deadline):
+        requests = self._requests(endpoint)
+        stats = self.stats[endpoint.name]
+
+        async def worker():
+            for request in requests:
+                if time.perf_counter() >= deadline:
+                    return
+                await self._send(sender, request, stats, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def _open_loop(self, sender, endpoint, deadline):
+        requests = self._requests(endpoint)
+        stats = self.stats[endpoint.name]
+        slots = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        interval = 1 / self.rps
+        start = time.perf_counter()
+
+        async def send(request, scheduled):
+            try:
+                # 耗时从计划发送时间开始计算, 包含排队等待, 避免协同遗漏
+                await self._send(sender, request, stats, scheduled)
+            finally:
+                slots.release()
+
+        for index, request in enumerate(requests):
+            scheduled = start + index * interval
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.ensure_future(send(request, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def run(self):
+        limit = (self.concurrency if self.mode == "closed" else self.max_inflight) * len(self.endpoints)
+        async with AsyncSender(limit=limit) as sender:
+            start = time.perf_counter()
+            deadline = start + self.duration
+            loop = self._closed_loop if self.mode == "closed" else self._open_loop
+            await asyncio.gather(*(loop(sender, endpoint, deadline) for endpoint in self.endpoints))
+            self.elapsed = time.perf_counter() - start
+        return self.summary()
+
+    def summary(self):
+        return [self.stats[endpoint.name].summary(self.elapsed) for endpoint in self.endpoints]
+
+
+def format_summary(summary):
+    header = f"{'endpoint':<16}{'requests':>10}{'rps':>10}{'err%':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"
+    lines = [header, "-" * len(header)]
+    for row in summary:
+        lines.append(
+            f"{row['endpoint']:<16}{row['requests']:>10}{row['throughput_rps']:>10.1f}"
+            f"{row['error_rate'] * 100:>8.2f}{row['p50_ms']:>10.2f}{row['p90_ms']:>10.2f}"
+            f"{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+        for error, count in row["errors"].items():
+            lines.append(f"    {count} x {error}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.load", description="基于用例数据的接口压测")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS),
+                        help="压测的接口, 可重复指定, 默认 add_api")
+    parser.add_argument("--cases", default=setting.YAML_FILE_PATH, help="用例数据文件")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed: 固定并发闭环; open: 固定速率开环")
+    parser.add_argument("--concurrency", type=int, default=10, help="闭环模式下每个接口的并发数")
+    parser.add_argument("--rps", type=float, default=100.0, help="开环模式下每个接口的目标速率")
+    parser.add_argument("--max-inflight", type=int, default=None, help="开环模式下每个接口最多在途的请求数")
+    parser.add_argument("--duration", type=float, default=10.0, help="持续时间(秒)")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    endpoints = [ENDPOINTS[name] for name in args.endpoint or ["add_api"]]
+    runner = LoadRunner(endpoints, generate_case(args.cases), mode=args.mode, concurrency=args.concurrency,
+                        rps=args.rps, duration=args.duration, max_inflight=args.max_inflight)
+    summary = asyncio.run(runner.run())
+    print(format_summary(summary))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "duration": runner.elapsed, "endpoints": summary}, f,
+                      ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,11 @@
+import atexit
 import logging
 import os
+import queue
 import time
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from config import setting
 
 BASE_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 # 定义日志文件路径
@@ -10,32 +14,129 @@ if not os.path.exists(LOG_PATH):
     os.mkdir(LOG_PATH)
 
 
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, log_queue, overflow="block", sample_every=10):
+        """
+        写入有界队列的日志处理器, 格式化与文件写入由 QueueListener 在后台线程完成
+
+        Args:
+            log_queue: 有界队列
+            overflow: 队列满时的策略, block 等待 / drop 丢弃 / sample 队列过半后只保留每 sample_every 条中的一条;
+                      WARNING 及以上级别的日志始终等待写入, 不会被丢弃
+            sample_every: sample 策略的采样间隔
+
+        Raises:
+            ValueError: 未知的策略, 或 sample 策略使用了不限容量的队列(无法判断是否过半)
+        """
+        if overflow not in ("block", "drop", "sample"):
+            raise ValueError(f"unknown log overflow policy: {overflow}")
+        if overflow == "sample" and log_queue.maxsize <= 0:
+            raise ValueError("log overflow policy sample requires a bounded queue, set LOG_QUEUE_SIZE > 0")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.sample_every = max(sample_every, 1)
+        self.dropped = 0
+        self._seen = 0
+        # 后台线程是否在运行, 由 Logger 启动与停止时设置
+        self.running = False
+        self.listener = None
+
+    def prepare(self, record):
+        # 只合并参数, 格式化留给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        if not self.running and self.listener is not None:
+            # 后台线程已停止(如进程退出时 atexit 之后的日志), 队列不再被消费, 直接在当前线程写入
+            for handler in self.listener.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        super().emit(record)
+
+    def enqueue(self, record):
+        if self.overflow == "block" or record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        if self.overflow == "sample" and self.queue.qsize() >= self.queue.maxsize // 2:
+            self._seen += 1
+            if self._seen % self.sample_every:
+                self.dropped += 1
+                return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """停止时等待队列有空位再放入结束标记, 队列已满时标准库的 put_nowait 会抛出 queue.Full"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
 class Logger:
     def __init__(self):
         # 修正日志文件名格式
         self.logname = os.path.join(LOG_PATH, f"logfile_{time.strftime('%Y%m%d')}.log")
         self.logger = logging.getLogger("log")
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(setting.LOG_LEVEL)
+
+        # 重复创建 Logger 时复用已安装的处理器, 避免日志重复输出
+        self.handler = next((handler for handler in self.logger.handlers
+                             if isinstance(handler, BoundedQueueHandler)), None)
+        if self.handler is not None:
+            self.listener = self.handler.listener
+            return
 
         self.formater = logging.Formatter(
             '[%(asctime)s][%(filename)s %(lineno)d][%(levelname)s]: %(message)s')
 
-        # 创建 RotatingFileHandler 时指定编码为 utf-8
-        self.filelogger = RotatingFileHandler(self.logname, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+        # 创建文件处理器时指定编码为 utf-8, 按大小或时间轮转
+        if setting.LOG_ROTATION == "time":
+            self.filelogger = TimedRotatingFileHandler(self.logname, when=setting.LOG_ROTATE_WHEN,
+                                                       backupCount=setting.LOG_BACKUP_COUNT, encoding='utf-8')
+        else:
+            self.filelogger = RotatingFileHandler(self.logname, maxBytes=setting.LOG_MAX_BYTES,
+                                                  backupCount=setting.LOG_BACKUP_COUNT, encoding='utf-8')
         # 创建 StreamHandler 时指定编码为 utf-8
         self.console = logging.StreamHandler()
         self.console.encoding = 'utf-8'
 
-        self.console.setLevel(logging.DEBUG)
-        self.filelogger.setLevel(logging.DEBUG)
+        self.console.setLevel(setting.LOG_LEVEL)
+        self.filelogger.setLevel(setting.LOG_LEVEL)
         self.filelogger.setFormatter(self.formater)
         self.console.setFormatter(self.formater)
-        self.logger.addHandler(self.filelogger)
-        self.logger.addHandler(self.console)
+
+        self.handler = BoundedQueueHandler(queue.Queue(setting.LOG_QUEUE_SIZE), overflow=setting.LOG_OVERFLOW,
+                                           sample_every=setting.LOG_SAMPLE_EVERY)
+        self.listener = DrainingQueueListener(self.handler.queue, self.filelogger, self.console,
+                                              respect_handler_level=True)
+        self.handler.listener = self.listener
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+        self.handler.running = True
+        atexit.register(self.stop)
+
+    def stop(self):
+        """等待队列中的日志写完并停止后台线程, 之后的日志在写日志的线程中直接写入"""
+        if not self.handler.running:
+            return
+        self.handler.running = False
+        self.listener.stop()
+        if self.handler.dropped:
+            record = self.logger.makeRecord(self.logger.name, logging.WARNING, __file__, 0,
+                                            f"{self.handler.dropped} log records dropped by overflow policy "
+                                            f"{self.handler.overflow}", None, None)
+            for handler in self.listener.handlers:
+                handler.handle(record)
 
 
 logger = Logger().logger
 
 if __name__ == '__main__':
     logger.info("---测试开始---")
-    logger.debug("---测试结束---")
\ No newline at end of file
+    logger.debug("---测试结束---")
@@ -0,0 +1,274 @@
+"""
+按用例拆分耗时: fixture 准备(按 fixture 细分)、Sender 请求、日志/上报、用例代码(断言等)与清理,
+会话结束时输出最慢的 N 个用例; 可选地对执行用例的线程定时采样调用栈, 输出 collapsed stacks 用于生成火焰图
+
+    pytest testcases --profile-top 10
+    pytest testcases --profile-top 10 --profile-stacks report/profile.folded
+    flamegraph.pl report/profile.folded > profile.svg
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from config import setting
+from core.timing import add_decode_hook, add_timing_hook, remove_decode_hook, remove_timing_hook
+
+
+class CaseProfile:
+    """单个用例的分阶段耗时, 单位纳秒"""
+
+    def __init__(self, nodeid):
+        self.nodeid = nodeid
+        self.setup_ns = 0
+        self.call_ns = 0
+        self.teardown_ns = 0
+        self.http_ns = 0
+        self.logging_ns = 0
+        self.requests = 0
+        self.fixtures = Counter()
+        # 没有本进程内的细分数据时(如 --workers 的主进程)只有三个阶段的总耗时
+        self.detailed = False
+
+    @property
+    def total_ns(self):
+        return self.setup_ns + self.call_ns + self.teardown_ns
+
+    @property
+    def body_ns(self):
+        """用例函数中除请求与日志之外的耗时, 包括断言"""
+        return max(self.call_ns - self.http_ns - self.logging_ns, 0)
+
+    def slowest_fixture(self):
+        if not self.fixtures:
+            return None
+        return self.fixtures.most_common(1)[0]
+
+    def to_dict(self):
+        return {
+            "nodeid": self.nodeid,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "setup_ms": round(self.setup_ns / 1e6, 3),
+            "http_ms": round(self.http_ns / 1e6, 3) if self.detailed else None,
+            "logging_ms": round(self.logging_ns / 1e6, 3) if self.detailed else None,
+            "body_ms": round(self.body_ns / 1e6, 3) if self.detailed else None,
+            "teardown_ms": round(self.teardown_ns / 1e6, 3),
+            "requests": self.requests,
+            "fixtures_ms": {name: round(value / 1e6, 3) for name, value in self.fixtures.most_common()},
+        }
+
+
+class StackSampler:
+    def __init__(self, interval=None):
+        """
+        定时采样指定线程的调用栈, 按 collapsed stacks 格式(帧之间以 ; 分隔, 最后是次数)汇总
+
+        Args:
+            interval: 采样间隔(秒), 默认取 setting.PROFILE_SAMPLE_INTERVAL
+        """
+        self.interval = interval or setting.PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        # 当前执行的用例, 为空时不采样; 作为调用栈的根帧
+        self.label = None
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id=None):
+        self._thread_id = thread_id or threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            label = self.label
+            if label is None:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            frames.append(label.replace(";", ",").replace(" ", "_"))
+            self.stacks[";".join(reversed(frames))] += 1
+
+    def write(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class ProfilePlugin:
+    def __init__(self, top=10, stacks_path=None):
+        """
+        pytest 插件: 记录每个用例的分阶段耗时, 结束时输出最慢的 top 个用例
+
+        HTTP 耗时来自 Sender/AsyncSender 的耗时记录, 日志耗时为用例执行期间 logging.Logger.handle 的耗时
+        (包括 rp_logger、core.logger 以及 pytest 的日志捕获); 两者只统计用例函数执行阶段
+
+        Args:
+            top: 输出的用例数量
+            stacks_path: 采样调用栈的输出文件, 为空时不采样
+        """
+        self.top = top
+        self.stacks_path = stacks_path
+        self.profiles = {}
+        # 准备阶段的用例, 用于记录 fixture 耗时
+        self.current = None
+        # 用例函数执行阶段的用例, 用于记录请求与日志耗时
+        self.measuring = None
+        self.sampler = None
+        self._fixture_stack = []
+        self._logging_depth = threading.local()
+        self._handle = None
+
+    def _profile(self, nodeid):
+        profile = self.profiles.get(nodeid)
+        if profile is None:
+            profile = self.profiles[nodeid] = CaseProfile(nodeid)
+        return profile
+
+    def _record_timing(self, timing):
+        profile = self.measuring
+        if profile is not None:
+            profile.http_ns += timing.total_ns
+            profile.requests += 1
+
+    def _record_decode(self, timing, failed):
+        profile = self.measuring
+        if profile is not None:
+            profile.http_ns += timing.decode_ns
+
+    def _patch_logging(self):
+        plugin = self
+        handle = self._handle = logging.Logger.handle
+        depth = self._logging_depth
+
+        def timed_handle(logger, record):
+            profile = plugin.measuring
+            if profile is None or getattr(depth, "value", 0):
+                return handle(logger, record)
+            depth.value = 1
+            start = time.perf_counter_ns()
+            try:
+                return handle(logger, record)
+            finally:
+                profile.logging_ns += time.perf_counter_ns() - start
+                depth.value = 0
+
+        logging.Logger.handle = timed_handle
+
+    @pytest.hookimpl
+    def pytest_sessionstart(self, session):
+        add_timing_hook(self._record_timing)
+        add_decode_hook(self._record_decode)
+        self._patch_logging()
+        if self.stacks_path:
+            self.sampler = StackSampler().start()
+
+    @pytest.hookimpl
+    def pytest_sessionfinish(self, session):
+        remove_timing_hook(self._record_timing)
+        remove_decode_hook(self._record_decode)
+        if self._handle is not None:
+            logging.Logger.handle = self._handle
+            self._handle = None
+        if self.sampler is not None:
+            self.sampler.stop()
+            if self.sampler.stacks:
+                self.sampler.write(self.stacks_path)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_setup(self, item):
+        profile = self._profile(item.nodeid)
+        profile.detailed = True
+        self._enter(item.nodeid, current=profile)
+        try:
+            return (yield)
+        finally:
+            self._enter(None)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        self._enter(item.nodeid, measuring=self._profile(item.nodeid))
+        try:
+            return (yield)
+        finally:
+            self._enter(None)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_teardown(self, item, nextitem):
+        self._enter(item.nodeid)
+        try:
+            return (yield)
+        finally:
+            self._enter(None)
+
+    def _enter(self, label, current=None, measuring=None):
+        self.current = current
+        self.measuring = measuring
+        if self.sampler is not None:
+            self.sampler.label = label
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        # 依赖的 fixture 已在此之前准备好; 在 fixture 内部通过 getfixturevalue 准备的 fixture 从外层扣除
+        self._fixture_stack.append(0)
+        start = time.perf_counter_ns()
+        try:
+            return (yield)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            nested = self._fixture_stack.pop()
+            if self._fixture_stack:
+                self._fixture_stack[-1] += elapsed
+            profile = self.current
+            if profile is not None:
+                profile.fixtures[fixturedef.argname] += elapsed - nested
+
+    @pytest.hookimpl
+    def pytest_runtest_logreport(self, report):
+        profile = self._profile(report.nodeid)
+        setattr(profile, f"{report.when}_ns", int(report.duration * 1e9))
+
+    def slowest(self, top=None):
+        top = self.top if top is None else top
+        return sorted(self.profiles.values(), key=lambda profile: -profile.total_ns)[:top]
+
+    @pytest.hookimpl
+    def pytest_terminal_summary(self, terminalreporter):
+        slowest = self.slowest()
+        if not slowest:
+            return
+        terminalreporter.section(f"slowest {len(slowest)} cases")
+        header = (f"{'total':>10}{'setup':>10}{'http':>10}{'logging':>10}{'body':>10}{'teardown':>10}"
+                  f"  {'slowest fixture':<28}nodeid")
+        terminalreporter.write_line(header)
+
+        def ms(value, detailed=True):
+            return f"{value / 1e6:>10.2f}" if detailed else f"{'-':>10}"
+
+        for profile in slowest:
+            fixture = profile.slowest_fixture()
+            fixture = f"{fixture[0]} {fixture[1] / 1e6:.2f}ms" if fixture else "-"
+            terminalreporter.write_line(
+                f"{ms(profile.total_ns)}{ms(profile.setup_ns)}{ms(profile.http_ns, profile.detailed)}"
+                f"{ms(profile.logging_ns, profile.detailed)}{ms(profile.body_ns, profile.detailed)}"
+                f"{ms(profile.teardown_ns)}  {fixture:<28}{profile.nodeid}")
+        if self.sampler is not None and self.sampler.stacks:
+            terminalreporter.write_line(f"collapsed stacks: {self.stacks_path}")
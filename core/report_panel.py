@@ -1,16 +1,69 @@
-from typing import Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from config import setting
 from core.logger import logger
 
+# 按名称查找已有对象时使用的列表接口
+LIST_ENDPOINTS = {"filter": "filter", "widget": "widget/all", "dashboard": "dashboard"}
+
+# 清理时的删除顺序, 同一类资源并发删除
+CLEANUP_ORDER = ("dashboard", "widget", "filter")
+
 
 class ReportPortalError(Exception):
     """ReportPortal操作异常基类"""
     pass
 
 
+class DashboardSpec:
+    def __init__(self, launch_number: int, case_name: str, dashboard_name: Optional[str] = None,
+                 widget_name: Optional[str] = None, widget_type: str = "launchesTable",
+                 filter_name: Optional[str] = None):
+        """
+        批量创建时的一组 过滤器 + 组件 + 仪表板, 名称相同的对象只创建一次
+
+        Args:
+            launch_number: 要筛选的测试编号
+            case_name: 要筛选的用例名称
+            dashboard_name: 仪表板名称(可选)，默认为"launch_{launch_number}_dashboard"
+            widget_name: 组件名称(可选)，默认为"launch_{launch_number}_{case_name}_widget"
+            widget_type: 组件类型，默认为"launchesTable"
+            filter_name: 过滤器名称(可选)，默认与 create_filter 相同
+        """
+        self.launch_number = launch_number
+        self.case_name = case_name
+        self.dashboard_name = dashboard_name or f"launch_{launch_number}_dashboard"
+        self.widget_name = widget_name or f"launch_{launch_number}_{case_name}_widget"
+        self.widget_type = widget_type
+        self.filter_name = filter_name or f"launch_{launch_number}_{case_name}_filter"
+
+
+class ProvisionResult:
+    """单个 DashboardSpec 的创建结果, 失败时 error 为错误信息"""
+
+    def __init__(self, spec: DashboardSpec):
+        self.spec = spec
+        self.filter_id: Optional[str] = None
+        self.widget_id: Optional[str] = None
+        self.dashboard_id: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error: {self.error}"
+        return f"<ProvisionResult {self.spec.dashboard_name}/{self.spec.widget_name} " \
+               f"filter={self.filter_id} widget={self.widget_id} dashboard={self.dashboard_id} {status}>"
+
+
 class ReportPanel:
-    def __init__(self, base_url: Optional[str] = None, project: Optional[str] = None, token: Optional[str] = None):
+    def __init__(self, base_url: Optional[str] = None, project: Optional[str] = None, token: Optional[str] = None,
+                 max_workers: Optional[int] = None):
         """
         初始化ReportPortal操作类
 
@@ -18,6 +71,7 @@ class ReportPanel:
             base_url: ReportPortal基础URL"
             project: 项目名称
             token: API访问令牌
+            max_workers: 批量操作的并发数，默认取 setting.REPORT_PANEL_CONCURRENCY
         """
         self.base_url = base_url or f"http://10.86.97.157:8080/api/v1/{setting.REPORT_PROJECT}"
         self.token = token or setting.REPORTPORTAL_TOKEN
@@ -28,13 +82,27 @@ class ReportPanel:
             "Content-Type": "application/json"
         }
 
+        self.max_workers = max_workers or setting.REPORT_PANEL_CONCURRENCY
+        # 并发请求共用同一个连接池; 不使用被测接口的 pooled_session, 管理请求不计入请求耗时统计
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.session.headers.update(self.headers)
 
         self.widget_id: Optional[str] = None
         self.filter_id: Optional[str] = None
         self.dashboard_id: Optional[str] = None
 
+        # 名称 -> ID 缓存, key 为 (资源类型, 名称)
+        self._ids: Dict[Tuple[str, str], str] = {}
+        # 本实例创建的资源, cleanup 时删除; 复用的已有资源不删除
+        self._created: List[Tuple[str, str]] = []
+        # 仪表板已包含的组件ID
+        self._dashboard_widgets: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._name_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """
         统一的请求方法
@@ -81,10 +149,21 @@ class ReportPanel:
         """
         if not filter_name:
             filter_name = f"launch_{launch_number}_{case_name}_filter"
+
+        try:
+            self.filter_id = self._create("filter", self._filter_data(launch_number, case_name, filter_name,
+                                                                      description))
+            logger.info(f"成功创建过滤器: {self.filter_id}")
+            return self.filter_id
+        except Exception as e:
+            raise ReportPortalError(f"创建过滤器失败: {str(e)}")
+
+    @staticmethod
+    def _filter_data(launch_number: int, case_name: str, filter_name: str,
+                     description: Optional[str] = None) -> Dict[str, Any]:
         if not description:
             description = f"筛选测试编号 {launch_number} 和用例 {case_name}"
-
-        data = {
+        return {
             "description": description,
             "name": filter_name,
             "type": "launch",
@@ -95,14 +174,6 @@ class ReportPanel:
             "orders": [{"sortingColumn": "startTime", "isAsc": True}]
         }
 
-        try:
-            result = self._make_request("POST", "filter", json=data)
-            self.filter_id = result["id"]
-            logger.info(f"成功创建过滤器: {self.filter_id}")
-            return self.filter_id
-        except Exception as e:
-            raise ReportPortalError(f"创建过滤器失败: {str(e)}")
-
     def create_widget(self, name: str, widget_type: str = "launchesTable",
                       description: Optional[str] = None) -> str:
         """
@@ -122,10 +193,19 @@ class ReportPanel:
         if not self.filter_id:
             raise ReportPortalError("需要先创建过滤器")
 
+        try:
+            self.widget_id = self._create("widget", self._widget_data(name, widget_type, self.filter_id, description))
+            logger.info(f"成功创建组件: {self.widget_id}")
+            return self.widget_id
+        except Exception as e:
+            raise ReportPortalError(f"创建组件失败: {str(e)}")
+
+    @staticmethod
+    def _widget_data(name: str, widget_type: str, filter_id: str,
+                     description: Optional[str] = None) -> Dict[str, Any]:
         if not description:
             description = f"{name} 组件"
-
-        widget_data = {
+        return {
             "description": description,
             "name": name,
             "widgetType": widget_type,
@@ -148,17 +228,9 @@ class ReportPanel:
                     "sortOrder": "DESC",
                 }
             },
-            "filterIds": [self.filter_id]
+            "filterIds": [filter_id]
         }
 
-        try:
-            result = self._make_request("POST", "widget", json=widget_data)
-            self.widget_id = result["id"]
-            logger.info(f"成功创建组件: {self.widget_id}")
-            return self.widget_id
-        except Exception as e:
-            raise ReportPortalError(f"创建组件失败: {str(e)}")
-
     def create_dashboard(self, name: str, description: Optional[str] = None) -> str:
         """
         创建仪表板
@@ -182,8 +254,7 @@ class ReportPanel:
         }
 
         try:
-            result = self._make_request("POST", "dashboard", json=dashboard_data)
-            self.dashboard_id = result["id"]
+            self.dashboard_id = self._create("dashboard", dashboard_data)
             logger.info(f"成功创建仪表板: {self.dashboard_id}")
             return self.dashboard_id
         except Exception as e:
@@ -208,10 +279,18 @@ class ReportPanel:
         if not widget_name:
             widget_name = f"Widget_{self.widget_id}"
 
-        endpoint = f"dashboard/{self.dashboard_id}/add"
+        try:
+            self._add_widget(self.dashboard_id, self.widget_id, self.filter_id, widget_name)
+            logger.info(f"成功将组件 {widget_name}(ID:{self.widget_id}) 添加到仪表板 {self.dashboard_id}")
+            return True
+        except Exception as e:
+            raise ReportPortalError(f"添加组件到仪表板失败: {str(e)}")
+
+    def _add_widget(self, dashboard_id: str, widget_id: str, filter_id: str, widget_name: str):
+        endpoint = f"dashboard/{dashboard_id}/add"
         add_widget_data = {
             "addWidget": {
-                "widgetId": int(self.widget_id),  # 转换为整数
+                "widgetId": int(widget_id),  # 转换为整数
                 "widgetName": widget_name,
                 "widgetType": "launches_table",
                 "widgetSize": {
@@ -223,41 +302,212 @@ class ReportPanel:
                     "positionY": 0  # 默认Y位置
                 },
 
-                "filters": [int(self.filter_id)]
+                "filters": [int(filter_id)]
             }
         }
+        # 根据文档使用PUT方法
+        self._make_request("PUT", endpoint, json=add_widget_data)
+        with self._lock:
+            self._dashboard_widgets.setdefault(str(dashboard_id), set()).add(str(widget_id))
+
+    def iter_pages(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                   page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐条返回分页接口的所有结果, 处理当前页时在后台预取下一页; 提前停止迭代时不会继续请求后续页
+
+        Args:
+            endpoint: API端点路径, 例如 "launch"、"item"
+            params: 查询参数, 例如 {"filter.eq.launchId": 1, "page.sort": "startTime,DESC"}
+            page_size: 每页条数, 默认取 setting.RP_PAGE_SIZE
+
+        Returns:
+            Iterator[dict]: 每一条记录
+
+        Raises:
+            ReportPortalError: 当请求失败时抛出
+        """
+        params = dict(params or {})
+        params["page.size"] = page_size or setting.RP_PAGE_SIZE
+
+        def fetch(page: int) -> Dict[str, Any]:
+            return self._make_request("GET", endpoint, params={**params, "page.page": page})
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = 1
+            future = executor.submit(fetch, page)
+            while future is not None:
+                result = future.result()
+                total_pages = (result.get("page") or {}).get("totalPages") or page
+                future = executor.submit(fetch, page + 1) if page < total_pages else None
+                yield from result.get("content") or []
+                page += 1
+
+    def iter_launches(self, launch_name: Optional[str] = None, **params) -> Iterator[Dict[str, Any]]:
+        """
+        按开始时间从新到旧返回所有 launch(含统计数据)
+
+        Args:
+            launch_name: 只返回该名称的 launch(可选)
+            **params: 其他查询参数
+
+        Returns:
+            Iterator[dict]: launch 记录
+        """
+        params.setdefault("page.sort", "startTime,DESC")
+        if launch_name:
+            params["filter.eq.name"] = launch_name
+        return self.iter_pages("launch", params)
+
+    def get_launch(self, launch_id) -> Dict[str, Any]:
+        """
+        读取单个 launch(含统计数据)
+
+        Args:
+            launch_id: launch ID
+
+        Returns:
+            dict: launch 记录
+        """
+        return self._make_request("GET", f"launch/{launch_id}")
+
+    def iter_test_items(self, launch_id: str, **params) -> Iterator[Dict[str, Any]]:
+        """
+        返回某个 launch 下的所有测试项(含统计数据)
 
+        Args:
+            launch_id: launch ID
+            **params: 其他查询参数
+
+        Returns:
+            Iterator[dict]: 测试项记录
+        """
+        params["filter.eq.launchId"] = launch_id
+        params.setdefault("page.sort", "id,ASC")
+        return self.iter_pages("item", params)
+
+    def _create(self, resource_type: str, data: Dict[str, Any]) -> str:
+        """创建资源并记录到名称缓存与待清理列表"""
+        resource_id = str(self._make_request("POST", resource_type, json=data)["id"])
+        with self._lock:
+            self._ids[(resource_type, data["name"])] = resource_id
+            self._created.append((resource_type, resource_id))
+        return resource_id
+
+    def find_by_name(self, resource_type: str, name: str) -> Optional[str]:
+        """
+        按名称查找已有的过滤器/组件/仪表板, 结果写入本地缓存
+
+        Args:
+            resource_type: filter / widget / dashboard
+            name: 名称
+
+        Returns:
+            str: 资源ID, 不存在时返回 None
+
+        Raises:
+            ReportPortalError: 当请求失败时抛出
+        """
+        key = (resource_type, name)
+        with self._lock:
+            if key in self._ids:
+                return self._ids[key]
+        result = self._make_request("GET", LIST_ENDPOINTS[resource_type],
+                                    params={"filter.eq.name": name, "page.size": 1})
+        content = result.get("content") or []
+        if not content:
+            return None
+        resource = content[0]
+        resource_id = str(resource["id"])
+        with self._lock:
+            self._ids[key] = resource_id
+            if resource_type == "dashboard" and "widgets" in resource:
+                self._dashboard_widgets[resource_id] = {str(widget["widgetId"]) for widget in resource["widgets"]}
+        return resource_id
+
+    def _ensure(self, resource_type: str, name: str, build) -> str:
+        """查找同名资源, 不存在时创建; 同名资源并发创建时只有一个请求生效"""
+        key = (resource_type, name)
+        with self._lock:
+            name_lock = self._name_locks.setdefault(key, threading.Lock())
+        with name_lock:
+            resource_id = self.find_by_name(resource_type, name)
+            if resource_id is None:
+                resource_id = self._create(resource_type, build())
+                logger.info(f"created {resource_type} {name}: {resource_id}")
+            return resource_id
+
+    def _provision(self, spec: DashboardSpec) -> ProvisionResult:
+        result = ProvisionResult(spec)
         try:
-            # 根据文档使用PUT方法
-            self._make_request("PUT", endpoint, json=add_widget_data)
-            logger.info(f"成功将组件 {widget_name}(ID:{self.widget_id}) 添加到仪表板 {self.dashboard_id}")
-            return True
+            result.filter_id = self._ensure("filter", spec.filter_name, lambda: self._filter_data(
+                spec.launch_number, spec.case_name, spec.filter_name))
+            result.widget_id = self._ensure("widget", spec.widget_name, lambda: self._widget_data(
+                spec.widget_name, spec.widget_type, result.filter_id))
+            result.dashboard_id = self._ensure("dashboard", spec.dashboard_name, lambda: {
+                "name": spec.dashboard_name, "description": f"{spec.dashboard_name} 仪表板"})
+            # 同一仪表板的组件依次添加, 已包含的组件不再添加
+            with self._lock:
+                name_lock = self._name_locks[("dashboard", spec.dashboard_name)]
+            with name_lock:
+                if result.widget_id not in self._dashboard_widgets.get(result.dashboard_id, ()):
+                    self._add_widget(result.dashboard_id, result.widget_id, result.filter_id, spec.widget_name)
         except Exception as e:
-            raise ReportPortalError(f"添加组件到仪表板失败: {str(e)}")
+            result.error = str(e)
+            logger.warning(f"failed to provision {spec.dashboard_name}/{spec.widget_name}: {e}")
+        return result
+
+    def provision(self, specs: List[DashboardSpec]) -> List[ProvisionResult]:
+        """
+        批量并发创建过滤器、组件与仪表板并把组件添加到仪表板, 已存在的同名对象直接复用,
+        重复执行不会产生重复的对象
+
+        Args:
+            specs: DashboardSpec 列表, 多个 spec 可以使用同一个仪表板名称
+
+        Returns:
+            list: 与 specs 顺序一致的 ProvisionResult, 单个 spec 失败不影响其他 spec
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._provision, specs))
+        failed = sum(not result.ok for result in results)
+        logger.info(f"provisioned {len(results) - failed}/{len(results)} dashboard widgets")
+        return results
+
+    def _delete(self, resource: Tuple[str, str]) -> bool:
+        resource_type, resource_id = resource
+        try:
+            self._make_request("DELETE", f"{resource_type}/{resource_id}")
+            logger.info(f"成功删除{resource_type}: {resource_id}")
+            return True
+        except ReportPortalError as e:
+            logger.warning(f"删除{resource_type} {resource_id} 失败: {str(e)}")
+            return False
 
     def cleanup(self):
-        """清理创建的所有资源"""
-        resources = []
-        if self.dashboard_id:
-            resources.append(("dashboard", self.dashboard_id))
-        if self.widget_id:
-            resources.append(("widget", self.widget_id))
-        if self.filter_id:
-            resources.append(("filter", self.filter_id))
-
-        for resource_type, resource_id in resources:
-            try:
-                self._make_request("DELETE", f"{resource_type}/{resource_id}")
-                logger.info(f"成功删除{resource_type}: {resource_id}")
-            except ReportPortalError as e:
-                logger.warning(f"删除{resource_type} {resource_id} 失败: {str(e)}")
+        """清理创建的所有资源, 按 仪表板 -> 组件 -> 过滤器 的顺序, 同一类资源并发删除"""
+        with self._lock:
+            resources = list(dict.fromkeys(self._created))
+            self._created.clear()
+        for resource_type, resource_id in (("dashboard", self.dashboard_id), ("widget", self.widget_id),
+                                           ("filter", self.filter_id)):
+            if resource_id and (resource_type, str(resource_id)) not in resources:
+                resources.append((resource_type, str(resource_id)))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for resource_type in CLEANUP_ORDER:
+                list(executor.map(self._delete, [resource for resource in resources if resource[0] == resource_type]))
 
         # 重置所有ID
+        with self._lock:
+            deleted = set(resources)
+            self._ids = {key: value for key, value in self._ids.items() if (key[0], value) not in deleted}
+            for resource_type, resource_id in resources:
+                if resource_type == "dashboard":
+                    self._dashboard_widgets.pop(resource_id, None)
         self.dashboard_id = None
         self.widget_id = None
         self.filter_id = None
 
-
 if __name__ == '__main__':
     try:
         # 示例用法
@@ -0,0 +1,147 @@
+"""
+响应体的有界内存保存: 不超过上限时保存在内存中, 超过时写入临时文件, 读取时通过 mmap 访问, 不复制到内存;
+JSON 在需要时才解析, 安装了 orjson 时使用 orjson
+"""
+import json
+import mmap
+import tempfile
+
+try:
+    import orjson
+except ImportError:
+    # 可选依赖, 未安装时使用标准库
+    orjson = None
+
+from config import setting
+
+
+def loads(data):
+    """
+    解析 JSON; orjson 直接解析 memoryview, 不复制响应体.
+    标准库没有增量解析, 未安装 orjson 时会把整个响应体解码为一个 str, 额外内存与响应体大小成正比,
+    解析落盘的大响应体时应安装 orjson
+
+    Args:
+        data: bytes / memoryview / str
+
+    Raises:
+        ValueError: 不是合法的 JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        # 直接从 memoryview 解码, 避免先复制为 bytes 再解码的第二份拷贝
+        data = str(data, json.detect_encoding(bytes(data[:4])), "surrogatepass")
+    return json.loads(data)
+
+
+class ResponseBody:
+    def __init__(self, memory_cap=None):
+        """
+        Args:
+            memory_cap: 内存中保存的最大字节数, 默认取 setting.RESPONSE_MEMORY_CAP
+        """
+        self.memory_cap = setting.RESPONSE_MEMORY_CAP if memory_cap is None else memory_cap
+        self.size = 0
+        self._chunks = []
+        self._data = None
+        self._file = None
+        self._map = None
+
+    @classmethod
+    def from_bytes(cls, data, memory_cap=None):
+        body = cls(memory_cap)
+        body.write(data)
+        return body
+
+    @property
+    def spilled(self):
+        """响应体是否已写入临时文件"""
+        return self._file is not None
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._chunks.append(chunk)
+        if self.size > self.memory_cap:
+            self._file = tempfile.TemporaryFile(prefix="response_", dir=setting.RESPONSE_SPILL_PATH)
+            for data in self._chunks:
+                self._file.write(data)
+            self._chunks = []
+
+    def view(self):
+        """
+        不复制的只读视图
+
+        Returns:
+            memoryview: 内存中的响应体或临时文件的 mmap
+        """
+        if self._file is None:
+            if self._data is None:
+                self._data = b"".join(self._chunks)
+                self._chunks = [self._data]
+            return memoryview(self._data)
+        if self._map is None:
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._map)
+
+    def read(self):
+        """完整的响应体, 写入临时文件的响应体会被整体读入内存"""
+        view = self.view()
+        if self._file is None:
+            return self._data
+        try:
+            return view.tobytes()
+        finally:
+            view.release()
+
+    def json(self):
+        """
+        解析为 JSON
+
+        Raises:
+            ValueError: 不是合法的 JSON
+        """
+        view = self.view()
+        try:
+            return loads(view)
+        finally:
+            view.release()
+
+    def preview(self, limit=None):
+        """
+        截断后的文本, 用于写入日志
+
+        Args:
+            limit: 最多保留的字节数, 默认取 setting.RESPONSE_PREVIEW_BYTES
+        """
+        limit = setting.RESPONSE_PREVIEW_BYTES if limit is None else limit
+        view = self.view()
+        try:
+            text = view[:limit].tobytes().decode("utf-8", "replace")
+        finally:
+            view.release()
+        if self.size > limit:
+            text += f"... ({self.size} bytes)"
+        return text
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._chunks = []
+        self._data = None
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"ResponseBody({self.size} bytes{', spilled' if self.spilled else ''})"
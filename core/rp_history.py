@@ -0,0 +1,281 @@
+"""
+ReportPortal 历史数据的本地缓存与趋势查询
+
+    # 同步(只拉取上次同步之后新增或仍在执行中的 launch)
+    python -m core.rp_history sync --launch-name api-test
+    # 最近 20 次 launch 中每个用例的通过率与耗时
+    python -m core.rp_history trend --last 20 --launch-name api-test
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import setting
+from core.logger import logger
+from core.report_panel import ReportPanel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS launches (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT,
+    name TEXT,
+    number INTEGER,
+    status TEXT,
+    start_time INTEGER,
+    end_time INTEGER,
+    total INTEGER,
+    passed INTEGER,
+    failed INTEGER,
+    skipped INTEGER,
+    synced_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS launches_name ON launches (name, id);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    launch_id INTEGER,
+    name TEXT,
+    unique_id TEXT,
+    type TEXT,
+    status TEXT,
+    has_children INTEGER,
+    start_time INTEGER,
+    end_time INTEGER,
+    duration_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS items_launch ON items (launch_id);
+CREATE INDEX IF NOT EXISTS items_unique_id ON items (unique_id, launch_id);
+"""
+
+# 执行中的 launch 每次同步都会重新拉取
+IN_PROGRESS = "IN_PROGRESS"
+
+
+def _millis(value) -> Optional[int]:
+    """RP 的时间字段可能是毫秒时间戳, 也可能是 ISO 格式字符串"""
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def _executions(record: Dict[str, Any]) -> Dict[str, int]:
+    return ((record.get("statistics") or {}).get("executions")) or {}
+
+
+class RPHistory:
+    def __init__(self, panel: Optional[ReportPanel] = None, db_path: Optional[str] = None):
+        """
+        将 launch 与测试项增量保存到本地 SQLite, 趋势查询只读取本地数据
+
+        Args:
+            panel: ReportPanel 实例, 默认新建
+            db_path: SQLite 文件路径, 默认取 setting.RP_HISTORY_DB
+        """
+        self.panel = panel or ReportPanel()
+        self.db_path = db_path or setting.RP_HISTORY_DB
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _synced(self, launch_name: Optional[str]) -> Dict[int, str]:
+        """本地已保存的 launch: {id: status}"""
+        sql = "SELECT id, status FROM launches"
+        args = ()
+        if launch_name:
+            sql += " WHERE name = ?"
+            args = (launch_name,)
+        return dict(self.db.execute(sql, args).fetchall())
+
+    def sync(self, launch_name: Optional[str] = None) -> int:
+        """
+        同步上次之后新增的 launch 以及本地仍为执行中的 launch, 并拉取它们的测试项;
+        launch 按开始时间从新到旧读取, 遇到已同步且已结束的 launch 即停止翻页.
+        每个 launch 读到即先以执行中状态保存, 再开始拉取测试项; 测试项按页写入, 全部写入后才保存 launch 的实际状态
+        作为该 launch 的水位. 拉取失败或中断的 launch 保持执行中状态, 即使更新的 launch 已同步完成,
+        下次同步时也会单独重新拉取
+
+        Args:
+            launch_name: 只同步该名称的 launch(可选)
+
+        Returns:
+            int: 本次更新的 launch 数量
+        """
+        synced = self._synced(launch_name)
+        fetched = set()
+        # 不同 launch 的测试项并发拉取并写入
+        with ThreadPoolExecutor(max_workers=self.panel.max_workers) as executor:
+            futures = []
+            for launch in self.panel.iter_launches(launch_name):
+                status = synced.get(launch["id"])
+                if status is not None and status != IN_PROGRESS:
+                    break
+                fetched.add(launch["id"])
+                # 先标记为执行中, 拉取失败时作为下次同步的起点之后仍能被单独拉取
+                self._store_launch(launch, status=IN_PROGRESS)
+                futures.append(executor.submit(self._sync_launch, launch))
+            # 不在最新一段内、但上次同步时仍在执行(或没有同步完成)的 launch 单独拉取
+            for launch_id, status in synced.items():
+                if status == IN_PROGRESS and launch_id not in fetched:
+                    futures.append(executor.submit(self._sync_launch_id, launch_id))
+            for future in as_completed(futures):
+                future.result()
+        logger.info(f"synced {len(futures)} launches from ReportPortal")
+        return len(futures)
+
+    def _sync_launch_id(self, launch_id: int):
+        self._sync_launch(self.panel.get_launch(launch_id))
+
+    def _sync_launch(self, launch: Dict[str, Any]):
+        """拉取 launch 的测试项, 每页提交一次, 最后保存 launch"""
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM items WHERE launch_id = ?", (launch["id"],))
+        rows = []
+        for item in self.panel.iter_test_items(launch["id"]):
+            start, end = _millis(item.get("startTime")), _millis(item.get("endTime"))
+            rows.append((item["id"], launch["id"], item.get("name"), item.get("uniqueId"), item.get("type"),
+                         item.get("status"), int(bool(item.get("hasChildren"))), start, end,
+                         end - start if start is not None and end is not None else None))
+            if len(rows) >= setting.RP_PAGE_SIZE:
+                self._store_items(rows)
+                rows = []
+        self._store_items(rows)
+        self._store_launch(launch)
+
+    def _store_items(self, rows: List[tuple]):
+        if rows:
+            with self._lock, self.db:
+                self.db.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _store_launch(self, launch: Dict[str, Any], status: Optional[str] = None):
+        """
+        Args:
+            launch: launch 记录
+            status: 保存的状态, 默认取 launch 的状态
+        """
+        executions = _executions(launch)
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO launches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (launch["id"], launch.get("uuid"), launch.get("name"), launch.get("number"), status or launch.get("status"),
+                 _millis(launch.get("startTime")), _millis(launch.get("endTime")), executions.get("total", 0),
+                 executions.get("passed", 0), executions.get("failed", 0), executions.get("skipped", 0),
+                 int(time.time() * 1000)))
+
+    def _last_launches(self, last: int, launch_name: Optional[str]) -> str:
+        """最近 last 次 launch 的子查询"""
+        where = "WHERE name = :launch_name" if launch_name else ""
+        return f"SELECT id FROM launches {where} ORDER BY id DESC LIMIT {int(last)}"
+
+    def case_trend(self, last: int = 10, launch_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        最近 last 次 launch 中每个用例的通过率与耗时; 用例按 RP 的 uniqueId 区分(同名的参数化用例分开统计),
+        name 取最近一次的名称, 只用于显示
+
+        Args:
+            last: launch 数量
+            launch_name: 只统计该名称的 launch(可选)
+
+        Returns:
+            list: [{"unique_id", "name", "runs", "passed", "failed", "pass_rate", "avg_ms", "max_ms", "last_status"}],
+                  按通过率从低到高排序
+        """
+        sql = f"""
+            WITH recent AS (
+                SELECT COALESCE(unique_id, name) AS case_id, launch_id, name, status, duration_ms
+                FROM items
+                WHERE has_children = 0 AND launch_id IN ({self._last_launches(last, launch_name)})
+            )
+            SELECT case_id, COUNT(*) AS runs,
+                   SUM(status = 'PASSED') AS passed,
+                   SUM(status = 'FAILED') AS failed,
+                   AVG(duration_ms) AS avg_ms,
+                   MAX(duration_ms) AS max_ms,
+                   (SELECT r.name FROM recent r WHERE r.case_id = recent.case_id
+                    ORDER BY r.launch_id DESC LIMIT 1) AS last_name,
+                   (SELECT r.status FROM recent r WHERE r.case_id = recent.case_id
+                    ORDER BY r.launch_id DESC LIMIT 1) AS last_status
+            FROM recent
+            GROUP BY case_id
+            ORDER BY CAST(passed AS REAL) / runs, last_name, case_id
+        """
+        rows = self.db.execute(sql, {"launch_name": launch_name}).fetchall()
+        return [{"unique_id": case_id, "name": name, "runs": runs, "passed": passed, "failed": failed,
+                 "pass_rate": round(passed / runs, 4) if runs else 0.0,
+                 "avg_ms": round(avg_ms, 1) if avg_ms is not None else None, "max_ms": max_ms,
+                 "last_status": last_status}
+                for case_id, runs, passed, failed, avg_ms, max_ms, name, last_status in rows]
+
+    def launch_trend(self, last: int = 10, launch_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        最近 last 次 launch 的通过率与总耗时, 按时间从旧到新排序
+
+        Args:
+            last: launch 数量
+            launch_name: 只统计该名称的 launch(可选)
+
+        Returns:
+            list: [{"id", "name", "number", "status", "total", "passed", "failed", "pass_rate", "duration_ms"}]
+        """
+        sql = f"""
+            SELECT id, name, number, status, total, passed, failed, end_time - start_time
+            FROM launches WHERE id IN ({self._last_launches(last, launch_name)}) ORDER BY id
+        """
+        rows = self.db.execute(sql, {"launch_name": launch_name}).fetchall()
+        return [{"id": launch_id, "name": name, "number": number, "status": status, "total": total,
+                 "passed": passed, "failed": failed, "pass_rate": round(passed / total, 4) if total else 0.0,
+                 "duration_ms": duration_ms}
+                for launch_id, name, number, status, total, passed, failed, duration_ms in rows]
+
+
+def format_case_trend(rows: List[Dict[str, Any]]) -> str:
+    header = f"{'pass%':>8}{'runs':>6}{'failed':>8}{'avg_ms':>10}{'max_ms':>10}  {'last':<8}name"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(f"{row['pass_rate'] * 100:>8.1f}{row['runs']:>6}{row['failed']:>8}"
+                     f"{row['avg_ms'] if row['avg_ms'] is not None else '-':>10}"
+                     f"{row['max_ms'] if row['max_ms'] is not None else '-':>10}  "
+                     f"{row['last_status'] or '-':<8}{row['name']}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.rp_history", description="ReportPortal 历史数据同步与趋势查询")
+    parser.add_argument("command", choices=["sync", "trend"], help="sync: 增量同步; trend: 同步后输出用例趋势")
+    parser.add_argument("--launch-name", help="只处理该名称的 launch")
+    parser.add_argument("--last", type=int, default=10, help="趋势统计的 launch 数量")
+    parser.add_argument("--db", default=setting.RP_HISTORY_DB, help="SQLite 文件路径")
+    parser.add_argument("--offline", action="store_true", help="trend 时不同步, 只读取本地数据")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with RPHistory(db_path=args.db) as history:
+        if args.command == "sync" or not args.offline:
+            print(f"synced {history.sync(args.launch_name)} launches")
+        if args.command == "trend":
+            print(format_case_trend(history.case_trend(args.last, args.launch_name)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,887 @@
+"""
+按用例依赖关系调度, 多进程并行执行
+
+用例通过 depends 标记声明步骤名称、依赖的步骤以及关联参数:
+
+    @pytest.mark.depends("del_device", after=["add_device"], key="host")
+
+同一 host 的 del_device 在 add_device 之后执行。依赖关系构成 DAG, 有依赖关系的用例组成一个执行单元,
+单元内按拓扑顺序串行执行, 不同单元(如不同设备)互不影响。
+
+使用 --workers N 时主进程不执行用例, 而是启动 N 个 pytest 子进程, 子进程通过本地 socket 依次领取执行单元,
+并把每个用例的 logstart/logreport/logfinish 以及请求耗时记录回传给主进程; 主进程重放这些结果,
+终端输出、junitxml、pytest 缓存、接口耗时报告等插件看到的结果与串行执行时一致, 子进程上报到主进程的同一个 launch。
+
+--shard-by host(默认)时同一 host 的用例归入同一个执行单元, 并预先分配给固定的子进程:
+有历史耗时(pytest 缓存)时按耗时均衡分配, 否则按 host 的稳定哈希分配; 子进程做完自己的单元后从其他子进程窃取。
+
+使用 --coordinator host:port 时主进程作为 coordinator 在该地址上等待其他机器上的 worker 加入,
+worker 使用相同的代码与用例数据执行 pytest testcases --scheduler-connect host:port, 并通过环境变量 SCHEDULER_TOKEN
+(或 --scheduler-token)提供与 coordinator 相同的口令; worker 断开时正在执行的用例记为失败,
+已领取但还没有执行的用例重新分配给其他 worker
+"""
+import argparse
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import os
+import secrets
+import shlex
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from queue import Empty, Queue
+
+import pytest
+from _pytest.reports import TestReport
+
+from config import setting
+from core.logger import logger
+from core.timing import RequestTiming, add_timing_hook, emit_timing, remove_timing_hook
+
+MARKER = "depends"
+
+# pytest 缓存(.pytest_cache)中保存每个用例历史耗时的 key
+DURATIONS_KEY = "api/durations"
+
+# 主进程没有启用 ReportPortal 时不传给子进程的参数
+WORKER_DROP_ARGS = ("--reportportal",)
+
+# 只在主进程中生效、不传给子进程的参数(带参数值); 口令通过环境变量传给子进程, 不出现在命令行中
+COORDINATOR_ARGS = ("--coordinator", "--scheduler-token")
+
+# 子进程从环境变量读取口令
+TOKEN_ENV = "SCHEDULER_TOKEN"
+
+
+def _key_value(item, key):
+    """用例参数中关联依赖的值, 单元素列表(如 del_device 的 [host])取第一个元素"""
+    callspec = getattr(item, "callspec", None)
+    if callspec is None or key not in callspec.params:
+        return None
+    value = callspec.params[key]
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    return None if value is None else str(value)
+
+
+def _declaration(marker):
+    name = marker.args[0] if marker.args else marker.kwargs.get("name")
+    after = marker.kwargs.get("after", ())
+    if isinstance(after, str):
+        after = (after,)
+    return name, tuple(after), marker.kwargs.get("key", "host")
+
+
+def dependency_edges(items):
+    """
+    根据 depends 标记计算依赖边
+
+    后继用例在前驱用例之后执行; 任意一方没有关联参数时, 依赖该步骤的全部用例
+
+    Returns:
+        dict: {前驱下标: {后继下标}}
+    """
+    # 每个步骤的全部用例, 以及按 (步骤, 关联参数值) 索引的用例; 没有关联参数的用例与同一步骤的任意值匹配
+    steps = defaultdict(list)
+    by_value = defaultdict(list)
+    declared = {}
+    for index, item in enumerate(items):
+        marker = item.get_closest_marker(MARKER)
+        if marker is None:
+            continue
+        name, after, key = _declaration(marker)
+        value = _key_value(item, key)
+        declared[index] = (after, value)
+        if name:
+            steps[name].append(index)
+            by_value[(name, value)].append(index)
+    edges = defaultdict(set)
+    for index, (after, value) in declared.items():
+        for step in after:
+            if value is None:
+                others = steps.get(step, ())
+            else:
+                others = itertools.chain(by_value.get((step, value), ()), by_value.get((step, None), ()))
+            for other in others:
+                if other != index:
+                    edges[other].add(index)
+    return edges
+
+
+def topological_order(items, edges):
+    """
+    稳定的拓扑排序, 没有依赖约束的用例保持收集顺序
+
+    Raises:
+        pytest.UsageError: 依赖存在环
+    """
+    indegree = [0] * len(items)
+    for successors in edges.values():
+        for index in successors:
+            indegree[index] += 1
+    ready = [index for index, degree in enumerate(indegree) if degree == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        index = heapq.heappop(ready)
+        order.append(index)
+        for successor in edges.get(index, ()):
+            indegree[successor] -= 1
+            if indegree[successor] == 0:
+                heapq.heappush(ready, successor)
+    if len(order) != len(items):
+        cycle = sorted(items[index].nodeid for index, degree in enumerate(indegree) if degree)
+        raise pytest.UsageError(f"depends markers form a cycle: {', '.join(cycle[:5])}")
+    return order
+
+
+def build_units(items, affinity=None):
+    """
+    将用例划分为执行单元: 依赖图中连通的用例为一个单元, 单元内按拓扑顺序排列
+
+    Args:
+        items: 收集到的用例
+        affinity: 参数名, 该参数值相同的用例(如同一 host)也归入同一个单元
+
+    Returns:
+        list: [[item, ...], ...], 按单元在拓扑序中首次出现的顺序排列
+    """
+    edges = dependency_edges(items)
+    parent = list(range(len(items)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for index, successors in edges.items():
+        for successor in successors:
+            parent[find(successor)] = find(index)
+    if affinity:
+        first = {}
+        for index, item in enumerate(items):
+            value = _key_value(item, affinity)
+            if value is not None:
+                parent[find(index)] = find(first.setdefault(value, index))
+    units = {}
+    for index in topological_order(items, edges):
+        units.setdefault(find(index), []).append(items[index])
+    return list(units.values())
+
+
+def _stable_hash(unit, affinity):
+    """单元的稳定哈希: 优先使用 affinity 参数值, 没有时使用第一个用例的 nodeid"""
+    value = next((value for value in (_key_value(item, affinity) for item in unit) if value is not None),
+                 unit[0].nodeid)
+    return zlib.crc32(value.encode("utf-8"))
+
+
+def partition(units, workers, durations=None, affinity="host"):
+    """
+    将执行单元预先分配给各子进程
+
+    有历史耗时时按 最长处理时间优先 分配: 单元按预计耗时从大到小依次分给当前负载最小的子进程,
+    没有历史耗时的用例按已知用例的平均耗时估算; 完全没有历史耗时时按稳定哈希取模分配
+
+    Args:
+        units: build_units 的结果
+        workers: 子进程数量
+        durations: 历史耗时 {nodeid: 秒}
+        affinity: 计算稳定哈希使用的参数名
+
+    Returns:
+        tuple: (每个子进程的单元列表, 每个子进程的预计耗时(秒), 没有历史耗时时为 None)
+    """
+    durations = durations or {}
+    partitions = [[] for _ in range(workers)]
+    known = [durations[item.nodeid] for unit in units for item in unit if item.nodeid in durations]
+    if not known:
+        for unit in units:
+            partitions[_stable_hash(unit, affinity) % workers].append(unit)
+        return partitions, None
+    default = sum(known) / len(known)
+    weighted = sorted(((sum(durations.get(item.nodeid, default) for item in unit), _stable_hash(unit, affinity),
+                        position, unit) for position, unit in enumerate(units)),
+                      key=lambda entry: (-entry[0], entry[1], entry[2]))
+    loads = [0.0] * workers
+    assigned = [[] for _ in range(workers)]
+    for weight, _, position, unit in weighted:
+        worker = loads.index(min(loads))
+        loads[worker] += weight
+        assigned[worker].append((position, unit))
+    # 每个子进程内仍按收集顺序执行
+    for worker, entries in enumerate(assigned):
+        partitions[worker] = [unit for _, unit in sorted(entries, key=lambda entry: entry[0])]
+    return partitions, loads
+
+
+class Channel:
+    def __init__(self, sock):
+        """
+        按行传输 JSON 消息的 socket 连接
+
+        Args:
+            sock: 已连接的 socket
+        """
+        self.sock = sock
+        self._file = sock.makefile("rwb")
+        self._lock = threading.Lock()
+
+    def send(self, **message):
+        data = json.dumps(message, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+
+    def recv(self):
+        """读取一条消息, 连接关闭时返回 None"""
+        line = self._file.readline()
+        return json.loads(line) if line else None
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self.sock.close()
+
+
+class WorkerState:
+    """主进程中记录的单个子进程(或远程 worker)状态"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.connected = False
+        self.lost = False
+
+
+def _suite_files(config):
+    """命令行中的用例路径下的全部 .py 文件, 以及这些路径到 rootdir 之间各级目录的 conftest.py"""
+    root = config.rootpath
+    files = set()
+    for arg in config.args:
+        path = (config.invocation_params.dir / arg.split("::", 1)[0]).resolve()
+        if path.is_dir():
+            files.update(path.rglob("*.py"))
+        elif path.is_file():
+            files.add(path)
+        directory = path if path.is_dir() else path.parent
+        while directory == root or root in directory.parents:
+            if (directory / "conftest.py").is_file():
+                files.add(directory / "conftest.py")
+            if directory == root:
+                break
+            directory = directory.parent
+    return sorted(path for path in files if "__pycache__" not in path.parts)
+
+
+def suite_digest(config, path=None):
+    """
+    用例数据文件以及用例代码(测试模块与 conftest.py)的哈希, 远程 worker 的用例数据或代码与主进程不一致时拒绝其加入
+
+    Args:
+        config: pytest config, 用例代码取命令行中的用例路径
+        path: 用例数据文件, 默认取 setting.YAML_FILE_PATH
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(path or setting.YAML_FILE_PATH, "rb") as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+    for file in _suite_files(config):
+        # 不同机器上的检出目录可以不同, 只使用相对路径
+        digest.update(os.path.relpath(file, config.rootpath).replace(os.sep, "/").encode("utf-8") + b"\0")
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+class Coordinator:
+    def __init__(self, units=(), partitions=(), host="127.0.0.1", port=0, digest=None, token=None):
+        """
+        向子进程分发执行单元, 并把子进程回传的消息放入 events 队列, 由主线程依次处理
+
+        子进程没有可领取的单元时从其他子进程窃取: 先取剩余最多的预分配单元(全部子进程都已连接,
+        或开始分发超过 setting.SCHEDULER_STEAL_GRACE 秒后), 空闲时再取其他子进程已领取、
+        还没有开始执行的单元(子进程开始执行一个单元前需要确认该单元没有被窃取);
+        子进程断开时, 正在执行的用例由主进程记为失败, 已领取但还没有执行的用例重新放回队列由其他子进程执行
+
+        Args:
+            units: 任意子进程都可以领取的执行单元, [[nodeid, ...], ...]
+            partitions: 预先分配给各子进程的执行单元, 第 i 个列表只分给编号为 i 的子进程
+            host: 监听地址
+            port: 监听端口, 0 表示随机端口
+            digest: 用例数据与代码的哈希(suite_digest), 与子进程发送的不一致时拒绝该子进程
+            token: 共享口令, 子进程的 hello 中口令不一致时拒绝该子进程
+        """
+        self.units = deque(units)
+        self.partitions = {worker_id: deque(units) for worker_id, units in enumerate(partitions)}
+        self.digest = digest
+        self.token = token
+        self.events = Queue()
+        self.stopping = False
+        # 每个子进程已领取、还没有开始执行的单元 {worker_id: {单元编号: [nodeid, ...]}}
+        self.claimed = defaultdict(dict)
+        # 每个子进程已领取、还没有执行完的用例
+        self.outstanding = defaultdict(list)
+        # 每个子进程正在执行的用例
+        self.running = {}
+        self.workers = set()
+        # 连接过的子进程, 用于判断预分配单元的所有者是否都已连接
+        self.registered = set()
+        self.started = None
+        self.steals = 0
+        self._unit_ids = itertools.count()
+        self._lock = threading.Lock()
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                # 远程 worker 断网时依靠 keepalive 发现连接已断开
+                self.request.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                coordinator._serve(Channel(self.request))
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self._thread = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self.server.serve_forever, name="scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread = None
+        self.server.server_close()
+
+    def next_unit(self, worker_id, idle=True):
+        """
+        为子进程领取下一个执行单元: 先取分配给该子进程的, 再取公共的, 最后从其他子进程窃取
+
+        Args:
+            worker_id: 子进程编号
+            idle: 子进程手上是否已经没有用例; 只有空闲时才窃取其他子进程已领取的单元
+
+        Returns:
+            tuple: (单元编号, [nodeid, ...]); 暂时没有可领取的单元但其他子进程还有未完成的用例(可能重新放回队列)时
+            返回 (None, []), 全部领取完或正在停止时返回 (None, None)
+        """
+        with self._lock:
+            if self.stopping:
+                return None, None
+            unit = self._take(worker_id, idle)
+            if unit is None:
+                # 其他子进程还有未完成的用例, 或还有暂时不能窃取的预分配单元
+                busy = any(nodeids for other, nodeids in self.outstanding.items() if other != worker_id) \
+                    or any(self.partitions.values())
+                return None, [] if busy else None
+            unit_id = next(self._unit_ids)
+            self.claimed[worker_id][unit_id] = unit
+            self.outstanding[worker_id].extend(unit)
+            return unit_id, unit
+
+    def _take(self, worker_id, idle):
+        own = self.partitions.get(worker_id)
+        if own:
+            return own.popleft()
+        if self.units:
+            return self.units.popleft()
+        # 其他子进程还没有领取的预分配单元, 从剩余最多的子进程末尾窃取
+        victim = max(self.partitions, key=lambda other: len(self.partitions[other]), default=None)
+        if victim is not None and self.partitions[victim] and self._may_steal():
+            self.steals += 1
+            logger.info(f"worker {worker_id} steals a unit from the partition of worker {victim}")
+            return self.partitions[victim].pop()
+        if not idle:
+            return None
+        # 其他子进程已领取、但排在正在执行的用例之后的单元, 从未完成用例最多的子进程窃取
+        victims = [other for other, claimed in self.claimed.items() if other != worker_id and claimed
+                   and len(self.outstanding[other]) > len(claimed[next(reversed(claimed))])]
+        if not victims:
+            return None
+        victim = max(victims, key=lambda other: len(self.outstanding[other]))
+        unit_id = next(reversed(self.claimed[victim]))
+        unit = self.claimed[victim].pop(unit_id)
+        outstanding = self.outstanding[victim]
+        for nodeid in unit:
+            outstanding.remove(nodeid)
+        self.steals += 1
+        logger.info(f"worker {worker_id} steals {len(unit)} tests claimed by worker {victim}")
+        return unit
+
+    def _may_steal(self):
+        """预分配单元的所有者都已连接(断开的子进程的单元已放回公共队列), 或已超过等待时长"""
+        if set(self.partitions) <= self.registered:
+            return True
+        return self.started is not None and time.monotonic() - self.started >= setting.SCHEDULER_STEAL_GRACE
+
+    def start_unit(self, worker_id, unit_id):
+        """子进程开始执行单元前确认, 单元已被其他子进程窃取时返回 False"""
+        with self._lock:
+            return self.claimed[worker_id].pop(unit_id, None) is not None
+
+    def _accept(self, message):
+        """
+        Returns:
+            tuple: (子进程编号, 拒绝原因); 远程 worker 没有编号时以 主机名:进程号 作为编号
+        """
+        worker_id = message.get("worker")
+        if worker_id is None:
+            worker_id = f"{message.get('host')}:{message.get('pid')}"
+        if self.token is not None and not hmac.compare_digest(str(message.get("token") or ""), self.token):
+            return worker_id, "invalid token"
+        if self.digest is not None and message.get("digest") != self.digest:
+            return worker_id, "case data or test code differs from the coordinator"
+        with self._lock:
+            if worker_id in self.workers:
+                return worker_id, "duplicate worker id"
+            self.workers.add(worker_id)
+            self.registered.add(worker_id)
+        return worker_id, None
+
+    def _lose(self, worker_id):
+        """子进程断开: 未领取的预分配单元交给其他子进程, 已领取但还没有执行的用例重新放回队列"""
+        with self._lock:
+            self.workers.discard(worker_id)
+            own = self.partitions.pop(worker_id, None)
+            if own:
+                self.units.extend(own)
+            self.claimed.pop(worker_id, None)
+            running = self.running.pop(worker_id, None)
+            requeued = [nodeid for nodeid in self.outstanding.pop(worker_id, []) if nodeid != running]
+            if requeued and not self.stopping:
+                self.units.appendleft(requeued)
+            # 在锁内放入事件, 保证主线程看到的顺序与重新分配的顺序一致
+            self.events.put((worker_id, {"event": "lost", "running": running, "requeued": requeued}))
+
+    def _finished(self, worker_id, nodeid):
+        with self._lock:
+            if self.running.get(worker_id) == nodeid:
+                del self.running[worker_id]
+            outstanding = self.outstanding.get(worker_id)
+            if outstanding and nodeid in outstanding:
+                outstanding.remove(nodeid)
+
+    def _serve(self, channel):
+        worker_id = None
+        try:
+            while True:
+                message = channel.recv()
+                if message is None:
+                    break
+                event = message["event"]
+                if worker_id is None and event != "hello":
+                    logger.warning(f"scheduler connection sent {event!r} before hello, closed")
+                    break
+                if event == "hello":
+                    worker_id, refused = self._accept(message)
+                    channel.send(worker=worker_id, refused=refused)
+                    if refused:
+                        self.events.put((None, {"event": "error", "message": f"worker {worker_id} refused : "
+                                                                             f"{refused}"}))
+                        worker_id = None
+                        break
+                elif event == "next":
+                    unit_id, unit = self.next_unit(worker_id, message.get("idle", True))
+                    channel.send(id=unit_id, unit=unit or None, wait=unit == [])
+                    continue
+                elif event == "start":
+                    channel.send(ok=self.start_unit(worker_id, message["id"]))
+                    continue
+                elif event == "logstart":
+                    with self._lock:
+                        self.running[worker_id] = message["nodeid"]
+                elif event in ("logfinish", "missing"):
+                    self._finished(worker_id, message["nodeid"])
+                self.events.put((worker_id, message))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"scheduler connection from worker {worker_id} failed : {e}")
+        finally:
+            channel.close()
+            if worker_id is not None:
+                self._lose(worker_id)
+
+
+class SchedulerPlugin:
+    def __init__(self, config, workers=0, shard_by="host", listen=None, token=None):
+        """
+        pytest 插件: 按依赖关系排序用例并记录每个用例的耗时; workers 大于 1 或指定 listen 时在主进程中调度
+        子进程并行执行
+
+        Args:
+            config: pytest config
+            workers: 本机子进程数量, 0 或 1 表示在当前进程中串行执行(指定 listen 时为本机额外启动的子进程数量)
+            shard_by: 参数名, 该参数值相同的用例在同一个子进程中执行; 为空时子进程按顺序领取任意单元
+            listen: 作为 coordinator 监听的地址 (host, port), 其他机器上的 worker 通过 --scheduler-connect 加入
+            token: 与 worker 共享的口令, 为空时随机生成
+        """
+        self.config = config
+        self.workers = workers
+        self.shard_by = shard_by
+        self.listen = listen
+        self.token_generated = not token
+        self.token = token or secrets.token_hex(16)
+        self.processes = {}
+        self.states = {}
+        self.cache = getattr(config, "cache", None)
+        self.durations = {}
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        # 串行执行时只在依赖顺序与收集顺序不一致时调整顺序
+        order = topological_order(items, dependency_edges(items))
+        if order != sorted(order):
+            items[:] = [items[index] for index in order]
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        if (self.workers <= 1 and self.listen is None) or session.config.option.collectonly:
+            return None
+        if session.testsfailed and not session.config.option.continue_on_collection_errors:
+            return None
+        if not session.items:
+            return True
+        units = build_units(session.items, self.shard_by)
+        digest = suite_digest(session.config)
+        if self.listen is not None:
+            # worker 数量不固定, 不预先分配; 同一 host 的用例仍在同一个执行单元中
+            coordinator = Coordinator(units=_nodeids(units), host=self.listen[0], port=self.listen[1], digest=digest,
+                                      token=self.token)
+            logger.info(f"coordinating {len(session.items)} tests in {len(units)} units on "
+                        f"{coordinator.address[0]}:{coordinator.address[1]}")
+        elif self.shard_by:
+            history = self.cache.get(DURATIONS_KEY, {}) if self.cache is not None else {}
+            partitions, loads = partition(units, self.workers, history, self.shard_by)
+            coordinator = Coordinator(partitions=[_nodeids(units) for units in partitions], digest=digest,
+                                      token=self.token)
+            sizes = [sum(len(unit) for unit in units) for units in partitions]
+            balance = "hash" if loads is None else "duration, estimated " + ", ".join(f"{load:.1f}s" for load in loads)
+            logger.info(f"sharding {len(session.items)} tests by {self.shard_by} on {self.workers} workers : "
+                        f"{sizes} tests ({balance})")
+        else:
+            coordinator = Coordinator(units=_nodeids(units), digest=digest, token=self.token)
+            logger.info(f"scheduling {len(session.items)} tests in {len(units)} units on {self.workers} workers")
+        coordinator.start()
+        try:
+            self._spawn(coordinator.address)
+            if self.listen is not None:
+                self._announce(coordinator.address)
+            self._run(session, coordinator)
+        finally:
+            coordinator.stopping = True
+            self._terminate()
+            coordinator.stop()
+        if coordinator.steals:
+            logger.info(f"{coordinator.steals} units stolen by idle workers")
+        if session.shouldfail:
+            raise session.Failed(session.shouldfail)
+        if session.shouldstop:
+            raise session.Interrupted(session.shouldstop)
+        return True
+
+    @pytest.hookimpl
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+
+    @pytest.hookimpl
+    def pytest_sessionfinish(self, session):
+        if self.cache is None or not self.durations:
+            return
+        durations = self.cache.get(DURATIONS_KEY, {})
+        durations.update((nodeid, round(duration, 6)) for nodeid, duration in self.durations.items())
+        self.cache.set(DURATIONS_KEY, durations)
+
+    def _rp_launch_id(self):
+        service = getattr(self.config, "py_test_service", None)
+        if not getattr(self.config, "_rp_enabled", False) or getattr(service, "rp", None) is None:
+            return None
+        return service.rp.launch_uuid
+
+    def worker_args(self):
+        """
+        子进程的 pytest 参数: 与当前进程相同的参数; 子进程不写耗时报告文件, 由主进程汇总,
+        启用 ReportPortal 时上报到主进程的 launch
+        """
+        launch_id = self._rp_launch_id()
+        drop = () if launch_id else WORKER_DROP_ARGS
+        args = []
+        skip = False
+        for arg in map(str, self.config.invocation_params.args):
+            name = arg.split("=", 1)[0]
+            if skip or name in drop:
+                skip = False
+                continue
+            if name in COORDINATOR_ARGS:
+                skip = "=" not in arg
+                continue
+            args.append(arg)
+        args += ["--workers", "0", "--no-latency-report"]
+        if launch_id:
+            args += ["--rp-launch-id", launch_id]
+        return args
+
+    def _announce(self, address):
+        host, port = address
+        if host in ("0.0.0.0", "::", ""):
+            host = socket.gethostname()
+        command = " ".join(shlex.quote(arg) for arg in ["pytest", *self.worker_args()])
+        # 命令行指定的口令不写入日志
+        token = self.token if self.token_generated else "<token>"
+        logger.info(f"waiting for workers, start them on other machines (same checkout and case data) with : "
+                    f"{TOKEN_ENV}={token} {command} --scheduler-connect {host}:{port}")
+
+    def _spawn(self, address):
+        host, port = address
+        if host in ("0.0.0.0", "::", ""):
+            host = "127.0.0.1"
+        log_dir = os.path.join(setting.BASE_PATH, "log")
+        os.makedirs(log_dir, exist_ok=True)
+        env = dict(os.environ, **{TOKEN_ENV: self.token})
+        for worker_id in range(self.workers):
+            args = [sys.executable, "-m", "pytest", *self.worker_args(),
+                    "--scheduler-connect", f"{host}:{port}", "--scheduler-worker-id", str(worker_id)]
+            with open(os.path.join(log_dir, f"worker_{worker_id}.log"), "wb") as log:
+                self.processes[worker_id] = subprocess.Popen(
+                    args, cwd=self.config.invocation_params.dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            self.states[worker_id] = WorkerState(worker_id)
+
+    def _terminate(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            try:
+                process.wait(max(deadline - time.monotonic(), 0.1))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def _idle(self, last_event):
+        """本机子进程都已退出, 且(作为 coordinator 时)超过等待时间没有已连接的 worker"""
+        if any(process.poll() is None for process in self.processes.values()):
+            return False
+        if self.listen is None:
+            return True
+        if any(state.connected and not state.lost for state in self.states.values()):
+            return False
+        return time.monotonic() - last_event > setting.COORDINATOR_WAIT_TIMEOUT
+
+    def _run(self, session, coordinator):
+        hook = session.config.hook
+        items = {item.nodeid: item for item in session.items}
+        remaining = set(items)
+        last_event = time.monotonic()
+        while remaining and not (session.shouldfail or session.shouldstop):
+            try:
+                worker_id, message = coordinator.events.get(timeout=0.5)
+            except Empty:
+                if coordinator.events.empty() and self._idle(last_event):
+                    break
+                continue
+            last_event = time.monotonic()
+            event = message["event"]
+            if event == "hello":
+                state = self.states.setdefault(worker_id, WorkerState(worker_id))
+                state.connected = True
+                logger.info(f"worker {worker_id} joined (pid {message.get('pid')} on {message.get('host')})")
+            elif event == "logstart":
+                hook.pytest_runtest_logstart(nodeid=message["nodeid"], location=tuple(message["location"]))
+            elif event == "report":
+                report = hook.pytest_report_from_serializable(config=session.config, data=message["data"])
+                hook.pytest_runtest_logreport(report=report)
+            elif event == "timings":
+                for record in message["records"]:
+                    timing = RequestTiming.from_dict(record)
+                    timing.nodeid = message["nodeid"]
+                    emit_timing(timing)
+            elif event == "logfinish":
+                hook.pytest_runtest_logfinish(nodeid=message["nodeid"], location=tuple(message["location"]))
+                remaining.discard(message["nodeid"])
+            elif event == "missing":
+                self._fail(items[message["nodeid"]], f"not collected on worker {worker_id}")
+                remaining.discard(message["nodeid"])
+            elif event == "error":
+                logger.error(f"worker {worker_id} : {message['message']}")
+            elif event == "lost":
+                self._lost(worker_id, message, items, remaining)
+        if session.shouldfail or session.shouldstop:
+            return
+        # 全部子进程都已退出, 还没有分配出去的用例
+        for nodeid in [nodeid for nodeid in items if nodeid in remaining]:
+            self._fail(items[nodeid], "not executed, all workers exited")
+
+    def _lost(self, worker_id, message, items, remaining):
+        state = self.states.setdefault(worker_id, WorkerState(worker_id))
+        state.lost = True
+        running = message["running"]
+        if running is not None and running in remaining:
+            where = f"see log/worker_{worker_id}.log" if worker_id in self.processes else "see the worker output"
+            self._fail(items[running], f"worker {worker_id} exited before the test finished, {where}")
+            remaining.discard(running)
+        if message["requeued"]:
+            logger.warning(f"worker {worker_id} lost, {len(message['requeued'])} tests requeued")
+
+    def _fail(self, item, message):
+        hook = self.config.hook
+        hook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        report = TestReport(item.nodeid, item.location, {name: 1 for name in item.keywords}, "failed", message,
+                            "call")
+        hook.pytest_runtest_logreport(report=report)
+        hook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+
+def _nodeids(units):
+    return [[item.nodeid for item in unit] for unit in units]
+
+
+class WorkerPlugin:
+    def __init__(self, config, address, worker_id=None, token=None):
+        """
+        子进程(或其他机器上的 worker)中的 pytest 插件: 从主进程领取执行单元并回传结果
+
+        Args:
+            config: pytest config
+            address: 主进程地址 (host, port)
+            worker_id: 子进程编号, 为空时由主进程分配
+            token: 与 coordinator 共享的口令
+        """
+        self.config = config
+        self.address = address
+        self.worker_id = worker_id
+        self.token = token
+        self.channel = None
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def _record(self, timing):
+        with self._lock:
+            # 在 logfinish 时才序列化, 以包含用例执行中补充的响应解析耗时与解析失败
+            self.timings.append(timing)
+
+    def _connect(self):
+        """主进程可能还在收集用例, 在 SCHEDULER_CONNECT_TIMEOUT 内重试连接"""
+        deadline = time.monotonic() + setting.SCHEDULER_CONNECT_TIMEOUT
+        while True:
+            try:
+                return Channel(socket.create_connection(self.address))
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(setting.SCHEDULER_POLL_INTERVAL)
+
+    def _refill(self, pending, idle):
+        """
+        领取下一个执行单元追加到 pending, 每个单元的第一个用例带有单元编号
+
+        Args:
+            pending: deque [(单元编号或 None, nodeid)]
+            idle: 手上是否已经没有用例, 空闲时主进程暂时没有单元可分配则等待
+
+        Returns:
+            bool: 之后是否可能还有单元
+        """
+        while True:
+            self.channel.send(event="next", idle=idle)
+            message = self.channel.recv()
+            if message is None:
+                return False
+            if message["unit"]:
+                pending.extend(zip([message["id"]] + [None] * (len(message["unit"]) - 1), message["unit"]))
+                return True
+            if not message["wait"]:
+                return False
+            if not idle:
+                return True
+            time.sleep(setting.SCHEDULER_POLL_INTERVAL)
+
+    def _start(self, unit_id):
+        self.channel.send(event="start", id=unit_id)
+        message = self.channel.recv()
+        return message is not None and message["ok"]
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        self.channel = self._connect()
+        self.channel.send(event="hello", worker=self.worker_id, host=socket.gethostname(), pid=os.getpid(),
+                          token=self.token, digest=suite_digest(session.config))
+        reply = self.channel.recv()
+        if reply is None or reply["refused"]:
+            self.channel.close()
+            reason = "connection closed" if reply is None else reply["refused"]
+            raise session.Interrupted(f"refused by the coordinator : {reason}")
+        self.worker_id = reply["worker"]
+        if session.testsfailed and not session.config.option.continue_on_collection_errors:
+            self.channel.send(event="error", message=f"{session.testsfailed} errors during collection")
+            self.channel.close()
+            raise session.Interrupted(f"{session.testsfailed} errors during collection")
+        add_timing_hook(self._record)
+        try:
+            self._loop(session)
+        finally:
+            remove_timing_hook(self._record)
+        self.channel.send(event="done")
+        self.channel.close()
+        return True
+
+    def _loop(self, session):
+        items = {item.nodeid: item for item in session.items}
+        pending = deque()
+        more = self._refill(pending, idle=True)
+        while pending or more:
+            if not pending:
+                more = self._refill(pending, idle=True)
+                continue
+            unit_id, nodeid = pending.popleft()
+            if unit_id is not None and not self._start(unit_id):
+                # 该单元已被空闲的子进程窃取
+                while pending and pending[0][0] is None:
+                    pending.popleft()
+                continue
+            # 执行单元的最后一个用例前先领取下一个单元, 以便 session 级 fixture 不被提前销毁
+            if not pending and more:
+                more = self._refill(pending, idle=False)
+            item = items.get(nodeid)
+            if item is None:
+                self.channel.send(event="missing", nodeid=nodeid)
+                continue
+            nextitem = next((items[other] for _, other in pending if other in items), None)
+            item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+            if session.shouldfail or session.shouldstop:
+                break
+
+    @pytest.hookimpl
+    def pytest_runtest_logstart(self, nodeid, location):
+        if self.channel is not None:
+            self.channel.send(event="logstart", nodeid=nodeid, location=list(location))
+
+    @pytest.hookimpl
+    def pytest_runtest_logreport(self, report):
+        if self.channel is not None:
+            data = self.config.hook.pytest_report_to_serializable(config=self.config, report=report)
+            self.channel.send(event="report", data=data)
+
+    @pytest.hookimpl
+    def pytest_runtest_logfinish(self, nodeid, location):
+        if self.channel is not None:
+            with self._lock:
+                timings, self.timings = self.timings, []
+            if timings:
+                self.channel.send(event="timings", nodeid=nodeid, records=[timing.as_dict() for timing in timings])
+            self.channel.send(event="logfinish", nodeid=nodeid, location=list(location))
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"expected host:port, got {value!r}")
+    return host, int(port)
@@ -1,9 +1,21 @@
+import random
 import re
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
+from config import setting
+from core.cassette import current_cassette
 from core.logger import logger
+from core.response_body import ResponseBody
+from core.timing import current_timing, emit_decode, finish_timing, mark_response_end, start_timing
 
 
 def extract_ip_address(input_string):
@@ -14,58 +26,520 @@ def extract_ip_address(input_string):
     return None
 
 
-class Sender:
+class DNSCache:
+    """进程内的域名解析缓存, 同一主机只解析一次"""
+
     def __init__(self):
-        self.session = requests.Session()
+        self._addresses = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """
+        解析主机地址
+
+        Args:
+            host: 主机名或 IP
+            port: 端口
+
+        Returns:
+            str: 解析后的 IP, 解析失败时返回原主机名交给连接层处理
+        """
+        if extract_ip_address(host) == host:
+            return host
+        key = (host, port)
+        with self._lock:
+            address = self._addresses.get(key)
+        if address:
+            return address
+        try:
+            address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        except socket.gaierror as e:
+            logger.warning(f"resolve {host} failed : {e}")
+            return host
+        with self._lock:
+            self._addresses[key] = address
+        return address
+
+    def forget(self, host, port):
+        with self._lock:
+            self._addresses.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._addresses.clear()
+
+
+dns_cache = DNSCache()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """主机被判定为不可用, 请求未发送直接失败"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        """
+        按主机统计连续的连接失败/超时, 达到阈值后熔断, 熔断期间该主机的请求直接失败;
+        超过 reset_timeout 后放行一个探测请求, 成功则恢复, 失败则继续熔断
+
+        Args:
+            failure_threshold: 触发熔断的连续失败次数, 默认取 setting.CIRCUIT_FAILURE_THRESHOLD, 0 表示不熔断
+            reset_timeout: 熔断持续的秒数, 默认取 setting.CIRCUIT_RESET_TIMEOUT
+        """
+        self.failure_threshold = setting.CIRCUIT_FAILURE_THRESHOLD if failure_threshold is None \
+            else failure_threshold
+        self.reset_timeout = setting.CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        # host -> [连续失败次数, 熔断开始时间, 最近一次错误, 是否有探测请求在途]
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host):
+        """
+        熔断中的主机抛出 CircuitOpenError
+
+        Returns:
+            bool: 本次请求是否为熔断后的探测请求, 是则请求结束后必须调用 end_probe
+        """
+        if self.failure_threshold <= 0:
+            return False
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state[1] is None:
+                return False
+            failures, opened_at, error, probing = state
+            if not probing and time.monotonic() - opened_at >= self.reset_timeout:
+                state[3] = True
+                return True
+        raise CircuitOpenError(f"circuit open for {host} after {failures} consecutive failures, "
+                               f"last error: {error}")
+
+    def record_success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host, error):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            state = self._hosts.setdefault(host, [0, None, None, False])
+            state[0] += 1
+            state[2] = error
+            if state[3] or state[0] >= self.failure_threshold:
+                if state[1] is None or state[3]:
+                    logger.warning(f"circuit open for {host} : {error}")
+                state[1] = time.monotonic()
+                state[3] = False
+
+    def end_probe(self, host):
+        """
+        探测请求结束; 既没有记录成功也没有记录失败(如其他异常)时保持熔断, 允许下一个请求继续探测
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state[3] = False
+
+    def is_open(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state[1] is not None
+
+    def reset(self, host=None):
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def backoff_delay(attempt, base=None, maximum=None):
+    """
+    第 attempt 次重试前等待的秒数, 指数退避并加全随机抖动
+
+    Args:
+        attempt: 重试次数, 从 1 开始
+        base: 首次退避的秒数, 默认取 setting.RETRY_BACKOFF
+        maximum: 退避上限, 默认取 setting.RETRY_BACKOFF_MAX
+    """
+    base = setting.RETRY_BACKOFF if base is None else base
+    maximum = setting.RETRY_BACKOFF_MAX if maximum is None else maximum
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+
+class _CachedDNSMixin:
+    """
+    建立连接前通过 dns_cache 解析地址, 连接失败时丢弃缓存的地址;
+    同时将 DNS、建连、TLS 握手与首字节耗时写入当前线程的 RequestTiming
+    """
+
+    def _new_conn(self):
+        timing = current_timing()
+        host = self._dns_host
+        start_ns = time.perf_counter_ns()
+        self._dns_host = dns_cache.resolve(host, self.port)
+        resolved_ns = time.perf_counter_ns()
+        try:
+            return super()._new_conn()
+        except Exception:
+            dns_cache.forget(host, self.port)
+            raise
+        finally:
+            self._dns_host = host
+            if timing is not None:
+                timing.reused = False
+                timing.dns_ns += resolved_ns - start_ns
+                timing.connect_ns += time.perf_counter_ns() - resolved_ns
+
+    def request(self, *args, **kwargs):
+        timing = current_timing()
+        if timing is not None:
+            self._send_start = (time.perf_counter_ns(), timing.setup_ns)
+        return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        timing = current_timing()
+        send_start = getattr(self, "_send_start", None)
+        if timing is not None and send_start is not None:
+            # 首次发送时才建连的情况下, 扣除发送过程中发生的建连耗时
+            start_ns, setup_ns = send_start
+            timing.ttfb_ns = time.perf_counter_ns() - start_ns - (timing.setup_ns - setup_ns)
+            self._send_start = None
+        return response
+
+
+class CachedHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class CachedHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    def connect(self):
+        timing = current_timing()
+        start_ns = time.perf_counter_ns()
+        setup_ns = timing.setup_ns if timing is not None else 0
+        super().connect()
+        if timing is not None:
+            # connect 中除 _new_conn 之外的部分即为 TLS 握手
+            timing.tls_ns += time.perf_counter_ns() - start_ns - (timing.setup_ns - setup_ns)
+
+
+class CachedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedHTTPConnection
+
+
+class CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """使用 dns_cache 建立连接的 HTTPAdapter"""
+
+    def __init__(self, pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE, **kwargs):
+        self.pool_maxsize = pool_maxsize
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CachedHTTPConnectionPool,
+            "https": CachedHTTPSConnectionPool,
+        }
+
+
+def pooled_session(pool_connections=None, pool_maxsize=None):
+    """创建挂载 PooledAdapter 的 keep-alive 会话"""
+    session = requests.Session()
+    session.headers["Connection"] = "keep-alive"
+    adapter = PooledAdapter(pool_connections=pool_connections or setting.POOL_CONNECTIONS,
+                            pool_maxsize=pool_maxsize or setting.POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class SpilledResponse(requests.Response):
+    """
+    响应体写入了临时文件的响应; content / text / json() 在第一次访问时从临时文件读入内存,
+    发送下一个请求后临时文件被关闭, 之后再访问会抛出 RuntimeError
+    """
+
+    @property
+    def content(self):
+        if self._content is False:
+            if not self._spilled_body.spilled:
+                raise RuntimeError(
+                    f"response body of {self.url} ({self._spilled_body.size} bytes) was spilled to a temporary file "
+                    f"that has been closed by a later request")
+            self._content = self._spilled_body.read()
+        return self._content
+
+
+class SenderPool:
+    def __init__(self, pool_connections=None, pool_maxsize=None, host_maxsize=None):
+        """
+        会话级共享的连接池, 由它创建的 Sender 共用同一个 requests.Session,
+        用例之间复用已建立的 TCP/TLS 连接
+
+        Args:
+            pool_connections: 缓存的主机连接池数量, 默认取 setting.POOL_CONNECTIONS
+            pool_maxsize: 每个主机保留的最大连接数, 默认取 setting.POOL_MAXSIZE
+            host_maxsize: 按主机覆盖的连接数 {"host[:port]": size}, 默认取 setting.POOL_HOST_MAXSIZE
+        """
+        self.session = pooled_session(pool_connections, pool_maxsize)
+
+        host_maxsize = setting.POOL_HOST_MAXSIZE if host_maxsize is None else host_maxsize
+        for host, maxsize in host_maxsize.items():
+            self.mount_host(host, maxsize)
+
+    def mount_host(self, host, maxsize):
+        """为指定主机挂载单独大小的连接池"""
+        adapter = PooledAdapter(pool_connections=1, pool_maxsize=maxsize)
+        self.session.mount(f"http://{host}/", adapter)
+        self.session.mount(f"https://{host}/", adapter)
+
+    def sender(self):
+        """创建一个共用连接池的 Sender"""
+        return Sender(session=self.session)
+
+    def warm_up(self, urls, connections=None):
+        """
+        预先解析地址, 并对每个地址并发发送 connections 个 HEAD 请求建立连接, 连接放回连接池供后续用例复用;
+        响应的状态码不影响预热, 请求完成得快时同一连接可能被复用, 实际建立的连接数可能少于 connections
+
+        Args:
+            urls: 需要预热的地址列表
+            connections: 每个地址建立的连接数, 默认取 setting.POOL_WARMUP_CONNECTIONS
+        """
+        connections = setting.POOL_WARMUP_CONNECTIONS if connections is None else connections
+        if connections <= 0:
+            return
+        origins = {f"{parts.scheme}://{parts.netloc}" for parts in map(urlsplit, urls)}
+        for origin in origins:
+            parts = urlsplit(origin)
+            dns_cache.resolve(parts.hostname, parts.port)
+        requests_per_origin = {origin: min(connections, self.session.get_adapter(origin + "/").pool_maxsize)
+                               for origin in origins}
+        with ThreadPoolExecutor(max_workers=sum(requests_per_origin.values()) or 1) as executor:
+            futures = {origin: [executor.submit(self._head, origin) for _ in range(count)]
+                       for origin, count in requests_per_origin.items()}
+            for origin, results in futures.items():
+                errors = [error for error in (future.result() for future in results) if error is not None]
+                if errors:
+                    logger.warning(f"warm up {origin} failed : {errors[0]}")
+                else:
+                    logger.info(f"warm up {len(results)} connections to : {origin}")
+
+    def _head(self, origin):
+        try:
+            self.session.head(origin + "/", timeout=(setting.CONNECT_TIMEOUT, setting.READ_TIMEOUT),
+                              allow_redirects=False).close()
+        except requests.RequestException as e:
+            return e
+        return None
+
+    def close(self):
+        self.session.close()
+
+
+class Sender:
+    def __init__(self, session=None, timeout=None, retries=None, breaker=None, cassette=None, memory_cap=None):
+        """
+        Args:
+            session: 共用的 requests.Session, 默认新建
+            timeout: (连接超时, 读取超时) 秒, 默认取 setting.CONNECT_TIMEOUT / setting.READ_TIMEOUT
+            retries: 幂等请求失败后的重试次数, 默认取 setting.RETRY_TIMES
+            breaker: 按主机熔断的 CircuitBreaker, 默认使用进程内共享的 circuit_breaker
+            cassette: 录制/回放使用的 core.cassette.Cassette, 默认取 use_cassette 设置的 cassette
+            memory_cap: 响应体在内存中保存的最大字节数, 超过时写入临时文件, 默认取 setting.RESPONSE_MEMORY_CAP
+        """
+        self.session = session or pooled_session()
+        self.timeout = timeout or (setting.CONNECT_TIMEOUT, setting.READ_TIMEOUT)
+        self.retries = setting.RETRY_TIMES if retries is None else retries
+        self.breaker = breaker or circuit_breaker
+        self.cassette = cassette if cassette is not None else current_cassette()
+        self.memory_cap = setting.RESPONSE_MEMORY_CAP if memory_cap is None else memory_cap
         self.response = None
-        self.result = None
+        self.body = None
         self.request_time = None
+        self.timing = None
+        self.attempts = 0
+        self._result = None
+        self._decode = False
 
-    def get(self, url, params=None, headers=None):
+    @property
+    def result(self):
+        """
+        响应解析后的 JSON, 第一次访问时才解析; 请求或解析失败时为 {"status": False, "message": 错误信息}
+        """
+        if self._decode:
+            self._decode = False
+            self._result = self._decode_body()
+        return self._result
+
+    @result.setter
+    def result(self, value):
+        self._decode = False
+        self._result = value
+
+    def _decode_body(self):
+        """解析响应体, 耗时记录此前已在请求结束时通知, 解析耗时与解析失败通过 emit_decode 补充"""
+        timing = self.timing
+        failed = timing is not None and timing.failed
+        decode_start = time.perf_counter_ns()
         try:
-            start_time = time.time()
-            self.response = self.session.get(url, params=params, headers=headers)
-            end_time = time.time()
-            self.request_time = end_time - start_time
-            logger.info(f"successful send get request to : {url}")
-        except Exception as e:
-            logger.info(f"request failed : {e}")
+            return self.body.json()
+        except ValueError as e:
+            error = f"{type(e).__name__}: {e}"
+            if timing is not None and timing.error is None:
+                timing.error = error
+            logger.error(f"decode response failed : {error}")
+            return {"status": False, "message": error}
+        finally:
+            if timing is not None:
+                timing.decode_ns = time.perf_counter_ns() - decode_start
+                emit_decode(timing, not failed and timing.failed)
 
-    def post(self, url, params=None, data=None, json=None, headers=None):
+    def preview(self, limit=None):
+        """
+        截断后的响应体文本, 用于写入日志; 请求失败时为错误信息
+
+        Args:
+            limit: 最多保留的字节数, 默认取 setting.RESPONSE_PREVIEW_BYTES
+        """
+        if self.body is None:
+            return str(self._result)
+        return self.body.preview(limit)
+
+    def _read_body(self):
+        """
+        按块读取响应体, 超过 memory_cap 的部分写入临时文件;
+        未超过时响应体同时保留在 response.content 中, 超过时 response.content 在访问时才从临时文件读入内存
+        """
+        body = ResponseBody(self.memory_cap)
         try:
-            start_time = time.time()
-            self.response = self.session.post(
-                url,
-                params=params,
-                data=data,
-                json=json,
-                headers=headers
-            )
-            end_time = time.time()
-            logger.info(f"successful send post request to : {url}")
-            self.result = self.response.json()
-            self.request_time = end_time - start_time
-            return True  # 或者返回 self.response
-        except Exception as e:
-            logger.error(f"request failed : {e}")  # 错误级别建议用 error
-            return False  # 或者 raise 重新抛出异常
+            for chunk in self.response.iter_content(setting.RESPONSE_CHUNK_SIZE):
+                body.write(chunk)
+        except Exception:
+            body.close()
+            raise
+        if body.spilled:
+            self.response.__class__ = SpilledResponse
+            self.response._spilled_body = body
+            self.response._content = False
+        else:
+            self.response._content = body.read()
+        return body
 
-    def delete(self, url, params=None, headers=None):
+    @property
+    def replaying(self):
+        return self.cassette is not None and not self.cassette.recording
+
+    @property
+    def status_code(self):
+        """响应状态码, 请求未收到响应时为 None"""
+        return self.response.status_code if self.response is not None else None
+
+    def _send(self, method, url, decode=True, **kwargs):
+        """
+        发送请求并记录分阶段耗时, 无论成功失败都会设置 timing 与 request_time;
+        幂等方法在连接失败、超时或 setting.RETRY_STATUS 中的状态码时按指数退避重试,
+        主机熔断时不发送请求直接失败. 失败时 result 为 {"status": False, "message": 错误信息}
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            decode: 访问 result 时是否将响应解析为 JSON
+            **kwargs: 其他 requests 参数
+
+        Returns:
+            bool: 请求是否成功, 响应体的 JSON 解析在访问 result 时进行
+        """
+        host = urlsplit(url).netloc
+        retries = self.retries if method in setting.RETRY_METHODS else 0
+        kwargs.setdefault("timeout", self.timeout)
+        self.attempts = 0
+        while True:
+            self.attempts += 1
+            can_retry = self.attempts <= retries
+            ok, retryable = self._attempt(method, url, host, decode, can_retry, **kwargs)
+            if ok or not retryable or not can_retry:
+                return ok
+            # 回放时按录制顺序返回重试的响应, 不需要等待
+            delay = 0 if self.replaying else backoff_delay(self.attempts)
+            logger.info(f"retry {method.lower()} request to : {url} in {delay:.2f}s ({self.attempts}/{retries})")
+            time.sleep(delay)
+
+    def _attempt(self, method, url, host, decode, can_retry, **kwargs):
+        """发送一次请求, 返回 (是否成功, 失败时是否可以重试)"""
+        self.response = None
+        self.result = None
+        if self.body is not None:
+            self.body.close()
+            self.body = None
+        self.timing = timing = start_timing(method, url)
+        probe = False
         try:
-            start_time = time.time()
-            self.response = self.session.delete(url, params=params, headers=headers)
-            end_time = time.time()
-            logger.info(f"successful send delete request to : {url}")
-            self.request_time = end_time - start_time
-            self.result = self.response.json()
-            return True
+            if self.replaying:
+                # 不发送请求, 耗时取录制时的值
+                self.response = self.cassette.replay(method, url, timing, **kwargs)
+                self.body = ResponseBody.from_bytes(self.response.content, self.memory_cap)
+                timing.status_code = self.response.status_code
+                logger.info(f"replay {method.lower()} request to : {url}")
+            else:
+                probe = self.breaker.before_request(host)
+                self.response = self.session.request(method, url, stream=True, **kwargs)
+                timing.status_code = self.response.status_code
+                download_start = time.perf_counter_ns()
+                self.body = self._read_body()
+                timing.download_ns = time.perf_counter_ns() - download_start
+                mark_response_end(timing)
+                self.breaker.record_success(host)
+                logger.info(f"successful send {method.lower()} request to : {url}")
+                if self.cassette is not None:
+                    self.cassette.record(method, url, self.response, timing, body=self.body.read(), **kwargs)
+            if can_retry and self.response.status_code in setting.RETRY_STATUS:
+                timing.error = f"HTTP {self.response.status_code}"
+                self.result = {"status": False, "message": f"HTTP {self.response.status_code} from {url}"}
+                return False, True
+            # 响应体在第一次访问 result 时才解析
+            self._decode = decode
+            return True, False
+        except CircuitOpenError as e:
+            return self._failed(timing, e, retryable=False)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # 每个请求只在重试用尽后计一次失败, 避免一个请求的多次重试就触发熔断
+            if not can_retry:
+                self.breaker.record_failure(host, f"{type(e).__name__}: {e}")
+            return self._failed(timing, e, retryable=True)
         except Exception as e:
-            logger.error(f"request failed : {e}")
-            return False
+            return self._failed(timing, e, retryable=False)
+        finally:
+            if probe:
+                self.breaker.end_probe(host)
+            finish_timing(timing)
+            self.request_time = timing.elapsed_ns / 1e9
+
+    def _failed(self, timing, error, retryable):
+        timing.error = f"{type(error).__name__}: {error}"
+        logger.error(f"request failed : {error}")
+        self.result = {"status": False, "message": timing.error}
+        return False, retryable
+
+    def get(self, url, params=None, headers=None):
+        return self._send("GET", url, decode=False, params=params, headers=headers)
+
+    def post(self, url, params=None, data=None, json=None, headers=None):
+        return self._send("POST", url, params=params, data=data, json=json, headers=headers)
+
+    def delete(self, url, params=None, headers=None):
+        return self._send("DELETE", url, params=params, headers=headers)
 
     def check_status(self):
         """
         检查修改是否成功
-        :return: HTTP 状态码
+        :return: 响应中的 status, 请求失败时为 False
         """
         return self.result["status"]
@@ -0,0 +1,166 @@
+import re
+import threading
+
+import pytest
+
+from core.stats import LatencyHistogram
+from core.timing import add_decode_hook, add_timing_hook, remove_decode_hook, remove_timing_hook
+from data.case_source import CaseSource
+
+# 支持的预算项: pNN_ms / max_ms / mean_ms / error_rate
+_PERCENTILE = re.compile(r"^p(\d+(?:\.\d+)?)_ms$")
+
+
+def _parametrized_case_set(item):
+    """从 parametrize 标记中找到带 slo 声明的用例集"""
+    for marker in item.iter_markers("parametrize"):
+        argvalues = marker.args[1] if len(marker.args) > 1 else marker.kwargs.get("argvalues")
+        if isinstance(argvalues, CaseSource) and argvalues.slo:
+            return argvalues
+    return None
+
+
+class SloGroup:
+    def __init__(self, nodeid, case_set):
+        """
+        同一个用例函数在某个用例集上的全部参数化用例, 耗时增量记录到直方图中
+
+        Args:
+            nodeid: 去掉参数部分的用例 nodeid
+            case_set: 带 slo 声明的用例集
+        """
+        self.nodeid = nodeid
+        self.name = case_set.name
+        self.budget = dict(case_set.slo)
+        for key in self.budget:
+            if key not in ("max_ms", "mean_ms", "error_rate") and not _PERCENTILE.match(key):
+                raise ValueError(f"unknown slo item for {self.name}: {key}")
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self.total = 0
+        self.finished = 0
+        self.violations = None
+        self.lock = threading.Lock()
+
+    def record(self, timing):
+        with self.lock:
+            self.histogram.record(timing.elapsed_ms)
+            if timing.failed:
+                self.errors += 1
+
+    def record_decode(self, failed):
+        if failed:
+            with self.lock:
+                self.errors += 1
+
+    def observed(self, key):
+        if key == "max_ms":
+            return self.histogram.max / 1000 if self.histogram.count else 0.0
+        if key == "mean_ms":
+            return self.histogram.mean
+        if key == "error_rate":
+            return self.errors / self.histogram.count if self.histogram.count else 0.0
+        return self.histogram.percentile(float(_PERCENTILE.match(key).group(1)))
+
+    def evaluate(self):
+        """返回超出预算的项, 形如 [(预算项, 实际值, 预算值)]"""
+        with self.lock:
+            self.violations = [(key, self.observed(key), limit) for key, limit in self.budget.items()
+                               if self.observed(key) > limit]
+        return self.violations
+
+    def describe(self, violations):
+        detail = ", ".join(f"{key} {observed:.3f} > {limit}" for key, observed, limit in violations)
+        return f"SLO of {self.name} violated by {self.nodeid} over {self.histogram.count} requests: {detail}"
+
+
+class SloPlugin:
+    def __init__(self):
+        """
+        pytest 插件: 按 api_data.yml 中用例集声明的 slo 评估同一用例函数所有参数化用例的请求耗时,
+        最后一个参数化用例结束时超出预算则上报一个单独的失败用例 <用例 nodeid>[slo], 不影响数据行本身的结果;
+        用例在子进程中执行(--workers/--coordinator)时, 请求耗时按子进程回传时附带的 nodeid 归属
+        """
+        self.config = None
+        self.groups = {}
+        self.item_groups = {}
+        self.current = None
+
+    def _group(self, timing):
+        return self.current if timing.nodeid is None else self.item_groups.get(timing.nodeid)
+
+    def record(self, timing):
+        group = self._group(timing)
+        if group is not None:
+            group.record(timing)
+
+    def record_decode(self, timing, failed):
+        group = self._group(timing)
+        if group is not None:
+            group.record_decode(failed)
+
+    @pytest.hookimpl
+    def pytest_sessionstart(self, session):
+        self.config = session.config
+        add_timing_hook(self.record)
+        add_decode_hook(self.record_decode)
+
+    @pytest.hookimpl
+    def pytest_sessionfinish(self, session):
+        remove_timing_hook(self.record)
+        remove_decode_hook(self.record_decode)
+
+    @pytest.hookimpl
+    def pytest_collection_finish(self, session):
+        for item in session.items:
+            case_set = _parametrized_case_set(item)
+            if case_set is None:
+                continue
+            nodeid = item.nodeid.split("[", 1)[0]
+            group = self.groups.get(nodeid)
+            if group is None:
+                group = self.groups[nodeid] = SloGroup(nodeid, case_set)
+            group.total += 1
+            self.item_groups[item.nodeid] = group
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        self.current = self.item_groups.get(item.nodeid)
+        try:
+            return (yield)
+        finally:
+            self.current = None
+
+    @pytest.hookimpl
+    def pytest_runtest_logfinish(self, nodeid, location):
+        # 子进程执行时 logfinish 在该用例的耗时记录回传之后重放
+        group = self.item_groups.get(nodeid)
+        if group is None:
+            return
+        group.finished += 1
+        if group.finished == group.total and group.evaluate():
+            self._report_violation(group, location)
+
+    def _report_violation(self, group, location):
+        """以单独的用例上报超出预算, 计入失败数与退出码"""
+        nodeid = f"{group.nodeid}[slo]"
+        location = (location[0], location[1], f"{location[2].split('[', 1)[0]}[slo]")
+        hook = self.config.hook
+        hook.pytest_runtest_logstart(nodeid=nodeid, location=location)
+        report = pytest.TestReport(nodeid, location, keywords={}, outcome="failed",
+                                   longrepr=group.describe(group.violations), when="call", duration=0.0)
+        hook.pytest_runtest_logreport(report=report)
+        hook.pytest_runtest_logfinish(nodeid=nodeid, location=location)
+
+    @pytest.hookimpl
+    def pytest_terminal_summary(self, terminalreporter):
+        groups = [group for group in self.groups.values() if group.histogram.count]
+        if not groups:
+            return
+        terminalreporter.section("latency slo")
+        for group in groups:
+            violations = group.violations if group.violations is not None else group.evaluate()
+            status = "FAILED" if violations else "PASSED"
+            budget = ", ".join(f"{key} {group.observed(key):.3f}/{limit}" for key, limit in group.budget.items())
+            terminalreporter.write_line(f"{status:<8}{group.name} {group.nodeid}: {budget}",
+                                        red=bool(violations), green=not violations)
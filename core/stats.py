@@ -0,0 +1,107 @@
+import math
+
+# 每个数量级内的分桶数为 2 ** (SUB_BUCKET_BITS - 1), 相对误差不超过 1 / 2 ** (SUB_BUCKET_BITS - 1)
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_MASK = (1 << SUB_BUCKET_BITS) - 1
+
+
+def _bucket_key(value):
+    if value <= SUB_BUCKET_MASK:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << SUB_BUCKET_BITS) | (value >> shift)
+
+
+def _bucket_value(key):
+    shift = key >> SUB_BUCKET_BITS
+    if shift == 0:
+        return key
+    lower = (key & SUB_BUCKET_MASK) << shift
+    return lower + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """
+    HDR 风格的对数分桶直方图, 以微秒为单位记录耗时
+
+    桶数量只与耗时的量级相关, 与样本数量无关, 可以长时间持续记录;
+    分位数的相对误差约为 0.8%, 最小值、最大值与平均值为精确值
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, ms):
+        """记录一次耗时(毫秒)"""
+        value = max(int(ms * 1000), 0)
+        key = _bucket_key(value)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count / 1000 if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        计算分位数
+
+        Args:
+            percent: 百分位, 例如 99 表示 p99
+
+        Returns:
+            float: 分位数耗时(毫秒), 没有样本时为 0
+        """
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(self.count * percent / 100), 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen >= rank:
+                value = min(max(_bucket_value(key), self.min), self.max)
+                return value / 1000
+        return self.max / 1000
+
+    def summary(self, percents=(50, 90, 95, 99)):
+        summary = {"count": self.count, "mean_ms": round(self.mean, 3)}
+        for percent in percents:
+            summary[f"p{percent}_ms"] = round(self.percentile(percent), 3)
+        summary["max_ms"] = round(self.max / 1000, 3) if self.count else 0.0
+        return summary
+
+    def to_dict(self):
+        return {
+            "buckets": {str(key): count for key, count in self.buckets.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = {int(key): count for key, count in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
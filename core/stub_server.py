@@ -0,0 +1,277 @@
+"""
+设备接口的本地替身服务, 基于 asyncio 实现, 支持 HTTP/1.1 keep-alive, 可注入延迟与错误
+
+    # 在 8888 端口启动, 每个请求增加 5~10ms 延迟, 1% 返回 500
+    python -m core.stub_server --port 8888 --latency-ms 5 --jitter-ms 5 --error-rate 0.01
+
+用例中通过 stub_server fixture 或 pytest --stub-server 在随机端口启动
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+from config import setting
+from core.logger import logger
+
+# 路径 -> (方法, 请求中 host 的位置)
+ROUTES = {
+    "/api/v1/device/add": ("POST", "json"),
+    "/api/v1/device/delete": ("DELETE", "query"),
+    "/device/add_device": ("POST", "json"),
+    "/device/del_device": ("DELETE", "query"),
+    "/demo": ("POST", "json"),
+}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class Fault:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=500):
+        """
+        注入的故障
+
+        Args:
+            latency_ms: 每个请求固定增加的延迟
+            jitter_ms: 在固定延迟上再随机增加 0~jitter_ms
+            error_rate: 返回错误响应的概率
+            error_status: 错误响应的状态码
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def delay(self):
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+def _response(status, body, keep_alive=True):
+    payload = json.dumps(body).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + payload
+
+
+# 成功响应固定不变, 预先生成
+_OK = _response(200, {"status": True, "message": "success"})
+
+
+class StubServer:
+    def __init__(self, host="127.0.0.1", port=0, fault=None):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口, 0 表示随机端口
+            fault: 全部接口共用的 Fault, 可用 set_fault 按路径覆盖
+        """
+        self.host = host
+        self.port = port
+        self.fault = fault or Fault()
+        self.faults = {}
+        self.requests = Counter()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._connections = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def set_fault(self, path=None, **kwargs):
+        """
+        修改注入的故障, 运行中也可以调用
+
+        Args:
+            path: 只对该路径生效, 为空时修改全部接口共用的故障
+            **kwargs: Fault 的参数
+        """
+        if path is None:
+            self.fault = Fault(**kwargs)
+        else:
+            self.faults[path] = Fault(**kwargs)
+
+    def clear_faults(self):
+        self.fault = Fault()
+        self.faults.clear()
+
+    async def serve(self):
+        """在当前事件循环中启动服务"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"stub server listening on : {self.url}")
+        return self._server
+
+    def start(self):
+        """在后台线程中启动服务, 端口绑定完成后返回"""
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.serve())
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._shutdown())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="stub-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    async def _shutdown(self):
+        """关闭监听并结束仍保持着 keep-alive 连接的处理协程"""
+        self._server.close()
+        for writer in list(self._connections.values()):
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                if len(head) > MAX_HEADER_BYTES:
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, version = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if line:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                response = await self._respond(method, target, body, keep_alive)
+                if method == "HEAD":
+                    # HEAD 的响应只有响应头, 带上响应体会被当作同一连接上下一个响应的开头
+                    response = response[:response.index(b"\r\n\r\n") + 4]
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            return
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _respond(self, method, target, body, keep_alive):
+        parts = urlsplit(target)
+        path = parts.path
+        self.requests[(method, path)] += 1
+        route = ROUTES.get(path)
+        if route is None:
+            return _response(404, {"status": False, "message": f"no such api: {path}"}, keep_alive)
+        expected_method, host_in = route
+        if method != expected_method:
+            return _response(405, {"status": False, "message": f"{method} not allowed on {path}"}, keep_alive)
+
+        fault = self.faults.get(path, self.fault)
+        delay = fault.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        if fault.should_fail():
+            return _response(fault.error_status, {"status": False, "message": "injected error"}, keep_alive)
+
+        if host_in == "json":
+            try:
+                host = (json.loads(body) or {}).get("host")
+            except (ValueError, AttributeError):
+                return _response(400, {"status": False, "message": "invalid json body"}, keep_alive)
+        else:
+            host = (parse_qs(parts.query).get("host") or [None])[0]
+        if not host:
+            return _response(400, {"status": False, "message": "missing host"}, keep_alive)
+        return _OK if keep_alive else _response(200, {"status": True, "message": "success"}, keep_alive)
+
+
+def use_stub_server(server):
+    """
+    将 setting 中的 GO_SERVER / HSOT:PORT / DEMO_SERVER 指向替身服务, 所有接口(core.endpoints)随之切换
+
+    Returns:
+        function: 恢复原配置的函数
+    """
+    names = ("GO_SERVER", "HSOT", "PORT", "DEMO_SERVER", "POOL_WARMUP_URLS")
+    saved = {name: getattr(setting, name) for name in names}
+    setting.GO_SERVER = setting.DEMO_SERVER = server.url
+    setting.HSOT, setting.PORT = server.host, server.port
+    setting.POOL_WARMUP_URLS = [server.url]
+
+    def restore():
+        for name, value in saved.items():
+            setattr(setting, name, value)
+
+    return restore
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.stub_server", description="设备接口的本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8888, help="监听端口, 0 表示随机端口")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每个请求固定增加的延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="在固定延迟上再随机增加的延迟")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误响应的概率")
+    parser.add_argument("--error-status", type=int, default=500, help="错误响应的状态码")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = StubServer(args.host, args.port, Fault(args.latency_ms, args.jitter_ms, args.error_rate,
+                                                     args.error_status))
+
+    async def run():
+        async with await server.serve():
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
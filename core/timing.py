@@ -0,0 +1,164 @@
+import threading
+import time
+
+from core.logger import logger
+
+_local = threading.local()
+_hooks = []
+_decode_hooks = []
+
+
+class RequestTiming:
+    """
+    单次请求的分阶段耗时, 使用 perf_counter_ns 记录, 单位纳秒
+
+    dns/connect/tls 只在新建连接时非零, reused 表示是否复用了连接池中的连接;
+    ttfb 为请求发出到收到响应头的时间, download 为读取响应体的时间, decode 为 JSON 解析时间;
+    Sender 在访问 result 时才解析响应体, decode 与解析失败的 error 在请求结束后通过 emit_decode 补充通知
+    """
+
+    PHASES = ("dns", "connect", "tls", "ttfb", "download", "decode")
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.status_code = None
+        self.error = None
+        self.reused = True
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.dns_ns = 0
+        self.connect_ns = 0
+        self.tls_ns = 0
+        self.ttfb_ns = 0
+        self.download_ns = 0
+        self.decode_ns = 0
+        # 发出请求的用例, 只在汇总其他进程的耗时记录时设置, 本进程内由插件按当前执行的用例归属
+        self.nodeid = None
+
+    @property
+    def setup_ns(self):
+        return self.dns_ns + self.connect_ns + self.tls_ns
+
+    @property
+    def elapsed_ns(self):
+        """请求开始到响应体读取完成的耗时, 不含 JSON 解析"""
+        end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return end_ns - self.start_ns
+
+    @property
+    def total_ns(self):
+        return self.elapsed_ns + self.decode_ns
+
+    @property
+    def elapsed_ms(self):
+        return self.elapsed_ns / 1e6
+
+    @property
+    def failed(self):
+        """请求失败、响应解析失败或状态码 >= 400"""
+        return self.error is not None or (self.status_code or 0) >= 400
+
+    def as_dict(self):
+        record = {
+            "method": self.method,
+            "url": self.url,
+            "status_code": self.status_code,
+            "error": self.error,
+            "reused": self.reused,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+        for phase in self.PHASES:
+            record[f"{phase}_ms"] = round(getattr(self, f"{phase}_ns") / 1e6, 3)
+        return record
+
+    @classmethod
+    def from_dict(cls, record):
+        """由 as_dict 的结果还原, 用于汇总其他进程的耗时记录"""
+        timing = cls(record["method"], record["url"])
+        timing.status_code = record["status_code"]
+        timing.error = record["error"]
+        timing.reused = record["reused"]
+        timing.start_ns = 0
+        timing.end_ns = int(record["elapsed_ms"] * 1e6)
+        for phase in cls.PHASES:
+            setattr(timing, f"{phase}_ns", int(record[f"{phase}_ms"] * 1e6))
+        return timing
+
+    def __repr__(self):
+        phases = ", ".join(f"{phase}={getattr(self, f'{phase}_ns') / 1e6:.2f}ms" for phase in self.PHASES)
+        return (f"RequestTiming({self.method} {self.url} status={self.status_code} "
+                f"elapsed={self.elapsed_ms:.2f}ms reused={self.reused} {phases})")
+
+
+def add_timing_hook(hook):
+    """
+    注册耗时记录的回调, 每个请求结束(无论成功失败)后以 RequestTiming 为参数调用
+
+    Args:
+        hook: 回调函数 hook(timing), 可能在多个线程中被调用
+    """
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_timing_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def add_decode_hook(hook):
+    """
+    注册响应解析的回调, 请求结束后响应体才被解析时以 RequestTiming 与 failed 为参数调用
+
+    Args:
+        hook: 回调函数 hook(timing, failed), timing.decode_ns 已写入;
+            failed 表示该请求因解析失败才成为失败请求, 之前通知时尚未计入失败
+    """
+    if hook not in _decode_hooks:
+        _decode_hooks.append(hook)
+
+
+def remove_decode_hook(hook):
+    if hook in _decode_hooks:
+        _decode_hooks.remove(hook)
+
+
+def start_timing(method, url):
+    """开始记录当前线程的请求耗时, 连接层通过 current_timing 写入各阶段耗时"""
+    timing = RequestTiming(method, url)
+    _local.timing = timing
+    return timing
+
+
+def current_timing():
+    return getattr(_local, "timing", None)
+
+
+def mark_response_end(timing):
+    timing.end_ns = time.perf_counter_ns()
+
+
+def finish_timing(timing):
+    """结束记录并通知所有回调"""
+    if timing.end_ns is None:
+        mark_response_end(timing)
+    if current_timing() is timing:
+        _local.timing = None
+    emit_timing(timing)
+
+
+def emit_timing(timing):
+    for hook in list(_hooks):
+        try:
+            hook(timing)
+        except Exception as e:
+            logger.warning(f"timing hook {hook!r} failed : {e}")
+
+
+def emit_decode(timing, failed):
+    for hook in list(_decode_hooks):
+        try:
+            hook(timing, failed)
+        except Exception as e:
+            logger.warning(f"decode hook {hook!r} failed : {e}")
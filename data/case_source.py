@@ -0,0 +1,178 @@
+import csv
+import itertools
+import json
+import os
+import re
+
+# 形如 10.86.0-255.1-254 的 IP 段, 每一段可以是单个数字或 起始-结束
+_IP_RANGE = re.compile(r"^\d+(?:-\d+)?(?:\.\d+(?:-\d+)?){3}$")
+
+# 模板中的占位符 {n} / {字段名}
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class CaseSource:
+    """用例集的公共属性, 用例数据可以是列表(CaseSet)也可以是按需读取的数据源(LazyCaseSet)"""
+
+    def __init__(self, name, slo=None, expect=None):
+        self.name = name
+        self.slo = slo or {}
+        # 响应校验声明, 由 core.expect.case_expectations 在使用时编译
+        self.expect = expect or {}
+
+
+class LazyCaseSet(CaseSource):
+    def __init__(self, name, factory, slo=None, length=None, expect=None):
+        """
+        按需生成用例数据的用例集, 每次迭代都从头读取, 不会一次性展开到内存中;
+        可以像列表一样直接传给 pytest.mark.parametrize, 但参数化在收集时仍会生成全部用例,
+        只有压测(core.load)与批量模式等逐行读取用例的场景才能节省内存
+
+        Args:
+            name: 用例集名称
+            factory: 返回用例行迭代器的函数
+            slo: 耗时预算声明
+            length: 已知的用例数量, 未知时为 None
+            expect: 响应校验声明
+        """
+        super().__init__(name, slo, expect)
+        self.factory = factory
+        self.length = length
+
+    def __iter__(self):
+        return iter(self.factory())
+
+    def __len__(self):
+        if self.length is None:
+            raise TypeError(f"length of case source {self.name} is unknown")
+        return self.length
+
+    def __bool__(self):
+        return self.length != 0
+
+    def __repr__(self):
+        return f"LazyCaseSet({self.name}, length={self.length})"
+
+
+def _expand_ip(pattern):
+    """展开 IP 段, 最后一段变化最快"""
+    octets = []
+    for part in pattern.split("."):
+        start, _, end = part.partition("-")
+        octets.append(range(int(start), int(end or start) + 1))
+    length = 1
+    for octet in octets:
+        length *= len(octet)
+    return length, lambda: (".".join(map(str, address)) for address in itertools.product(*octets))
+
+
+def range_source(template, fields=None):
+    """
+    按模板生成用例行
+
+    模板中形如 10.86.97.1-254 的字段按 IP 段展开, 多个 IP 段字段之间做笛卡尔积;
+    字符串中的 {n} 替换为行号(从 1 开始), {字段名} 替换为其它字段的值, 如 "{name}-{n}";
+    模板字段按声明顺序替换, 引用的模板字段需要声明在前面; 其它花括号(如 "p{ss}" 或 JSON 字符串)原样保留
+
+    Args:
+        template: 字段名到取值模板的映射
+        fields: 输出的字段顺序, 默认为模板中的顺序
+
+    Returns:
+        tuple: (用例数量, 返回用例行迭代器的函数)
+    """
+    fields = list(fields or template)
+    ranges = {}
+    length = 1
+    formats = []
+    names = set(template) | {"n"}
+    for field, value in template.items():
+        if isinstance(value, str) and _IP_RANGE.match(value):
+            ranges[field] = _expand_ip(value)
+            length *= ranges[field][0]
+        elif isinstance(value, str) and any(name in names for name in _PLACEHOLDER.findall(value)):
+            formats.append((field, value))
+
+    def rows():
+        combinations = itertools.product(*(factory() for _, factory in ranges.values()))
+        for n, combination in enumerate(combinations, start=1):
+            values = dict(template)
+            values.update(zip(ranges, combination))
+
+            def substitute(match):
+                name = match.group(1)
+                if name == "n":
+                    return str(n)
+                return str(values[name]) if name in names else match.group(0)
+
+            for field, value in formats:
+                values[field] = _PLACEHOLDER.sub(substitute, value)
+            yield [values[field] for field in fields]
+
+    return length, rows
+
+
+def jsonl_source(path, fields=None):
+    """
+    逐行读取 JSONL, 每行为一个列表(直接作为用例行)或对象(按 fields 取值)
+    """
+
+    def rows():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if isinstance(row, dict):
+                    row = [row[field] for field in fields] if fields else list(row.values())
+                yield row
+
+    return rows
+
+
+def csv_source(path, fields=None, header=True):
+    """
+    逐行读取 CSV, 有表头时可以按 fields 选取列
+    """
+
+    def rows():
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            if header:
+                columns = next(reader, [])
+                indexes = [columns.index(field) for field in fields] if fields else None
+            for row in reader:
+                if not row:
+                    continue
+                yield [row[index] for index in indexes] if header and indexes else row
+
+    return rows
+
+
+def lazy_case_set(name, declaration, base_dir):
+    """
+    根据 yml 中的声明创建 LazyCaseSet
+
+        scan_device:
+          fields: [host, name, user, password]
+          range: {host: "10.86.0-255.1-254", name: "mac-mini-{n}", user: xxx, password: xxx}
+
+        import_device:
+          file: devices.jsonl        # 相对于 yml 所在目录, 支持 .jsonl / .csv
+          fields: [host, name, user, password]
+    """
+    fields = declaration.get("fields")
+    slo = declaration.get("slo")
+    expect = declaration.get("expect")
+    if "range" in declaration:
+        length, rows = range_source(declaration["range"], fields)
+        return LazyCaseSet(name, rows, slo=slo, length=length, expect=expect)
+    path = os.path.join(base_dir, declaration["file"])
+    if path.endswith(".csv"):
+        rows = csv_source(path, fields, header=declaration.get("header", True))
+    elif path.endswith(".jsonl"):
+        rows = jsonl_source(path, fields)
+    else:
+        raise ValueError(f"unsupported case file for {name}: {path}")
+    return LazyCaseSet(name, rows, slo=slo, expect=expect)
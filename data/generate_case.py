@@ -1,10 +1,133 @@
+import hashlib
+import marshal
+import os
+import threading
+
 import yaml
 
+from config import setting
+from data.case_source import CaseSource, lazy_case_set
+
+# 优先使用 libyaml 的 C 实现
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# 快照格式变化时修改, 使旧快照失效
+SNAPSHOT_VERSION = 3
+
+
+class CaseSet(CaseSource, list):
+    """
+    一组用例数据, 可直接用于 pytest.mark.parametrize
+
+    用例集在 yml 中可以直接写成列表, 也可以写成带声明的字典:
+
+        add_device:
+          slo: {p95_ms: 120, max_ms: 500}
+          expect: {status_code: 200, json: {status: true}}
+          cases:
+            - [ "10.86.97.1", "WEBGLHOST-MacMini-02", "xxx", "xxx" ]
+
+    数据量很大时可以改用 range/file 声明按需生成, 见 data.case_source.lazy_case_set;
+    响应校验 expect 的写法见 core.expect
+    """
+
+    def __init__(self, name, rows=(), slo=None, expect=None):
+        list.__init__(self, rows)
+        CaseSource.__init__(self, name, slo, expect)
+
+
+def _case_set(name, value, base_dir):
+    if isinstance(value, dict):
+        if "range" in value or "file" in value:
+            return lazy_case_set(name, value, base_dir)
+        return CaseSet(name, value.get("cases") or [], slo=value.get("slo"), expect=value.get("expect"))
+    return CaseSet(name, value or [])
+
+
+class CaseRegistry:
+    def __init__(self, snapshot_path=None):
+        """
+        进程内的用例数据注册表, 每个文件只解析一次, 文件变化后只保留最新的解析结果;
+        解析结果按 路径+修改时间+大小 以 marshal 格式(只包含列表、字典等基本类型, 读取时不会执行代码)保存为快照,
+        之后的运行在文件未变化时直接读取快照; 数据中有 marshal 不支持的类型(如 YAML 的日期)时不保存快照
+
+        Args:
+            snapshot_path: 快照目录, 默认取 setting.CASE_SNAPSHOT_PATH, 为空时不使用快照
+        """
+        self.snapshot_path = setting.CASE_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        # 路径 -> (key, 用例集), 同一文件只保留最新版本
+        self._cases = {}
+        self._lock = threading.Lock()
+
+    def load(self, yml_file_path):
+        path = os.path.realpath(yml_file_path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached_key, cases = self._cases.get(path, (None, None))
+            if cached_key != key:
+                data = self._load_snapshot(key)
+                if data is None:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        data = yaml.load(f, Loader=YamlLoader)
+                    self._save_snapshot(key, data)
+                base_dir = os.path.dirname(path)
+                cases = {name: _case_set(name, value, base_dir) for name, value in (data or {}).items()}
+                self._cases[path] = (key, cases)
+        return cases
+
+    def clear(self):
+        with self._lock:
+            self._cases.clear()
+
+    def _snapshot_file(self, key):
+        path, mtime_ns, size = key
+        path_hash = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+        state_hash = hashlib.sha1(f"{SNAPSHOT_VERSION}:{mtime_ns}:{size}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.snapshot_path, f"{path_hash}-{state_hash}.marshal"), path_hash
+
+    def _load_snapshot(self, key):
+        if not self.snapshot_path:
+            return None
+        snapshot_file, _ = self._snapshot_file(key)
+        try:
+            with open(snapshot_file, "rb") as f:
+                data = marshal.load(f)
+            return data if isinstance(data, dict) else None
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 快照损坏时重新解析
+            return None
+
+    def _save_snapshot(self, key, data):
+        if not self.snapshot_path:
+            return
+        snapshot_file, path_hash = self._snapshot_file(key)
+        try:
+            content = marshal.dumps(data)
+        except ValueError:
+            return
+        try:
+            os.makedirs(self.snapshot_path, exist_ok=True)
+            temp_file = f"{snapshot_file}.{os.getpid()}.tmp"
+            with open(temp_file, "wb") as f:
+                f.write(content)
+            os.replace(temp_file, snapshot_file)
+            # 删除同一文件的旧快照
+            for name in os.listdir(self.snapshot_path):
+                stale = os.path.join(self.snapshot_path, name)
+                if name.startswith(path_hash) and not name.endswith(".tmp") and stale != snapshot_file:
+                    os.remove(stale)
+        except OSError:
+            pass
+
+
+case_registry = CaseRegistry()
+
 
 def generate_case(yml_file_path):
-    with open(yml_file_path, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
-    return data
+    return case_registry.load(yml_file_path)
 
 if __name__ == '__main__':
     data = generate_case('api_data.yml')
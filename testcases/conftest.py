@@ -1,19 +1,181 @@
+import argparse
 import logging
+import os
 
 import pytest
 
 from config import setting
+from core.async_sender import AsyncSender
+from core.bulk import BulkPlugin
+from core.cassette import Cassette, use_cassette
+from core.changed_cases import ChangedCasesPlugin
+from core.endpoints import ENDPOINTS
+from core.expect import default_check, item_expectations
+from core.latency_report import LatencyReport
+from core.profiler import ProfilePlugin
+from core.scheduler import SchedulerPlugin, WorkerPlugin, parse_address
+from core.sender import SenderPool
+from core.slo import SloPlugin
+from core.stub_server import StubServer, use_stub_server
 from data.generate_case import generate_case
 from reportportal_client import RPLogger
 
 
+def pytest_addoption(parser):
+    parser.addoption("--latency-report", action="store_true", default=False,
+                     help="将接口耗时汇总报告写入 JSON/CSV 文件, 默认只在终端输出汇总表")
+    parser.addoption("--latency-report-dir", default=setting.LATENCY_REPORT_PATH,
+                     help="接口耗时汇总报告(JSON/CSV)的输出目录")
+    parser.addoption("--no-latency-report", action="store_true", default=False,
+                     help="不写入接口耗时汇总报告文件(默认), 优先于 --latency-report")
+    parser.addoption("--bulk-cases", action="store_true", default=False,
+                     help="批量模式: 参数化用例在一个用例内逐行执行, 每行作为子用例上报")
+    parser.addoption("--bulk-concurrency", type=int, default=1,
+                     help="批量模式下子用例的默认并发数")
+    parser.addoption("--rp-batch-logs", action="store_true", default=False,
+                     help="ReportPortal 客户端在后台线程按 RP_LOG_BATCH_SIZE / RP_LOG_BATCH_BYTES 批量上报日志")
+    parser.addoption("--stub-server", action="store_true", default=False,
+                     help="在随机端口启动本地替身服务, 所有接口指向该服务")
+    parser.addoption("--cassette-mode", choices=["record", "replay"], default=None,
+                     help="record: 录制所有请求与响应; replay: 从录制文件返回响应, 不发送请求")
+    parser.addoption("--cassette", default=setting.CASSETTE_PATH, help="录制文件路径")
+    parser.addoption("--changed-cases", action="store_true", default=False,
+                     help="只执行新增或修改过的数据行、上次失败的用例以及代码有变化的用例函数")
+    parser.addoption("--workers", type=int, default=setting.SCHEDULER_WORKERS,
+                     help="按 depends 标记划分执行单元, 在 N 个子进程中并行执行, 0 表示串行")
+    parser.addoption("--shard-by", default=setting.SCHEDULER_SHARD_KEY,
+                     help="该参数值相同的用例(如同一 host)在同一个子进程中执行, 为空时子进程按顺序领取任意执行单元")
+    parser.addoption("--profile-top", type=int, default=0,
+                     help="按 fixture/请求/日志/用例代码/清理 拆分每个用例的耗时, 结束时输出最慢的 N 个用例")
+    parser.addoption("--profile-stacks", default=None,
+                     help="采样执行用例的调用栈, 以 collapsed stacks 格式写入该文件(用于生成火焰图)")
+    parser.addoption("--coordinator", type=parse_address, default=None,
+                     help="作为 coordinator 监听 host:port, 把用例分发给其他机器上的 worker, 可与 --workers 同时使用")
+    parser.addoption("--scheduler-connect", type=parse_address, default=None,
+                     help="作为 worker 连接到 coordinator 的 host:port, 领取并执行用例")
+    parser.addoption("--scheduler-token", default=setting.SCHEDULER_TOKEN,
+                     help="coordinator 与 worker 共享的口令, 默认取环境变量 SCHEDULER_TOKEN, "
+                          "coordinator 没有指定时随机生成并在 worker 命令中给出")
+    # 由主进程传给本机子进程, 其他机器上的 worker 由 coordinator 分配编号
+    parser.addoption("--scheduler-worker-id", type=int, default=None, help=argparse.SUPPRESS)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "bulk(concurrency=1): 以批量模式执行该参数化用例")
+    config.addinivalue_line("markers", "bulk_rows: 批量模式内部使用, 保存待执行的用例数据")
+    config.addinivalue_line("markers", "depends(name, after=(), key='host'): 声明步骤名称, "
+                                       "在 key 参数相同的 after 步骤之后执行")
+    write_report = config.getoption("--latency-report") and not config.getoption("--no-latency-report")
+    output_dir = config.getoption("--latency-report-dir") if write_report else None
+    config.pluginmanager.register(LatencyReport(output_dir), "latency_report")
+    config.pluginmanager.register(
+        BulkPlugin(config.getoption("--bulk-cases"), config.getoption("--bulk-concurrency")), "bulk_cases")
+    worker = config.getoption("--scheduler-connect") is not None
+    # 子进程只执行部分用例, 耗时预算由主进程按回传的耗时记录评估
+    if not worker:
+        config.pluginmanager.register(SloPlugin(), "latency_slo")
+    if worker:
+        config.pluginmanager.register(
+            WorkerPlugin(config, config.getoption("--scheduler-connect"), config.getoption("--scheduler-worker-id"),
+                         config.getoption("--scheduler-token")), "scheduler_worker")
+    else:
+        config.pluginmanager.register(
+            SchedulerPlugin(config, config.getoption("--workers"), config.getoption("--shard-by"),
+                            config.getoption("--coordinator"), config.getoption("--scheduler-token")), "scheduler")
+    # 结果总是记录到 pytest 缓存中, 未启用 cacheprovider 时不可用; 子进程的结果由主进程记录
+    if hasattr(config, "cache") and not worker:
+        config.pluginmanager.register(ChangedCasesPlugin(config, config.getoption("--changed-cases")), "changed_cases")
+    if config.getoption("--profile-top") or config.getoption("--profile-stacks"):
+        stacks_path = config.getoption("--profile-stacks")
+        if stacks_path and worker:
+            worker_id = config.getoption("--scheduler-worker-id")
+            stacks_path = f"{stacks_path}.worker{os.getpid() if worker_id is None else worker_id}"
+        config.pluginmanager.register(
+            ProfilePlugin(config.getoption("--profile-top") or setting.PROFILE_TOP, stacks_path), "profiler")
+    if config.getoption("--rp-batch-logs") and config.pluginmanager.hasplugin("pytest_reportportal"):
+        # 由 pytest-reportportal 的客户端合并日志请求, 在 pytest.ini 中指定了 rp_client_type 时保持不变
+        if not config.getini("rp_client_type"):
+            config.option.rp_client_type = "ASYNC_THREAD"
+        config.option.rp_log_batch_size = setting.RP_LOG_BATCH_SIZE
+        config.option.rp_log_batch_payload_size = setting.RP_LOG_BATCH_BYTES
+    if config.getoption("--stub-server"):
+        server = StubServer().start()
+        config.add_cleanup(server.stop)
+        config.add_cleanup(use_stub_server(server))
+        config.pluginmanager.register(server, "stub_server")
+    if config.getoption("--cassette-mode") == "record" and (config.getoption("--workers") > 1
+                                                            or config.getoption("--coordinator")):
+        raise pytest.UsageError("--cassette-mode record cannot be used with --workers or --coordinator")
+    if config.getoption("--cassette-mode"):
+        cassette = Cassette(config.getoption("--cassette"), config.getoption("--cassette-mode"))
+        use_cassette(cassette)
+        config.add_cleanup(cassette.close)
+        config.add_cleanup(lambda: use_cassette(None))
+
+
 @pytest.fixture(scope="session")
-def rp_logger():
+def rp_logger(request):
     logger = logging.getLogger(__name__)
     logger.setLevel(logging.DEBUG)
     logging.setLoggerClass(RPLogger)
     return logger
 
 
+@pytest.fixture(scope="session")
+def stub_server(request):
+    """
+    本地替身服务, 使用 --stub-server 时为所有接口共用的服务, 否则在随机端口单独启动;
+    可通过 stub_server.set_fault(...) 注入延迟与错误
+    """
+    server = request.config.pluginmanager.get_plugin("stub_server")
+    if server is not None:
+        yield server
+        return
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def sender_pool():
+    pool = SenderPool()
+    pool.warm_up(setting.POOL_WARMUP_URLS)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def sender(sender_pool):
+    return sender_pool.sender()
+
+
+@pytest.fixture
+def expect(request):
+    """
+    按 api_data.yml 中用例集声明的 expect 校验响应, 不匹配时抛出 AssertionError 并列出全部差异;
+    用例集(或该接口)没有声明 expect 时检查状态码为 200 且响应中的 status 不为 false:
+
+        expect(sender)                     # 接口取用例使用的接口 fixture(如 add_device_url)
+        expect(sender, endpoint="del_api")
+    """
+    expectations = item_expectations(request.node)
+    endpoints = [name for name in request.fixturenames if name in ENDPOINTS]
+
+    def check(response, endpoint=None):
+        validator = None
+        if expectations is not None:
+            validator = expectations.validator(endpoint or (endpoints[0] if len(endpoints) == 1 else None))
+        if validator is None:
+            return default_check(response)
+        return validator.check(response)
+
+    return check
+
+
+@pytest.fixture
+def async_sender():
+    """异步 Sender, 用例中可通过 async_sender.run_many(requests, concurrency=N) 并发发送一批请求"""
+    return AsyncSender()
+
+
 
 
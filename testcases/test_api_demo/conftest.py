@@ -2,13 +2,14 @@ import pytest
 import urllib3
 
 from config import setting
+from core.endpoints import ENDPOINTS
 from data.generate_case import generate_case
 
 
 
 @pytest.fixture(scope='module')
 def demo_api():
-    url = 'http://10.86.97.157:8000/demo'
+    url = ENDPOINTS["demo_api"].url
     yield url
     print("测试完成")
 
@@ -1,6 +1,7 @@
 import pytest
 
 from config import setting
+from core.endpoints import ENDPOINTS
 from data.generate_case import generate_case
 
 
@@ -11,16 +12,10 @@ def url():
 
 @pytest.fixture(scope="session")
 def add_device_url(url):
-    host = setting.HSOT
-    port = setting.PORT
-    url = f'http://{host}:{port}/device/add_device'
-    return url
+    return ENDPOINTS["add_device_url"].url
 
 @pytest.fixture(scope="session")
 def del_device_url(url):
-    host = setting.HSOT
-    port = setting.PORT
-    url = f'http://{host}:{port}/device/del_device'
-    return url
+    return ENDPOINTS["del_device_url"].url
 
 api_case = generate_case(setting.YAML_FILE_PATH)
\ No newline at end of file
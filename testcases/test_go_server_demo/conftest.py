@@ -1,20 +1,17 @@
 import pytest
 
 from config import setting
+from core.endpoints import ENDPOINTS
 from data.generate_case import generate_case
 
 
 @pytest.fixture(scope='session')
 def add_api():
-    server = setting.GO_SERVER
-    url = server + "/api/v1/device/add"
-    return url
+    return ENDPOINTS["add_api"].url
 
 @pytest.fixture(scope='session')
 def del_api():
-    server = setting.GO_SERVER
-    url = server + "/api/v1/device/delete"
-    return url
+    return ENDPOINTS["del_api"].url
 
 
 api_case = generate_case(setting.YAML_FILE_PATH)
\ No newline at end of file
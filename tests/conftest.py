@@ -0,0 +1,3 @@
+def pytest_configure(config):
+    # 单元测试中直接构造用例使用的标记
+    config.addinivalue_line("markers", "depends(name, after=(), key='host'): 见 core.scheduler")
@@ -0,0 +1,35 @@
+import asyncio
+
+from core.async_sender import AsyncSender
+from core.stub_server import StubServer
+
+
+def test_check_status_after_success_and_failure():
+    async def run(url):
+        async with AsyncSender() as sender:
+            assert await sender.post(f"{url}/device/add_device", json={"host": "10.0.0.1"})
+            assert sender.check_status() is True
+            # 连接被拒绝时没有响应体, 与 SendResult 一样返回 False 而不是抛出异常
+            assert not await sender.get("http://127.0.0.1:1/device/add_device")
+            assert sender.check_status() is False
+
+    with StubServer() as server:
+        asyncio.run(run(server.url))
+
+
+def test_send_many_keeps_order_and_isolates_failures():
+    with StubServer() as server:
+        server.set_fault("/demo", latency_ms=500)
+        requests = [
+            {"method": "POST", "url": f"{server.url}/device/add_device", "json": {"host": "10.0.0.1"}},
+            {"method": "POST", "url": f"{server.url}/demo", "json": {"host": "10.0.0.2"}},
+            {"method": "POST"},
+            {"method": "DELETE", "url": f"{server.url}/device/del_device", "params": {"host": "10.0.0.3"}},
+        ]
+        results = AsyncSender(timeout=0.2).run_many(requests, concurrency=2)
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert [result.ok for result in results] == [True, False, False, True]
+    assert results[1].error.startswith("TimeoutError")
+    assert results[2].error.startswith("invalid request KeyError")
+    assert results[3].check_status() is True
+    assert results[0].timing.status_code == 200
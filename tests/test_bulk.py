@@ -0,0 +1,63 @@
+import pytest
+from reportportal_client import set_current
+from reportportal_client.steps import StepReporter
+
+from core.bulk import MAX_REPORTED_FAILURES, BulkPlugin
+
+pytest_plugins = ["pytester"]
+
+BULK_CASES = """
+import pytest
+
+@pytest.mark.bulk(concurrency={concurrency})
+@pytest.mark.parametrize("n", range(30))
+def test_rows(n):
+    assert n < 5
+"""
+
+
+class FakeClient:
+    """记录嵌套步骤的 ReportPortal 客户端"""
+
+    def __init__(self):
+        self.step_reporter = StepReporter(self)
+        self.steps = {}
+        self.parents = set()
+
+    def current_item(self):
+        return "test-item"
+
+    def start_test_item(self, name, start_time, item_type, parent_item_id=None, **kwargs):
+        self.parents.add(parent_item_id)
+        self.steps[name] = None
+        return name
+
+    def finish_test_item(self, item_id, end_time, status=None, **kwargs):
+        self.steps[item_id] = status
+
+    def log(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def rp_client():
+    client = FakeClient()
+    set_current(client)
+    yield client
+    set_current(None)
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_rows_reported_as_steps_and_failures_written(pytester, tmp_path, rp_client, concurrency):
+    pytester.makepyfile(BULK_CASES.format(concurrency=concurrency))
+    plugin = BulkPlugin(output_dir=str(tmp_path))
+    result = pytester.runpytest_inprocess("-p", "no:reportportal", "-p", "no:cacheprovider", plugins=[plugin])
+    result.assert_outcomes(failed=1)
+    assert rp_client.parents == {"test-item"}
+    assert len(rp_client.steps) == 30
+    assert rp_client.steps["[1] 0"] == "PASSED"
+    assert rp_client.steps["[30] 29"] == "FAILED"
+    # 终端只展示前若干条, 文件中保留全部失败子用例
+    assert len(plugin.summaries[0].failures) == MAX_REPORTED_FAILURES
+    with open(plugin.failures_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 25
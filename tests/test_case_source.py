@@ -0,0 +1,62 @@
+import os
+
+from core.expect import case_expectations
+from data.case_source import range_source
+from data.generate_case import CaseRegistry, CaseSet
+
+
+def test_range_source_formats_fields_in_order():
+    length, rows = range_source({
+        "host": "10.0.0.1-2",
+        "name": "mac-{n}",
+        "label": "{name}@{host}",
+        "user": "xxx",
+    })
+    assert length == 2
+    assert list(rows()) == [
+        ["10.0.0.1", "mac-1", "mac-1@10.0.0.1", "xxx"],
+        ["10.0.0.2", "mac-2", "mac-2@10.0.0.2", "xxx"],
+    ]
+
+
+def test_range_source_keeps_literal_braces():
+    length, rows = range_source({
+        "host": "10.0.0.1",
+        "name": "mac-{n}",
+        "password": "p{ss}",
+        "extra": '{"id": "{n}"}',
+    })
+    assert list(rows()) == [["10.0.0.1", "mac-1", "p{ss}", '{"id": "1"}']]
+
+
+def test_range_source_field_order():
+    _, rows = range_source({"host": "10.0.0.1", "name": "{host}-{n}"}, fields=["name", "host"])
+    assert list(rows()) == [["10.0.0.1-1", "10.0.0.1"]]
+
+
+def test_case_expectations_compiled_once():
+    case_set = CaseSet("add_device", [["10.0.0.1"]], expect={"status_code": 200})
+    expectations = case_expectations(case_set)
+    assert expectations is case_expectations(case_set)
+    assert expectations.validator().validate(200) == []
+    assert case_expectations(CaseSet("del_device", [])) is None
+
+
+def test_registry_snapshot_and_reload(tmp_path):
+    yml = tmp_path / "api_data.yml"
+    yml.write_text("add_device:\n  expect: {status_code: 200}\n  cases:\n    - [10.0.0.1, a]\n", encoding="utf-8")
+    snapshot_path = tmp_path / "snapshot"
+    CaseRegistry(str(snapshot_path)).load(yml)
+    snapshots = os.listdir(snapshot_path)
+    assert [name.rsplit(".", 1)[1] for name in snapshots] == ["marshal"]
+    # 第二个进程从快照读取, 结果与解析 yml 相同
+    cases = CaseRegistry(str(snapshot_path)).load(yml)["add_device"]
+    assert cases == [["10.0.0.1", "a"]] and cases.expect == {"status_code": 200}
+
+    registry = CaseRegistry(str(snapshot_path))
+    registry.load(yml)
+    yml.write_text("add_device:\n  - [10.0.0.2, b]\n", encoding="utf-8")
+    assert registry.load(yml)["add_device"] == [["10.0.0.2", "b"]]
+    # 文件变化后只保留最新的解析结果与快照
+    assert len(registry._cases) == 1
+    assert len(os.listdir(snapshot_path)) == 1
@@ -0,0 +1,92 @@
+import pytest
+
+from core.cassette import Cassette, CassetteMiss, main, request_key
+from core.sender import Sender
+from core.stub_server import StubServer
+
+
+def test_request_key_ignores_param_order_and_json_key_order():
+    assert request_key("get", "http://Device:80/a?b=2&a=1") == \
+        request_key("GET", "http://device:80/a", params={"a": 1, "b": "2"})
+    assert request_key("POST", "http://d/a", json_body={"x": 1, "y": [1, 2]}) == \
+        request_key("POST", "http://d/a", json_body={"y": [1, 2], "x": 1})
+    assert request_key("POST", "http://d/a", data={"b": 1, "a": 2}) == request_key("POST", "http://d/a", data=b"a=2&b=1")
+    assert request_key("POST", "http://d/a", json_body={"x": 1}) != request_key("POST", "http://d/a", json_body={"x": 2})
+    assert request_key("POST", "http://d/a") != request_key("DELETE", "http://d/a")
+
+
+def record(path, server):
+    with Cassette(str(path), "record") as cassette:
+        sender = Sender(cassette=cassette, retries=0)
+        for host in ("10.0.0.1", "10.0.0.2"):
+            assert sender.post(f"{server.url}/device/add_device", json={"host": host})
+        server.set_fault("/device/add_device", error_rate=1.0, error_status=503)
+        assert sender.post(f"{server.url}/device/add_device", json={"host": "10.0.0.1"})
+        assert sender.delete(f"{server.url}/device/del_device", params={"host": "10.0.0.1"})
+        recorded = sender.timing.as_dict()
+    return recorded
+
+
+def test_record_then_replay_without_server(tmp_path):
+    path = tmp_path / "api.cassette"
+    with StubServer() as server:
+        url = server.url
+        recorded = record(path, server)
+        sent = sum(server.requests.values())
+
+    with Cassette(str(path)) as cassette:
+        assert len(cassette) == 4
+        sender = Sender(cassette=cassette, retries=0)
+        # 同一请求按录制顺序返回, 超过录制次数后返回第一次的响应
+        statuses = [sender.post(f"{url}/device/add_device", json={"host": "10.0.0.1"}) and sender.status_code
+                    for _ in range(3)]
+        assert statuses == [200, 503, 200]
+        assert sender.post(f"{url}/device/add_device", json={"host": "10.0.0.2"})
+        assert sender.result == {"status": True, "message": "success"}
+        assert sender.delete(f"{url}/device/del_device", params={"host": "10.0.0.1"})
+        # 回放的耗时与录制时一致
+        assert sender.timing.as_dict()["elapsed_ms"] == recorded["elapsed_ms"]
+        assert sender.timing.status_code == 200
+
+        with pytest.raises(CassetteMiss):
+            cassette.lookup("POST", f"{url}/device/add_device", json={"host": "10.0.0.9"})
+        assert not sender.post(f"{url}/device/add_device", json={"host": "10.0.0.9"})
+        assert sender.result["message"].startswith("CassetteMiss")
+    assert sent == 4
+
+
+def test_interrupted_recording_rebuilds_index(tmp_path):
+    path = tmp_path / "api.cassette"
+    with StubServer() as server:
+        url = server.url
+        record(path, server)
+
+    data = path.read_bytes()
+    with Cassette(str(path)) as cassette:
+        index_offset = cassette._index_offset
+    # 去掉索引与文件尾, 并在最后留下一条写了一半的记录
+    path.write_bytes(data[:index_offset] + data[8:20])
+    with Cassette(str(path)) as cassette:
+        assert len(cassette) == 4
+        assert [meta["status"] for meta in cassette.entries()] == [200, 200, 503, 200]
+        meta, body = cassette.lookup("POST", f"{url}/device/add_device", json={"host": "10.0.0.2"})
+        assert meta["status"] == 200 and b"success" in bytes(body)
+
+
+def test_rejects_unknown_files_and_modes(tmp_path):
+    path = tmp_path / "not.cassette"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError, match="not a cassette"):
+        Cassette(str(path))
+    with pytest.raises(ValueError, match="unknown cassette mode"):
+        Cassette(str(path), "append")
+
+
+def test_info_lists_records(tmp_path, capsys):
+    path = tmp_path / "api.cassette"
+    with StubServer() as server:
+        record(path, server)
+    assert main(["info", str(path)]) == 0
+    out = capsys.readouterr().out
+    assert "4 records, 4 indexed, status {200: 3, 503: 1}" in out
+    assert main([]) == 2
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+from core.changed_cases import case_key
+
+pytest_plugins = ["pytester"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_device_cases(cache_dir, *args):
+    command = [
+        sys.executable, "-m", "pytest", "-q", "testcases/test_api_device/test_02_del_device.py", "--stub-server",
+        "-p", "no:reportportal", "--no-latency-report", "-o", f"cache_dir={cache_dir}", *args,
+    ]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_deselected_rows_keep_history(tmp_path):
+    assert run_device_cases(tmp_path, "-k", "host0 or host1").startswith("2 passed")
+    assert run_device_cases(tmp_path, "-k", "host2 or host3").startswith("2 passed")
+    assert run_device_cases(tmp_path, "--changed-cases").startswith("4 deselected")
+
+
+DECLARED_CASES = """
+import pytest
+
+from data.generate_case import CaseSet
+
+# 与 api_data.yml 中的声明一样, 不在用例函数的代码中
+CASES = CaseSet("add_device", ["10.0.0.1"], expect={expect})
+
+@pytest.mark.parametrize("host", CASES)
+def test_add(host):
+    pass
+"""
+
+
+def test_expect_change_changes_key(pytester, monkeypatch):
+    # 同一个文件修改后重新收集, 不能使用已导入的模块与字节码缓存
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    keys = []
+    for expect in ({"status_code": 200}, {"status_code": 201}, {"status_code": 201}):
+        sys.modules.pop("test_expect_change_changes_key", None)
+        item, = pytester.getitems(DECLARED_CASES.format(expect=expect))
+        keys.append(case_key(item)[1])
+    assert keys[0] != keys[1]
+    assert keys[1] == keys[2]
@@ -0,0 +1,161 @@
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from core.async_sender import SendResult
+from core.expect import ExpectationError, Expectations, ResponseValidator, case_expectations, default_check
+from data.generate_case import CaseSet
+
+HEADERS = CaseInsensitiveDict({"Content-Type": "application/json; charset=utf-8", "X-Id": "42"})
+
+BODY = {
+    "status": True,
+    "message": "success",
+    "count": 2,
+    "data": {"items": [{"host": "10.0.0.1", "name": "a"}, {"host": "10.0.0.2", "name": None}]},
+}
+
+
+def mismatches(spec, body=BODY, status_code=200, headers=HEADERS):
+    return [str(mismatch) for mismatch in ResponseValidator("demo", spec).validate(status_code, headers, lambda: body)]
+
+
+def test_json_paths_report_every_mismatch():
+    spec = {"json": {
+        "status": True,
+        "message": {"type": "str", "regex": "^succ"},
+        "$.data.items[0].host": {"regex": r"^10\."},
+        "data.items[*].name": {"type": "str"},
+        "data.items[5].host": {"type": "str"},
+        "data.error": {"exists": False},
+        "count": {"type": "float"},
+    }}
+    assert sorted(mismatches(spec)) == [
+        "$.count: expected type float, got 2",
+        "$.data.items[1].name: expected type str, got null",
+        "$.data.items[5]: expected present, got missing",
+    ]
+    assert sorted(mismatches(spec, body={**BODY, "data": {"error": "x", "items": []}, "status": 1})) == [
+        "$.count: expected type float, got 2",
+        "$.data.error: expected absent, got \"x\"",
+        "$.data.items[0]: expected present, got missing",
+        "$.data.items[5]: expected present, got missing",
+        "$.status: expected true, got 1",
+    ]
+
+
+def test_bool_is_not_a_number():
+    assert mismatches({"json": {"status": {"type": "int"}}}) == ["$.status: expected type int, got true"]
+    assert mismatches({"json": {"count": {"type": "number"}, "status": {"type": "bool"}}}) == []
+    assert mismatches({"json": {"count": True}}, body={"count": 1}) == ["$.count: expected true, got 1"]
+
+
+def test_schema_subset():
+    spec = {"schema": {
+        "type": "object",
+        "required": ["status", "message", "code"],
+        "additionalProperties": False,
+        "properties": {
+            "status": {"const": True},
+            "message": {"enum": ["success", "ok"], "maxLength": 5},
+            "count": {"type": "integer", "minimum": 3},
+            "data": {"type": "object", "properties": {"items": {
+                "type": "array", "maxItems": 1,
+                "items": {"type": "object", "properties": {"name": {"type": ["string", "null"], "pattern": "^z"}}},
+            }}},
+        },
+    }}
+    assert mismatches(spec) == [
+        "$.code: expected present, got missing",
+        "$.message: expected length <= 5, got \"success\"",
+        "$.count: expected >= 3, got 2",
+        "$.data.items: expected items <= 1, got "
+        "[{\"host\": \"10.0.0.1\", \"name\": \"a\"}, {\"host\": \"10.0.0.2\", \"name\": null}]",
+        "$.data.items[0].name: expected match /^z/, got \"a\"",
+    ]
+    # additionalProperties 允许 json 路径中声明的键
+    spec = {"schema": {"additionalProperties": False, "properties": {"status": {}}}, "json": {"message": "success"}}
+    assert mismatches(spec, body={"status": True, "message": "success", "extra": 1}) == \
+        ["$.extra: expected absent, got 1"]
+
+
+def test_status_code_and_headers():
+    spec = {"status_code": [200, 201], "headers": {
+        "content-type": {"regex": "^application/json"}, "X-Id": 42, "Server": {"exists": False},
+        "X-Trace": {"exists": True}}}
+    assert mismatches(spec) == ["headers.X-Trace: expected present, got missing"]
+    assert mismatches(spec, status_code=500, headers=CaseInsensitiveDict({"X-Id": "7", "Server": "go"})) == [
+        "status_code: expected one of [200, 201], got 500",
+        "headers.content-type: expected present, got missing",
+        "headers.X-Id: expected \"42\", got \"7\"",
+        "headers.Server: expected absent, got \"go\"",
+        "headers.X-Trace: expected present, got missing",
+    ]
+    assert mismatches({"headers": {"X-Id": 42}}, headers=None) == ["headers: expected response headers, got missing"]
+
+
+def test_body_is_not_loaded_without_json_declarations():
+    def load_body():
+        raise AssertionError("body loaded")
+
+    assert ResponseValidator("demo", {"status_code": 200}).validate(200, HEADERS, load_body) == []
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({"status": 200}, "unknown expect item of demo: status"),
+    ({"json": {"status": {"equals": True}}}, "unknown check in expect of demo at status: equals"),
+    ({"json": {"status": {"type": "uuid"}}}, "unknown type in expect of demo: uuid"),
+    ({"json": {"data..": 1, "[x]": 1}}, "invalid json path"),
+    ({"schema": {"oneOf": []}}, "unsupported schema keyword in expect of demo: oneOf"),
+    ({"headers": {"X-Id": {"type": "str"}}}, "unknown header check in expect of demo: type"),
+])
+def test_invalid_declarations_fail_when_compiled(spec, message):
+    with pytest.raises(ValueError, match=message.replace("[", r"\[")):
+        ResponseValidator("demo", spec)
+
+
+def test_endpoint_declarations_merge_with_common():
+    expectations = Expectations("add_device", {
+        "status_code": 200,
+        "json": {"status": True},
+        "add_device_url": {"json": {"message": "created"}},
+        "del_api": {"status_code": 404},
+    })
+    assert expectations.validator() is expectations.default
+    assert expectations.validator("demo_api") is expectations.default
+    url = expectations.validator("add_device_url")
+    assert url.name == "add_device/add_device_url"
+    assert [str(m) for m in url.validate(200, None, lambda: BODY)] == \
+        ["$.message: expected \"created\", got \"success\""]
+    assert [str(m) for m in expectations.validator("del_api").validate(200, None, lambda: BODY)] == \
+        ["status_code: expected 404, got 200"]
+    with pytest.raises(ValueError, match="unknown expect item of add_device: nope"):
+        Expectations("add_device", {"nope": {}})
+
+
+def test_case_expectations_compiled_once_per_case_set():
+    case_set = CaseSet("add_device", [["10.0.0.1"]], expect={"status_code": 200})
+    assert case_expectations(case_set) is case_expectations(case_set)
+    assert case_expectations(CaseSet("add_device", [["10.0.0.1"]])) is None
+
+
+def test_check_includes_request_error():
+    validator = ResponseValidator("demo", {"status_code": 200, "json": {"status": True}})
+    assert validator.check(SendResult(0, "POST", "u", 200, {"status": True}))
+    with pytest.raises(ExpectationError) as excinfo:
+        validator.check(SendResult(0, "POST", "u", error="TimeoutError: "))
+    # 请求失败的原因排在最前面
+    assert [str(m) for m in excinfo.value.mismatches] == [
+        "error: expected none, got \"TimeoutError: \"",
+        "status_code: expected 200, got null",
+        "$.status: expected present, got missing",
+    ]
+    assert str(excinfo.value).startswith("response of demo does not match expect (3 mismatches):")
+
+
+def test_default_check():
+    assert default_check(SendResult(0, "POST", "u", 200, {"status": True}))
+    assert default_check(SendResult(0, "POST", "u", 200, [1]))
+    with pytest.raises(ExpectationError, match=r"\$.status: expected true, got false"):
+        default_check(SendResult(0, "POST", "u", 200, {"status": False}))
+    with pytest.raises(ExpectationError, match="status_code: expected 200, got 503"):
+        default_check(SendResult(0, "POST", "u", 503, None))
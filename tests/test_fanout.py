@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+
+import pytest
+
+from core.async_sender import SendResult
+from core.endpoints import ENDPOINTS
+from core.fanout import FanoutRunner, NodeStats, _outlier, format_comparison, main, parse_target
+from core.stub_server import StubServer
+from data.generate_case import CaseSet
+
+ROWS = [[f"10.0.0.{index}", "name", "user", "password"] for index in range(1, 11)]
+CASES = {"add_device": CaseSet("add_device", ROWS)}
+
+
+@pytest.fixture
+def nodes():
+    servers = [StubServer().start() for _ in range(3)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def run(targets, endpoints, **kwargs):
+    runner = FanoutRunner(targets, endpoints, CASES, **kwargs)
+    return runner, asyncio.run(runner.run())
+
+
+def test_every_node_gets_every_row_and_slow_node_is_flagged(nodes):
+    nodes[2].set_fault(latency_ms=40)
+    targets = {f"node{index}": server.url for index, server in enumerate(nodes)}
+    runner, rows = run(targets, [ENDPOINTS["demo_api"], ENDPOINTS["add_api"]], concurrency=4, repeat=2)
+
+    # 每个节点按接口顺序收到全部用例数据, 重复 repeat 轮
+    for server in nodes:
+        assert server.requests[("POST", "/demo")] == 20
+        assert server.requests[("POST", "/api/v1/device/add")] == 20
+    assert [(row["endpoint"], row["node"]) for row in rows] == \
+        [(endpoint, node) for endpoint in ("demo_api", "add_api") for node in targets]
+    assert all(row["requests"] == 20 and row["error_rate"] == 0 for row in rows)
+
+    flagged = {(row["endpoint"], row["node"]) for row in rows if row["outlier"]}
+    assert flagged == {("demo_api", "node2"), ("add_api", "node2")}
+    assert all(row["outlier"].startswith("p50") for row in rows if row["outlier"])
+    assert "outlier nodes: node2" in format_comparison(rows)
+
+
+def test_error_rate_and_timeouts_count_per_node(nodes):
+    nodes[0].set_fault(error_rate=1.0, error_status=503)
+    nodes[1].set_fault(latency_ms=500)
+    targets = {"errors": nodes[0].url, "timeouts": nodes[1].url, "ok": nodes[2].url}
+    runner, rows = run(targets, [ENDPOINTS["demo_api"]], concurrency=10, timeout=0.1)
+
+    by_node = {row["node"]: row for row in rows}
+    assert by_node["errors"]["error_rate"] == 1.0
+    assert by_node["errors"]["errors"] == {"HTTP 503": 10}
+    assert by_node["timeouts"]["error_rate"] == 1.0
+    assert all(error.startswith("TimeoutError") for error in by_node["timeouts"]["errors"])
+    assert by_node["ok"]["error_rate"] == 0 and by_node["ok"]["outlier"] is None
+    assert "errors 100.0% vs" in by_node["errors"]["outlier"]
+
+
+def test_status_false_counts_as_error():
+    stats = NodeStats("demo_api")
+    stats.record(SendResult(0, "POST", "u", 200, {"status": False, "message": "exists"}), 1.0)
+    stats.record(SendResult(1, "POST", "u", 200, {"status": True}), 1.0)
+    stats.record(SendResult(2, "POST", "u", 200, [1, 2]), 1.0)
+    assert stats.errors == 1
+    assert stats.error_samples == {"status false: exists": 1}
+
+
+def test_outlier_thresholds():
+    def row(p50, p90=None, error_rate=0.0, requests=10):
+        return {"p50_ms": p50, "p90_ms": p90 or p50, "error_rate": error_rate, "requests": requests}
+
+    others = [row(10), row(12)]
+    # 超过倍数但差值不足 min_ms 时不标记
+    assert _outlier(row(16), others, factor=1.5, min_ms=5, error_rate=0.05) is None
+    assert _outlier(row(20), others, factor=1.5, min_ms=5, error_rate=0.05) == "p50 20.0ms vs 11.0ms; p90 20.0ms vs 11.0ms"
+    assert _outlier(row(10, p90=30), others, factor=1.5, min_ms=5, error_rate=0.05) == "p90 30.0ms vs 11.0ms"
+    assert _outlier(row(10, error_rate=0.1), others, factor=1.5, min_ms=5, error_rate=0.05) == "errors 10.0% vs 0.0%"
+    assert _outlier(row(100, requests=0), others, factor=1.5, min_ms=5, error_rate=0.05) is None
+    assert _outlier(row(100), [], factor=1.5, min_ms=5, error_rate=0.05) is None
+
+
+def test_parse_target():
+    assert parse_target("a=http://h:1/") == ("a", "http://h:1")
+    for value in ("http://h:1", "=http://h:1", "a=h:1"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_target(value)
+    with pytest.raises(ValueError, match="no fan-out targets"):
+        FanoutRunner({}, [], CASES)
+
+
+def test_main_writes_json_and_exits_non_zero_on_outlier(nodes, tmp_path, capsys):
+    nodes[1].set_fault(error_rate=1.0)
+    path = tmp_path / "fanout.json"
+    argv = ["--endpoint", "demo_api", "--json", str(path)]
+    for index, server in enumerate(nodes):
+        argv += ["--target", f"n{index}={server.url}"]
+    assert main(argv) == 1
+    assert "outlier nodes: n1" in capsys.readouterr().out
+    result = json.loads(path.read_text(encoding="utf-8"))
+    assert result["targets"] == {f"n{index}": server.url for index, server in enumerate(nodes)}
+    assert [row["node"] for row in result["endpoints"] if row["outlier"]] == ["n1"]
+
+    nodes[1].clear_faults()
+    assert main(argv) == 0
@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_device_cases(*args):
+    command = [
+        sys.executable, "-m", "pytest", "-q", "testcases/test_api_device", "--stub-server",
+        "-p", "no:reportportal", "-p", "no:cacheprovider", *args,
+    ]
+    return subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+
+
+def test_report_files_are_opt_in(tmp_path):
+    result = run_device_cases("--latency-report-dir", str(tmp_path))
+    assert "latency" in result.stdout
+    assert os.listdir(tmp_path) == []
+
+    result = run_device_cases("--latency-report", "--latency-report-dir", str(tmp_path))
+    names = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(name)[1] for name in names] == [".csv", ".json"]
+    # 文件名包含进程号, 同一秒内运行的多个会话不会互相覆盖
+    assert all(name.startswith("latency_") and name.count("_") == 3 for name in names)
+    with open(tmp_path / names[1], encoding="utf-8") as f:
+        report = json.load(f)
+    assert sum(endpoint["count"] for endpoint in report["endpoints"]) == 8
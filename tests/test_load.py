@@ -0,0 +1,77 @@
+import asyncio
+import math
+import random
+
+import pytest
+
+from core.endpoints import ENDPOINTS
+from core.load import LoadRunner
+from core.stats import LatencyHistogram
+from core.stub_server import StubServer, use_stub_server
+from data.generate_case import CaseSet
+
+CASES = {"add_device": CaseSet("add_device", [["10.0.0.1", "a", "u", "p"], ["10.0.0.2", "b", "u", "p"]])}
+
+
+def exact_percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * percent / 100), 1) - 1]
+
+
+def test_histogram_percentiles_within_relative_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1.2) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for percent in (50, 90, 99, 99.9):
+        exact = exact_percentile(values, percent)
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.01, abs=0.001)
+    assert histogram.count == len(values)
+    assert histogram.max / 1000 == pytest.approx(max(values), abs=0.001)
+    assert histogram.mean == pytest.approx(sum(values) / len(values), rel=0.001)
+
+
+def test_histogram_merge_and_round_trip():
+    left, right, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for index in range(1, 1001):
+        (left if index % 2 else right).record(index / 10)
+        combined.record(index / 10)
+    merged = LatencyHistogram.from_dict(left.to_dict()).merge(LatencyHistogram.from_dict(right.to_dict()))
+    assert merged.summary() == combined.summary()
+    assert LatencyHistogram().summary()["p99_ms"] == 0.0
+
+
+@pytest.fixture
+def stub_server():
+    with StubServer() as server:
+        restore = use_stub_server(server)
+        yield server
+        restore()
+
+
+def test_closed_loop_spreads_requests_over_endpoints(stub_server):
+    endpoints = [ENDPOINTS["add_device_url"], ENDPOINTS["demo_api"]]
+    runner = LoadRunner(endpoints, CASES, mode="closed", concurrency=2, duration=0.3)
+    summary = asyncio.run(runner.run())
+    assert [row["endpoint"] for row in summary] == ["add_device_url", "demo_api"]
+    assert all(row["requests"] > 0 and row["error_rate"] == 0 for row in summary)
+    assert stub_server.requests[("POST", "/device/add_device")] == summary[0]["requests"]
+
+
+def test_open_loop_counts_queueing_time(stub_server):
+    # 每个请求 50ms, 只允许 1 个在途: 按 100 RPS 计划发送的 20 个请求排队执行, 耗时包含排队等待
+    stub_server.set_fault("/device/add_device", latency_ms=50)
+    runner = LoadRunner([ENDPOINTS["add_device_url"]], CASES, mode="open", rps=100, duration=0.2, max_inflight=1)
+    row, = asyncio.run(runner.run())
+    assert row["requests"] == 20
+    assert row["p99_ms"] > 500
+    assert runner.elapsed >= 1.0
+
+
+def test_errors_grouped_by_status(stub_server):
+    stub_server.set_fault("/device/add_device", error_rate=1.0, error_status=503)
+    runner = LoadRunner([ENDPOINTS["add_device_url"]], CASES, mode="closed", concurrency=1, duration=0.1)
+    row, = asyncio.run(runner.run())
+    assert row["error_rate"] == 1.0
+    assert row["errors"] == {"HTTP 503": row["requests"]}
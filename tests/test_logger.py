@@ -0,0 +1,59 @@
+import logging
+import queue
+
+import pytest
+
+from core.logger import BoundedQueueHandler, DrainingQueueListener
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_logger(name, maxsize, overflow):
+    handler = BoundedQueueHandler(queue.Queue(maxsize), overflow=overflow, sample_every=2)
+    target = ListHandler()
+    handler.listener = DrainingQueueListener(handler.queue, target, respect_handler_level=True)
+    logger = logging.getLogger(f"test_logger.{name}")
+    logger.propagate = False
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    return logger, handler, target
+
+
+def test_logs_after_stop_written_directly():
+    logger, handler, target = make_logger("stopped", maxsize=1, overflow="block")
+    handler.listener.start()
+    handler.running = True
+    logger.info("before %s", "stop")
+    handler.running = False
+    handler.listener.stop()
+    # 队列容量为 1 且没有后台线程消费, 仍进入队列时第二条就会一直阻塞
+    for index in range(3):
+        logger.info("after stop %d", index)
+    assert target.messages == ["before stop", "after stop 0", "after stop 1", "after stop 2"]
+
+
+def test_drop_when_full():
+    logger, handler, target = make_logger("drop", maxsize=2, overflow="drop")
+    handler.running = True
+    for index in range(5):
+        logger.info("info %d", index)
+    assert handler.dropped == 3
+    handler.listener.start()
+    logger.warning("warning")
+    handler.running = False
+    handler.listener.stop()
+    assert target.messages == ["info 0", "info 1", "warning"]
+
+
+def test_sample_requires_bounded_queue():
+    with pytest.raises(ValueError, match="bounded"):
+        BoundedQueueHandler(queue.Queue(0), overflow="sample")
+    with pytest.raises(ValueError, match="unknown"):
+        BoundedQueueHandler(queue.Queue(10), overflow="oldest")
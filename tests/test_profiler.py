@@ -0,0 +1,105 @@
+import time
+
+from core.profiler import ProfilePlugin, StackSampler
+from core.stub_server import StubServer
+
+pytest_plugins = ["pytester"]
+
+CASES = """
+import logging
+import time
+
+import pytest
+
+from core.sender import Sender
+
+
+@pytest.fixture
+def inner():
+    time.sleep(0.03)
+
+
+@pytest.fixture
+def outer(request):
+    request.getfixturevalue("inner")
+    time.sleep(0.05)
+
+
+def test_slow(outer):
+    sender = Sender(retries=0)
+    assert sender.post("{url}/demo", json={{"host": "10.0.0.1"}})
+    assert sender.post("{url}/demo", json={{"host": "10.0.0.2"}})
+    logging.getLogger("case").warning("done")
+    time.sleep(0.1)
+
+
+def test_fast():
+    pass
+"""
+
+
+def test_profile_splits_setup_http_and_body(pytester):
+    with StubServer() as server:
+        server.set_fault("/demo", latency_ms=100)
+        pytester.makepyfile(test_cases=CASES.format(url=server.url))
+        plugin = ProfilePlugin(top=1)
+        result = pytester.runpytest_inprocess("-p", "no:cacheprovider", plugins=[plugin])
+    result.assert_outcomes(passed=2)
+
+    slow = plugin.profiles["test_cases.py::test_slow"].to_dict()
+    assert slow["requests"] == 2
+    assert 200 <= slow["http_ms"] < 350
+    assert 100 <= slow["body_ms"] < 200
+    assert slow["logging_ms"] is not None and slow["logging_ms"] < 50
+    # getfixturevalue 准备的 fixture 从外层 fixture 中扣除
+    assert 30 <= slow["fixtures_ms"]["inner"] < 60
+    assert 50 <= slow["fixtures_ms"]["outer"] < 75
+    assert slow["setup_ms"] >= slow["fixtures_ms"]["inner"] + slow["fixtures_ms"]["outer"]
+    assert slow["total_ms"] >= slow["setup_ms"] + slow["http_ms"] + slow["body_ms"]
+
+    fast = plugin.profiles["test_cases.py::test_fast"].to_dict()
+    assert fast["requests"] == 0 and fast["http_ms"] == 0
+
+    # 只输出最慢的 top 个用例
+    assert [profile.nodeid for profile in plugin.slowest()] == ["test_cases.py::test_slow"]
+    result.stdout.fnmatch_lines(["*slowest 1 cases*", "*outer *ms*test_cases.py::test_slow"])
+    result.stdout.no_fnmatch_line("*::test_fast")
+
+
+def test_profile_stacks_are_written_per_case(pytester, tmp_path):
+    pytester.makepyfile(test_cases="""
+        import time
+
+        def busy_wait():
+            end = time.perf_counter() + 0.1
+            while time.perf_counter() < end:
+                pass
+
+        def test_busy():
+            busy_wait()
+    """)
+    path = tmp_path / "profile.folded"
+    plugin = ProfilePlugin(top=5, stacks_path=str(path))
+    result = pytester.runpytest_inprocess("-p", "no:cacheprovider", plugins=[plugin])
+    result.assert_outcomes(passed=1)
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines
+    assert all(line.startswith("test_cases.py::test_busy;") for line in lines)
+    assert any("test_cases.py:busy_wait " in line for line in lines)
+    samples = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+    assert samples >= 5
+    result.stdout.fnmatch_lines([f"collapsed stacks: {path}"])
+
+
+def test_sampler_skips_unlabelled_time():
+    sampler = StackSampler(interval=0.001).start()
+    time.sleep(0.05)
+    sampler.label = "case a;b"
+    time.sleep(0.05)
+    sampler.label = None
+    sampler.stop()
+    assert sampler.stacks
+    # 标签中的 ; 与空格会破坏 collapsed stacks 格式, 被替换
+    assert all(stack.startswith("case_a,b;") for stack in sampler.stacks)
+    assert any(stack.endswith("test_profiler.py:test_sampler_skips_unlabelled_time") for stack in sampler.stacks)
@@ -0,0 +1,156 @@
+import itertools
+import json
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from config import setting
+from core.report_panel import DashboardSpec, ReportPanel, ReportPortalError
+
+BASE_URL = "http://rp.test/api/v1/demo"
+
+
+class FakeReportPortal:
+    """内存中的 ReportPortal, 替换 ReportPanel.session, 记录收到的请求"""
+
+    def __init__(self, items=()):
+        self.resources = {"filter": {}, "widget": {}, "dashboard": {}}
+        self.items = list(items)
+        self.calls = []
+        self.deleted = []
+        self.fail_names = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, **kwargs):
+        path = urlsplit(url).path[len(urlsplit(BASE_URL).path) + 1:]
+        with self._lock:
+            self.calls.append((method, path, dict(params or {})))
+            status, body = self._handle(method, path, params or {}, kwargs.get("json"))
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.url = url
+        return response
+
+    def _handle(self, method, path, params, data):
+        resource_type = path.split("/")[0]
+        if method == "POST":
+            if data["name"] in self.fail_names:
+                return 500, {"message": "boom"}
+            resource_id = next(self._ids)
+            self.resources[resource_type][resource_id] = {"id": resource_id, "name": data["name"], "widgets": []}
+            return 201, {"id": resource_id}
+        if method == "PUT":
+            dashboard_id = int(path.split("/")[1])
+            widget = data["addWidget"]
+            self.resources["dashboard"][dashboard_id]["widgets"].append({"widgetId": widget["widgetId"]})
+            return 200, {}
+        if method == "DELETE":
+            self.deleted.append(path)
+            self.resources[resource_type].pop(int(path.split("/")[1]), None)
+            return 200, {}
+        if resource_type == "item":
+            size, page = params["page.size"], params["page.page"]
+            total_pages = max(1, -(-len(self.items) // size))
+            content = self.items[(page - 1) * size:page * size]
+            return 200, {"content": content, "page": {"totalPages": total_pages, "number": page}}
+        content = [resource for resource in self.resources[resource_type].values()
+                   if resource["name"] == params.get("filter.eq.name")]
+        return 200, {"content": content[:1]}
+
+    def count(self, method, resource_type):
+        return Counter((call[0], call[1].split("/")[0]) for call in self.calls)[(method, resource_type)]
+
+
+def make_panel(fake, max_workers=4):
+    panel = ReportPanel(base_url=BASE_URL, token="token", max_workers=max_workers)
+    panel.session = fake
+    return panel
+
+
+def test_provision_shares_objects_by_name_and_is_idempotent():
+    fake = FakeReportPortal()
+    specs = [DashboardSpec(1, f"case_{index}", dashboard_name="shared") for index in range(6)]
+    results = make_panel(fake).provision(specs)
+
+    assert all(result.ok for result in results)
+    assert [result.spec for result in results] == specs
+    # 6 个过滤器 + 6 个组件 + 1 个共用的仪表板, 仪表板只创建一次且包含全部组件
+    assert len(fake.resources["filter"]) == 6
+    assert len(fake.resources["widget"]) == 6
+    assert len(fake.resources["dashboard"]) == 1
+    assert len({result.dashboard_id for result in results}) == 1
+    dashboard = next(iter(fake.resources["dashboard"].values()))
+    assert sorted(widget["widgetId"] for widget in dashboard["widgets"]) == sorted(fake.resources["widget"])
+
+    # 新实例重复执行时复用已有对象, 不产生新的对象也不重复添加组件
+    posts, puts = fake.count("POST", "filter"), fake.count("PUT", "dashboard")
+    again = make_panel(fake).provision(specs)
+    assert [result.widget_id for result in again] == [result.widget_id for result in results]
+    assert fake.count("POST", "filter") == posts
+    assert fake.count("PUT", "dashboard") == puts
+    assert len(dashboard["widgets"]) == 6
+
+
+def test_provision_isolates_failed_specs():
+    fake = FakeReportPortal()
+    fake.fail_names.add("launch_1_bad_widget")
+    results = make_panel(fake).provision([DashboardSpec(1, "good"), DashboardSpec(1, "bad")])
+
+    assert results[0].ok
+    assert not results[1].ok
+    assert "API请求失败" in results[1].error
+    assert results[1].filter_id is not None and results[1].widget_id is None
+
+
+def test_cleanup_deletes_only_created_resources_in_order():
+    fake = FakeReportPortal()
+    make_panel(fake).provision([DashboardSpec(1, "existing", dashboard_name="shared")])
+    existing = set(fake.resources["dashboard"])
+
+    panel = make_panel(fake)
+    panel.provision([DashboardSpec(1, "existing", dashboard_name="shared"),
+                     DashboardSpec(1, "new", dashboard_name="shared"),
+                     DashboardSpec(2, "new")])
+    panel.cleanup()
+
+    # 复用的仪表板/过滤器/组件保留, 本实例创建的按 仪表板 -> 组件 -> 过滤器 删除
+    kinds = [path.split("/")[0] for path in fake.deleted]
+    assert kinds == sorted(kinds, key=["dashboard", "widget", "filter"].index)
+    assert Counter(kinds) == {"dashboard": 1, "widget": 2, "filter": 2}
+    assert set(fake.resources["dashboard"]) == existing
+    assert len(fake.resources["widget"]) == 1
+
+    # 清理后的名称缓存不再指向已删除的对象
+    fake.calls.clear()
+    panel.provision([DashboardSpec(2, "new")])
+    assert fake.count("POST", "dashboard") == 1
+
+
+def test_iter_pages_walks_all_pages_and_stops_early(monkeypatch):
+    monkeypatch.setattr(setting, "RP_PAGE_SIZE", 2)
+    fake = FakeReportPortal(items=[{"id": index} for index in range(5)])
+    panel = make_panel(fake)
+
+    assert [item["id"] for item in panel.iter_test_items("7")] == [0, 1, 2, 3, 4]
+    pages = [call[2] for call in fake.calls if call[1] == "item"]
+    assert [params["page.page"] for params in pages] == [1, 2, 3]
+    assert all(params["filter.eq.launchId"] == "7" and params["page.size"] == 2 for params in pages)
+
+    fake.calls.clear()
+    iterator = panel.iter_pages("item")
+    assert next(iterator)["id"] == 0
+    iterator.close()
+    # 只预取了下一页, 提前停止后不再请求后续页
+    assert [call[2]["page.page"] for call in fake.calls] == [1, 2]
+
+
+def test_make_request_wraps_http_errors():
+    fake = FakeReportPortal()
+    fake.fail_names.add("broken")
+    with pytest.raises(ReportPortalError, match="创建仪表板失败.*boom"):
+        make_panel(fake).create_dashboard("broken")
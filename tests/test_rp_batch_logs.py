@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from config import setting
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在 pytest-reportportal 创建客户端配置之后输出配置并结束, 不连接 ReportPortal
+CHECK_PLUGIN = '''
+import pytest
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    agent = config._reporter_config
+    raise pytest.UsageError(
+        f"rp client {agent.rp_client_type.name} {agent.rp_log_batch_size} {agent.rp_log_batch_payload_size}")
+'''
+
+
+def rp_client_config(tmp_path, *args):
+    (tmp_path / "rp_check.py").write_text(CHECK_PLUGIN, encoding="utf-8")
+    command = [
+        sys.executable, "-m", "pytest", "testcases", "-p", "rp_check", "-p", "no:cacheprovider", "--reportportal",
+        "-o", "rp_endpoint=http://127.0.0.1:1", "-o", "rp_project=api", "-o", "rp_api_key=key",
+        "-o", "rp_skip_connection_test=true", *args,
+    ]
+    env = dict(os.environ, PYTHONPATH=str(tmp_path))
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    return next(line.split("rp client ", 1)[1] for line in result.stderr.splitlines() if "rp client " in line)
+
+
+BATCH = f"{setting.RP_LOG_BATCH_SIZE} {setting.RP_LOG_BATCH_BYTES}"
+
+
+@pytest.mark.parametrize("args, expected", [
+    ((), "SYNC 20 65766648"),
+    (("--rp-batch-logs",), f"ASYNC_THREAD {BATCH}"),
+    (("--rp-batch-logs", "-o", "rp_client_type=ASYNC_BATCHED"), f"ASYNC_BATCHED {BATCH}"),
+], ids=["default", "batch", "configured-client"])
+def test_batch_logs_configure_client(tmp_path, args, expected):
+    assert rp_client_config(tmp_path, *args) == expected
@@ -0,0 +1,77 @@
+import pytest
+
+from core.rp_history import RPHistory
+
+
+class FakePanel:
+    max_workers = 2
+
+    def __init__(self, launches, items, fail_on=None):
+        self.launches = launches
+        self.items = items
+        self.fail_on = fail_on
+
+    def iter_launches(self, launch_name=None):
+        return iter(self.launches)
+
+    def iter_test_items(self, launch_id):
+        for item in self.items[launch_id]:
+            if item["id"] == self.fail_on:
+                raise ConnectionError("lost")
+            yield item
+
+    def get_launch(self, launch_id):
+        return next(launch for launch in self.launches if launch["id"] == launch_id)
+
+
+def launch(launch_id):
+    return {"id": launch_id, "name": "api-test", "status": "PASSED", "startTime": 0, "endTime": 10}
+
+
+def item(item_id, name, unique_id, status):
+    return {"id": item_id, "name": name, "uniqueId": unique_id, "status": status, "startTime": 0, "endTime": 5}
+
+
+def test_case_trend_groups_by_unique_id(tmp_path):
+    items = {
+        1: [item(1, "test_add[a]", "u-a", "PASSED"), item(2, "test_add[b]", "u-b", "FAILED")],
+        2: [item(3, "test_add[a]", "u-a", "PASSED"), item(4, "test_add[a]", "u-b", "PASSED")],
+    }
+    with RPHistory(FakePanel([launch(2), launch(1)], items), str(tmp_path / "history.db")) as history:
+        assert history.sync() == 2
+        trend = {row["unique_id"]: row for row in history.case_trend()}
+    assert trend["u-a"]["runs"] == 2 and trend["u-a"]["passed"] == 2
+    assert trend["u-b"]["runs"] == 2 and trend["u-b"]["failed"] == 1
+    # 名称取最近一次
+    assert trend["u-b"]["name"] == "test_add[a]"
+
+
+def test_interrupted_launch_is_fetched_again(tmp_path):
+    items = {1: [item(1, "test_add", "u-a", "PASSED"), item(2, "test_del", "u-b", "PASSED")]}
+    db_path = str(tmp_path / "history.db")
+    with RPHistory(FakePanel([launch(1)], items, fail_on=2), db_path) as history:
+        with pytest.raises(ConnectionError):
+            history.sync()
+        assert [row["status"] for row in history.launch_trend()] == ["IN_PROGRESS"]
+    with RPHistory(FakePanel([launch(1)], items), db_path) as history:
+        assert history.sync() == 1
+        assert history.sync() == 0
+        assert len(history.case_trend()) == 2
+
+
+def test_failed_older_launch_is_fetched_after_newer_one_synced(tmp_path):
+    items = {
+        2: [item(3, "test_add", "u-a", "PASSED")],
+        1: [item(1, "test_add", "u-a", "FAILED"), item(2, "test_del", "u-b", "PASSED")],
+    }
+    db_path = str(tmp_path / "history.db")
+    with RPHistory(FakePanel([launch(2), launch(1)], items, fail_on=2), db_path) as history:
+        with pytest.raises(ConnectionError):
+            history.sync()
+    with RPHistory(FakePanel([launch(2), launch(1)], items), db_path) as history:
+        # launch 2 已同步完成, launch 1 仍需单独重新拉取
+        assert history.sync() == 1
+        assert [row["id"] for row in history.launch_trend()] == [1, 2]
+        assert all(row["status"] == "PASSED" for row in history.launch_trend())
+        assert {row["unique_id"]: row["runs"] for row in history.case_trend()} == {"u-a": 2, "u-b": 1}
+        assert history.sync() == 0
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from config import setting
+from core.scheduler import Coordinator, dependency_edges
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_with_slo(*args):
+    """用 tests/data 中声明了无法满足的 slo 的用例数据在子进程中执行设备接口用例"""
+    env = dict(os.environ, API_DATA_FILE=os.path.join(ROOT, "tests", "data", "api_data_slo.yml"))
+    command = [
+        sys.executable, "-m", "pytest", "-q", "testcases/test_api_device", "--stub-server",
+        "-p", "no:reportportal", "-p", "no:cacheprovider", "--no-latency-report", *args,
+    ]
+    return subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+@pytest.mark.parametrize("args", [(), ("--workers", "2")], ids=["serial", "workers"])
+def test_slo_violation_fails(args):
+    result = run_with_slo(*args)
+    assert result.returncode == 1, result.stdout + result.stderr
+    # 超出预算单独上报为一个失败用例, 数据行本身仍然通过
+    assert "FAILED testcases/test_api_device/test_01_add_device.py::TestRunApiTC::test_01_run_tc[slo]" in result.stdout
+    assert "1 failed, 8 passed" in result.stdout
+    assert "max_ms" in result.stdout
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = Coordinator(partitions=[[["a"]], [["b"]]], token="secret").start()
+    yield coordinator
+    coordinator.stop()
+
+
+def test_partition_not_stolen_before_owner_connects(coordinator, monkeypatch):
+    assert coordinator._accept({"worker": 0, "token": "secret"}) == (0, None)
+    assert coordinator.next_unit(0)[1] == ["a"]
+    assert coordinator.start_unit(0, 0)
+    coordinator._finished(0, "a")
+    # 子进程 1 还没有连接, 等待而不是窃取
+    assert coordinator.next_unit(0) == (None, [])
+    monkeypatch.setattr(setting, "SCHEDULER_STEAL_GRACE", 0)
+    assert coordinator.next_unit(0)[1] == ["b"]
+
+
+def test_worker_refused_without_token(coordinator):
+    assert coordinator._accept({"worker": 1, "token": "guess"}) == (1, "invalid token")
+    assert coordinator._accept({"worker": 1}) == (1, "invalid token")
+    assert coordinator._accept({"worker": 1, "token": "secret"}) == (1, None)
+
+
+class DependsItem:
+    def __init__(self, name, after=(), host=None):
+        self.marker = pytest.mark.depends(name, after=after, key="host").mark
+        self.callspec = type("CallSpec", (), {"params": {"host": host}})()
+
+    def get_closest_marker(self, name):
+        return self.marker
+
+
+def test_dependency_edges_match_by_key():
+    items = [DependsItem("add", host="h1"), DependsItem("add", host="h2"), DependsItem("add"),
+             DependsItem("del", ["add"], host="h1"), DependsItem("del", ["add"])]
+    assert dependency_edges(items) == {0: {3, 4}, 1: {4}, 2: {3, 4}}
@@ -0,0 +1,98 @@
+import io
+import json
+import time
+
+import pytest
+import requests
+
+from core.sender import CircuitBreaker, CircuitOpenError, Sender, SenderPool
+from core.stub_server import StubServer
+
+
+class FailingSession:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+class BodySession:
+    def __init__(self, body):
+        self.body = body
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.raw = io.BytesIO(self.body)
+        return response
+
+
+def test_probe_released_after_unexpected_error():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure("device:80", "ConnectionError")
+    session = FailingSession(ValueError("bad request"))
+    sender = Sender(session=session, retries=0, breaker=breaker)
+    assert not sender.delete("http://device:80/a")
+    assert not sender.delete("http://device:80/a")
+    # 探测请求没有成功也没有记录失败, 熔断保持但下一个请求可以继续探测
+    assert session.calls == 2
+    assert breaker.is_open("device:80")
+
+
+def test_probe_failure_reopens_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure("device:80", "ConnectionError")
+    time.sleep(0.06)
+    session = FailingSession(requests.ConnectionError("refused"))
+    sender = Sender(session=session, retries=0, breaker=breaker)
+    assert not sender.delete("http://device:80/a")
+    assert not sender.delete("http://device:80/a")
+    assert session.calls == 1
+    assert sender.result["message"].startswith(CircuitOpenError.__name__)
+
+
+def test_retries_count_as_one_failure(monkeypatch):
+    monkeypatch.setattr("core.sender.backoff_delay", lambda attempt: 0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    session = FailingSession(requests.ConnectionError("refused"))
+    sender = Sender(session=session, retries=2, breaker=breaker)
+    assert not sender.delete("http://device:80/a")
+    assert session.calls == 3
+    assert not breaker.is_open("device:80")
+    assert not sender.delete("http://device:80/a")
+    assert breaker.is_open("device:80")
+
+
+def test_spilled_response_content_readable(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.setting.RESPONSE_SPILL_PATH", str(tmp_path))
+    data = {"items": ["x" * 100] * 50}
+    sender = Sender(session=BodySession(json.dumps(data).encode()), memory_cap=1024)
+    assert sender.get("http://device:80/a")
+    assert sender.body.spilled
+    response = sender.response
+    assert response.json() == data
+    assert response.content == sender.body.read()
+    assert sender.get("http://device:80/a")
+    previous = sender.response
+    assert sender.get("http://device:80/a")
+    assert sender.response.json() == data
+    # 上一个响应的临时文件已关闭, 报错说明原因而不是返回空内容
+    with pytest.raises(RuntimeError, match="spilled"):
+        previous.content
+
+
+def test_warm_up_opens_reusable_connections():
+    pool = SenderPool(pool_maxsize=2)
+    with StubServer() as server:
+        pool.warm_up([f"{server.url}/device/add_device", f"{server.url}/device/del_device"], connections=4)
+        # 连接数不超过连接池大小, 两个接口属于同一地址
+        assert 1 <= server.requests[("HEAD", "/")] <= 2
+        sender = Sender(session=pool.session)
+        assert sender.post(f"{server.url}/device/add_device", json={"host": "10.0.0.1"})
+        assert sender.timing.reused
+        assert sender.check_status()
+    pool.close()
@@ -0,0 +1,115 @@
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+from config import setting
+from core.stub_server import StubServer, use_stub_server
+
+
+def request(connection, method, path, body=None, headers=None):
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.fixture
+def server():
+    with StubServer() as server:
+        yield server
+
+
+def test_routes_validate_method_and_host(server):
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    assert request(connection, "POST", "/device/add_device", {"host": "10.0.0.1"}) == \
+        (200, {"status": True, "message": "success"})
+    assert request(connection, "DELETE", "/device/del_device?host=10.0.0.1")[0] == 200
+    assert request(connection, "GET", "/device/add_device")[0] == 405
+    assert request(connection, "POST", "/device/add_device", {})[0] == 400
+    assert request(connection, "DELETE", "/device/del_device")[0] == 400
+    assert request(connection, "POST", "/nope", {"host": "10.0.0.1"})[0] == 404
+    connection.request("POST", "/demo", body=b"{not json")
+    response = connection.getresponse()
+    assert (response.status, json.loads(response.read())["message"]) == (400, "invalid json body")
+    connection.close()
+
+    assert server.requests[("POST", "/device/add_device")] == 2
+    assert server.requests[("GET", "/device/add_device")] == 1
+
+
+def test_keep_alive_serves_pipelined_requests_on_one_connection(server):
+    body = b'{"host": "10.0.0.1"}'
+    one = (b"POST /demo HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+    with socket.create_connection((server.host, server.port), timeout=5) as sock:
+        # 三个请求一次性写入, 第三个要求关闭连接
+        sock.sendall(one * 2 + one.replace(b"Host: x", b"Host: x\r\nConnection: close"))
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+    assert data.count(b"HTTP/1.1 200 OK") == 3
+    assert data.count(b"Connection: keep-alive") == 2
+    assert data.count(b"Connection: close") == 1
+    assert server.requests[("POST", "/demo")] == 3
+
+
+def test_http10_and_head_responses_close_cleanly(server):
+    with socket.create_connection((server.host, server.port), timeout=5) as sock:
+        sock.sendall(b"DELETE /device/del_device?host=1 HTTP/1.0\r\n\r\n")
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+    assert data.startswith(b"HTTP/1.1 200 OK") and b"Connection: close" in data
+
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    connection.request("HEAD", "/demo")
+    response = connection.getresponse()
+    assert response.status == 405 and response.read() == b""
+    # HEAD 响应没有响应体, 同一连接上的下一个响应不受影响
+    assert request(connection, "POST", "/demo", {"host": "10.0.0.1"})[0] == 200
+    connection.close()
+
+
+def test_faults_per_path_override_global_and_clear(server):
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    server.set_fault(error_rate=1.0, error_status=503)
+    server.set_fault("/demo", latency_ms=200)
+    assert request(connection, "POST", "/device/add_device", {"host": "10.0.0.1"}) == \
+        (503, {"status": False, "message": "injected error"})
+
+    start = time.perf_counter()
+    assert request(connection, "POST", "/demo", {"host": "10.0.0.1"})[0] == 200
+    assert time.perf_counter() - start >= 0.2
+
+    server.clear_faults()
+    start = time.perf_counter()
+    assert request(connection, "POST", "/device/add_device", {"host": "10.0.0.1"})[0] == 200
+    assert request(connection, "POST", "/demo", {"host": "10.0.0.1"})[0] == 200
+    assert time.perf_counter() - start < 0.2
+    connection.close()
+
+
+def test_stop_closes_idle_keep_alive_connections():
+    server = StubServer().start()
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    assert request(connection, "POST", "/demo", {"host": "10.0.0.1"})[0] == 200
+
+    start = time.perf_counter()
+    server.stop()
+    assert time.perf_counter() - start < 2
+    with pytest.raises(OSError):
+        socket.create_connection((server.host, server.port), timeout=1).close()
+    connection.close()
+
+
+def test_use_stub_server_points_settings_at_server_and_restores(server):
+    saved = (setting.GO_SERVER, setting.HSOT, setting.PORT, setting.DEMO_SERVER, setting.POOL_WARMUP_URLS)
+    restore = use_stub_server(server)
+    try:
+        assert setting.GO_SERVER == setting.DEMO_SERVER == server.url
+        assert (setting.HSOT, setting.PORT) == (server.host, server.port)
+        assert setting.POOL_WARMUP_URLS == [server.url]
+    finally:
+        restore()
+    assert (setting.GO_SERVER, setting.HSOT, setting.PORT, setting.DEMO_SERVER, setting.POOL_WARMUP_URLS) == saved